@@ -484,6 +484,13 @@ class SystemVisitAdmin(admin.ModelAdmin):
     readonly_fields=('created',)
     ordering = ('-created',)
 
+@admin.register(SystemVisitDaily)
+class SystemVisitDailyAdmin(admin.ModelAdmin):
+    list_display = ('system', 'day', 'visits', 'unique_visitors')
+    list_filter = ['day']
+    search_fields = ('system__name',)
+    ordering = ('-day',)
+
 @admin.register(SystemRedirect)
 class SystemRedirectAdmin(admin.ModelAdmin):
     list_display = ('id', 'slug', 'system')
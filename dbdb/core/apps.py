@@ -5,9 +5,26 @@ class CoreConfig(AppConfig):
     name = 'dbdb.core'
 
     def ready(self):
-        from django.db.models.signals import m2m_changed, pre_save, post_save
-        from dbdb.core.signals import developer_orgs_changed, _org_capture_logo, _org_regen_card_on_logo_change
-        from dbdb.core.models import Organization, SystemVersion
+        from django.db.models.signals import m2m_changed, post_delete, pre_save, post_save
+        from dbdb.core.signals import (
+            developer_orgs_changed, _org_capture_logo, _org_regen_card_on_logo_change,
+            system_feature_options_changed, system_feature_saved, facet_definitions_changed,
+            organization_changed, _citation_capture_state, citation_changed,
+        )
+        from dbdb.core.models import (
+            Attribute, AttributeOption, CitationUrl, Feature, FeatureOption, Organization, SystemFeature,
+            SystemVersion,
+        )
         m2m_changed.connect(developer_orgs_changed, sender=SystemVersion.developer_orgs.through)
+        m2m_changed.connect(system_feature_options_changed, sender=SystemFeature.options.through)
+        post_save.connect(system_feature_saved, sender=SystemFeature)
         pre_save.connect(_org_capture_logo, sender=Organization)
-        post_save.connect(_org_regen_card_on_logo_change, sender=Organization)
\ No newline at end of file
+        post_save.connect(_org_regen_card_on_logo_change, sender=Organization)
+        post_save.connect(organization_changed, sender=Organization)
+        post_delete.connect(organization_changed, sender=Organization)
+        pre_save.connect(_citation_capture_state, sender=CitationUrl)
+        post_save.connect(citation_changed, sender=CitationUrl)
+        post_delete.connect(citation_changed, sender=CitationUrl)
+        for model in (Attribute, AttributeOption, Feature, FeatureOption):
+            post_save.connect(facet_definitions_changed, sender=model)
+            post_delete.connect(facet_definitions_changed, sender=model)
@@ -0,0 +1,91 @@
+"""
+benchmark_browse_columns — compare browse column fetch strategies.
+
+For an increasing number of multi-valued ?cols= columns, times
+  * legacy:  one query with a JSONBAgg(..., distinct=True) annotation per
+             column on the same GROUP BY, and
+  * loaders: the base row query plus one narrow values_list per column
+             (BrowseView.get_column_loaders / load_column).
+
+Usage:
+    python manage.py benchmark_browse_columns [--versions N] [--repeat R]
+"""
+import statistics
+import time
+
+from django.contrib.postgres.aggregates import JSONBAgg
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import JSONObject
+from django.test.utils import CaptureQueriesContext
+
+from dbdb.core.management.base import DbdbBaseCommand
+from dbdb.core.models import SystemVersion
+from dbdb.core.views.browse import BrowseView, load_column
+
+
+def _legacy(version_ids, loaders):
+    qs = SystemVersion.objects.filter(id__in=version_ids) \
+        .annotate(name=F('system__name'), slug=F('system__slug'))
+    for loader in loaders:
+        qs = qs.annotate(**{loader.key: JSONBAgg(
+            JSONObject(**{f: F(f'{loader.path}__{f}') for f in loader.fields}),
+            filter=Q(**{f'{loader.path}__isnull': False}),
+            distinct=True,
+        )})
+    return list(qs.values('id', 'name', 'slug', *(loader.key for loader in loaders)))
+
+
+def _loaders(version_ids, loaders):
+    rows = list(SystemVersion.objects.filter(id__in=version_ids)
+                .annotate(name=F('system__name'), slug=F('system__slug'))
+                .values('id', 'name', 'slug'))
+    for loader in loaders:
+        column = load_column(version_ids, loader)
+        for r in rows:
+            r[loader.key] = column.get(r['id'], [])
+    return rows
+
+
+class Command(DbdbBaseCommand):
+    help = 'Benchmark JSONBAgg column annotations against per-column loaders on the browse page'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--versions', type=int, default=None, metavar='N',
+                            help='Only fetch the first N current versions (default: all)')
+        parser.add_argument('--repeat', type=int, default=5, metavar='R',
+                            help='Runs per measurement; the median is reported (default: 5)')
+        return
+
+    def _time(self, func, *args, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                func(*args)
+                timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000, len(ctx.captured_queries)
+
+    def handle(self, *args, **options):
+        view = BrowseView()
+        version_ids = SystemVersion.objects.filter(is_current=True).order_by('id').values_list('id', flat=True)
+        if options['versions']:
+            version_ids = version_ids[:options['versions']]
+        version_ids = list(version_ids)
+
+        # Every multi-valued column except tags, which both strategies always load
+        all_loaders = view.get_column_loaders(view.get_available_columns())
+        tags, columns = all_loaders[0], all_loaders[1:]
+
+        self.stdout.write(f"{len(version_ids)} versions, {len(columns)} multi-valued columns, "
+                          f"median of {options['repeat']} runs")
+        self.stdout.write(f"{'cols':>4}  {'legacy ms':>10}  {'queries':>7}  {'loaders ms':>10}  {'queries':>7}")
+        for n in range(len(columns) + 1):
+            loaders = [tags] + columns[:n]
+            legacy_ms, legacy_q = self._time(_legacy, version_ids, loaders, repeat=options['repeat'])
+            loader_ms, loader_q = self._time(_loaders, version_ids, loaders, repeat=options['repeat'])
+            self.stdout.write(f"{n:>4}  {legacy_ms:>10.1f}  {legacy_q:>7}  {loader_ms:>10.1f}  {loader_q:>7}")
+        return
+
+    pass
@@ -0,0 +1,110 @@
+"""
+benchmark_recommender — compare the dense and sparse visit recommenders.
+
+Generates synthetic visits scaled from the current SystemVisit volume
+(distinct users, systems and user/system pairs) and times
+  * dense:   the former numpy users x systems matrix with a full
+             systems x systems similarity and an argsort per system
+             (recommender.dense_top_k), and
+  * sparse:  dbdb.core.utils.recommender (CSR matrix, sparse cosine
+             similarity, argpartition top-k).
+Peak memory of each is measured with tracemalloc.
+
+Usage:
+    python manage.py benchmark_recommender [--scale 10] [--users N] [--systems N] [--pairs N]
+"""
+import time
+import tracemalloc
+
+import numpy as np
+from django.db import connection
+
+from dbdb.core.management.base import DbdbBaseCommand
+from dbdb.core.models import SystemVisit
+from dbdb.core.utils.recommender import build_visit_matrix, cosine_similarity, dense_top_k, top_k
+
+
+def _synthetic_visits(users, systems, pairs, seed):
+    # Zipf-like popularity: a few systems get most of the views
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, systems + 1) ** 1.1
+    system_ids = rng.choice(systems, size=pairs, p=weights / weights.sum()) + 1
+    user_keys = rng.integers(-2**63, 2**63 - 1, size=users, dtype=np.int64)[rng.integers(0, users, size=pairs)]
+    return user_keys, system_ids
+
+
+def _dense(user_keys, system_ids, k):
+    matrix, ids = build_visit_matrix(user_keys, system_ids)
+    return dense_top_k(matrix, ids, k)
+
+
+def _sparse(user_keys, system_ids, k):
+    matrix, ids = build_visit_matrix(user_keys, system_ids)
+    return top_k(cosine_similarity(matrix), ids, k)
+
+
+class Command(DbdbBaseCommand):
+    help = 'Benchmark the dense and sparse visit recommenders on synthetic data'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--scale', type=float, default=10,
+                            help='Multiple of the current visit volume to generate (default: 10)')
+        parser.add_argument('--users', type=int, default=None, metavar='N',
+                            help='Distinct users to generate (overrides --scale)')
+        parser.add_argument('--systems', type=int, default=None, metavar='N',
+                            help='Distinct systems to generate (overrides --scale)')
+        parser.add_argument('--pairs', type=int, default=None, metavar='N',
+                            help='User/system pairs to generate (overrides --scale)')
+        parser.add_argument('--top-k', type=int, default=4, metavar='K',
+                            help='Recommendations per system (default: 4)')
+        parser.add_argument('--dense-limit', type=float, default=4.0, metavar='GB',
+                            help='Skip the dense run if its matrix would exceed this size (default: 4)')
+        parser.add_argument('--seed', type=int, default=0)
+        return
+
+    def _current_volume(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT COUNT(DISTINCT (ip_address, user_agent)),
+                       COUNT(DISTINCT system_id),
+                       COUNT(DISTINCT (ip_address, user_agent, system_id))
+                FROM {SystemVisit._meta.db_table}
+            """)
+            return cursor.fetchone()
+
+    def _measure(self, func, *args):
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak / 2**20
+
+    def handle(self, *args, **options):
+        users, systems, pairs = options['users'], options['systems'], options['pairs']
+        if not (users and systems and pairs):
+            current = self._current_volume()
+            self.stdout.write(f"Current volume: {current[0]} users, {current[1]} systems, {current[2]} pairs")
+            users = users or max(1, int(current[0] * options['scale']))
+            # The catalogue grows far slower than the traffic
+            systems = systems or max(2, current[1])
+            pairs = pairs or max(1, int(current[2] * options['scale']))
+
+        user_keys, system_ids = _synthetic_visits(users, systems, pairs, options['seed'])
+        self.stdout.write(f"Synthetic volume: {users} users, {systems} systems, {pairs} pairs")
+        self.stdout.write(f"{'engine':>8}  {'seconds':>8}  {'peak MiB':>9}")
+
+        dense_gb = users * systems * 8 / 2**30
+        if dense_gb > options['dense_limit']:
+            self.stdout.write(f"{'dense':>8}  skipped ({dense_gb:.1f} GB matrix)")
+        else:
+            seconds, peak = self._measure(_dense, user_keys, system_ids, options['top_k'])
+            self.stdout.write(f"{'dense':>8}  {seconds:>8.2f}  {peak:>9.1f}")
+
+        seconds, peak = self._measure(_sparse, user_keys, system_ids, options['top_k'])
+        self.stdout.write(f"{'sparse':>8}  {seconds:>8.2f}  {peak:>9.1f}")
+        return
+
+    pass
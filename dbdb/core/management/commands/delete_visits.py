@@ -1,7 +1,14 @@
+import datetime
+
 from django.core.management.base import BaseCommand
-from django.db.models import Count
+from django.db.models import Count, Min
 
 from dbdb.core.models import System, SystemVisit
+from dbdb.core.utils.visits import add_months, refresh_view_counts, rollup_visits
+
+
+def _month(value) -> datetime.date:
+    return datetime.datetime.strptime(value, '%Y-%m').date()
 
 
 class Command(BaseCommand):
@@ -13,6 +20,10 @@ class Command(BaseCommand):
             '--dry-run', action='store_true', default=False,
             help='Show what would be deleted without making changes',
         )
+        parser.add_argument(
+            '--month', type=_month, default=None, metavar='YYYY-MM',
+            help='Only delete visits from this month (scans a single partition)',
+        )
 
     def handle(self, *args, **options):
         keyword  = options['keyword']
@@ -20,6 +31,11 @@ class Command(BaseCommand):
         prefix   = '[DRY RUN] ' if dry_run else ''
 
         qs = SystemVisit.objects.filter(ip_address__icontains=keyword)
+        if options['month']:
+            month = options['month']
+            qs = qs.filter(created__gte=datetime.datetime.combine(month, datetime.time.min, tzinfo=datetime.UTC),
+                           created__lt=datetime.datetime.combine(add_months(month, 1), datetime.time.min,
+                                                                 tzinfo=datetime.UTC))
         total = qs.count()
 
         if total == 0:
@@ -30,6 +46,7 @@ class Command(BaseCommand):
         affected_system_ids = list(
             qs.values_list('system_id', flat=True).distinct()
         )
+        first_visit = qs.aggregate(first=Min('created'))['first']
 
         self.stdout.write(
             f'{prefix}Found {total} SystemVisit row(s) matching "{keyword}" '
@@ -46,9 +63,9 @@ class Command(BaseCommand):
         qs.delete()
         self.stdout.write(f'Deleted {total} SystemVisit row(s).\n')
 
-        # Recompute view_count for every affected system
+        # Re-aggregate the affected days, then recompute view_count for every
+        # affected system from the daily rollup
+        rollup_visits(first_visit.astimezone(datetime.UTC).date())
+        refresh_view_counts(affected_system_ids)
         for system in System.objects.filter(pk__in=affected_system_ids).order_by('name'):
-            new_count = system.visits.count()
-            system.view_count = new_count
-            system.save(update_fields=['view_count'])
-            self.stdout.write(f'  Updated view_count : {system.name} → {new_count}\n')
+            self.stdout.write(f'  Updated view_count : {system.name} → {system.view_count}\n')
@@ -0,0 +1,235 @@
+"""
+evaluate_recommender — offline evaluation of the recommendation variants.
+
+Splits the distinct (visitor, system) pairs of SystemVisit at a cutoff
+time: the pairs first seen before it train every variant, and the systems
+a visitor first viewed after it are held out. Each visitor with history
+on both sides is recommended the k systems with the highest summed score
+across the top-k lists of their training systems (excluding those), i.e.
+what the "People also viewed" blocks of the pages they read showed them.
+
+For each variant the report has precision@k and recall@k over those
+visitors, catalog coverage (share of current systems that have a list /
+that appear in some list), and the runtime and peak memory of training.
+The split is by time only, so runs over the same data are identical.
+
+Variants:
+    cosine   the original dense cosine recommender (recommender.dense_top_k)
+    sparse   the CSR cosine recommender of process_visits
+    decayed  sparse with each pair weighted by forward decay (--half-life)
+    content  content similarity of features, attributes and relations
+    blended  sparse blended with content (--content-weight)
+
+Usage:
+    python manage.py evaluate_recommender [--test-days 30] [--top-k 4] [--output report.json]
+"""
+import datetime
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import sparse
+
+from dbdb.core.management.base import DbdbBaseCommand
+from dbdb.core.models import SystemVersion
+from dbdb.core.utils.recommender import (
+    blend_recommendations,
+    build_visit_matrix,
+    content_top_k,
+    cosine_similarity,
+    dense_top_k,
+    load_visit_pairs,
+    top_k,
+)
+
+LOG = logging.getLogger(__name__)
+
+VARIANTS = ('cosine', 'sparse', 'decayed', 'content', 'blended')
+
+
+def _measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+class Command(DbdbBaseCommand):
+    help = 'Evaluate the recommendation variants on a time-based split of the visits'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--cutoff', type=datetime.date.fromisoformat, default=None, metavar='YYYY-MM-DD',
+                            help='Start of the test period (default: --test-days before today)')
+        parser.add_argument('--test-days', type=int, default=30, metavar='N',
+                            help='Length of the test period in days (default: 30)')
+        parser.add_argument('--train-months', type=int, default=None, metavar='N',
+                            help='Only train on visits from the N months before the cutoff')
+        parser.add_argument('--top-k', type=int, default=4, metavar='K',
+                            help='Recommendations per system and per visitor (default: 4)')
+        parser.add_argument('--max-threshold', type=int, default=45,
+                            help='Ignore visitors with more distinct training systems than this (default: 45)')
+        parser.add_argument('--ignore', action='append', type=str,
+                            help='List of IP addresses to ignore')
+        parser.add_argument('--half-life', type=float, default=90, metavar='DAYS',
+                            help='Half-life of the decayed variant (default: 90)')
+        parser.add_argument('--content-weight', type=float, default=0.2, metavar='W',
+                            help='Content weight of the blended variant (default: 0.2)')
+        parser.add_argument('--variant', action='append', choices=VARIANTS,
+                            help='Only evaluate these variants (default: all)')
+        parser.add_argument('--dense-limit', type=float, default=4.0, metavar='GB',
+                            help='Skip the cosine variant if its matrix would exceed this size (default: 4)')
+        parser.add_argument('--output', type=str, default='-', metavar='PATH',
+                            help='Write the JSON report here (default: stdout)')
+        return
+
+    def handle(self, *args, **options):
+        k = options['top_k']
+        today = datetime.datetime.now(datetime.UTC).date()
+        cutoff_date = options['cutoff'] or today - datetime.timedelta(days=options['test_days'])
+        cutoff = datetime.datetime.combine(cutoff_date, datetime.time.min, tzinfo=datetime.UTC)
+        end = cutoff + datetime.timedelta(days=options['test_days'])
+        since = None
+        if options['train_months']:
+            since = cutoff - datetime.timedelta(days=31 * options['train_months'])
+
+        users, systems, seen = load_visit_pairs(ignore=options['ignore'], since=since)
+        is_test = (seen >= cutoff.timestamp()) & (seen < end.timestamp())
+        is_train = seen < cutoff.timestamp()
+
+        # Drop heavy (crawler-like) visitors from both sides
+        train_users, train_counts = np.unique(users[is_train], return_counts=True)
+        heavy = train_users[train_counts > options['max_threshold']]
+        keep = ~np.isin(users, heavy)
+        train = is_train & keep
+        test = is_test & keep
+        LOG.info("Cutoff %s: %d training pairs, %d test pairs", cutoff_date, train.sum(), test.sum())
+
+        fits = {
+            'cosine': self._fit_cosine,
+            'sparse': self._fit_sparse,
+            'decayed': self._fit_decayed,
+            'content': self._fit_content,
+            'blended': self._fit_blended,
+        }
+        catalog = SystemVersion.objects.filter(is_current=True).count()
+        report = {
+            'cutoff': cutoff_date.isoformat(),
+            'test_days': options['test_days'],
+            'top_k': k,
+            'train_pairs': int(train.sum()),
+            'test_pairs': int(test.sum()),
+            'catalog': catalog,
+            'variants': {},
+        }
+        train_args = (users[train], systems[train], seen[train], cutoff.timestamp(), options)
+        for name in options['variant'] or VARIANTS:
+            if name == 'cosine':
+                dense_gb = len(np.unique(users[train])) * len(np.unique(systems[train])) * 8 / 2**30
+                if dense_gb > options['dense_limit']:
+                    report['variants'][name] = {'skipped': f'{dense_gb:.1f} GB dense matrix'}
+                    continue
+            recommendations, seconds, peak = _measure(fits[name], *train_args)
+            result = self._evaluate(recommendations, users[train], systems[train], users[test], systems[test], k)
+            recommended = {o for recs in recommendations.values() for o, _ in recs}
+            result.update({
+                'systems_with_recommendations': len(recommendations) / catalog if catalog else 0.0,
+                'recommended_systems': len(recommended) / catalog if catalog else 0.0,
+                'train_seconds': round(seconds, 3),
+                'train_peak_mib': round(peak, 1),
+            })
+            report['variants'][name] = result
+            LOG.info(f"{name:>8}  P@{k}={result['precision']:.4f}  R@{k}={result['recall']:.4f}  "
+                     f"coverage={result['recommended_systems']:.3f}  {seconds:.2f}s  {peak:.1f} MiB")
+
+        if options['output'] == '-':
+            json.dump(report, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        else:
+            with open(options['output'], 'w') as fd:
+                json.dump(report, fd, indent=2)
+        return
+
+    def _fit_cosine(self, users, systems, seen, cutoff, options):
+        matrix, ids = build_visit_matrix(users, systems)
+        return dense_top_k(matrix, ids, options['top_k'])
+
+    def _fit_sparse(self, users, systems, seen, cutoff, options, k=None):
+        matrix, ids = build_visit_matrix(users, systems)
+        return top_k(cosine_similarity(matrix), ids, k or options['top_k'])
+
+    def _fit_decayed(self, users, systems, seen, cutoff, options):
+        # Same weighting as the co-occurrence store, relative to the cutoff
+        weights = np.power(2.0, (seen - cutoff) / (options['half_life'] * 86400.0))
+        matrix, ids = build_visit_matrix(users, systems, np.sqrt(weights))
+        return top_k(cosine_similarity(matrix), ids, options['top_k'])
+
+    def _fit_content(self, users, systems, seen, cutoff, options):
+        return content_top_k(options['top_k'])
+
+    def _fit_blended(self, users, systems, seen, cutoff, options):
+        k = options['top_k']
+        return blend_recommendations(self._fit_sparse(users, systems, seen, cutoff, options, k),
+                                     content_top_k(2 * k), k, options['content_weight'])
+
+    def _evaluate(self, recommendations, train_users, train_systems, test_users, test_systems, k):
+        """Precision@k and recall@k of the per-visitor recommendations."""
+        # Common index for visitors and systems on both sides of the split
+        user_ids = np.unique(np.concatenate([train_users, test_users]))
+        system_ids = np.unique(np.concatenate(
+            [train_systems, test_systems,
+             np.fromiter((s for s in recommendations), dtype=np.int64),
+             np.fromiter((o for recs in recommendations.values() for o, _ in recs), dtype=np.int64)]))
+        n_users, n_systems = len(user_ids), len(system_ids)
+
+        def matrix(u, s):
+            rows = np.searchsorted(user_ids, u)
+            cols = np.searchsorted(system_ids, s)
+            m = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_users, n_systems))
+            m.data[:] = 1
+            return m
+
+        train, held_out = matrix(train_users, train_systems), matrix(test_users, test_systems)
+
+        # systems x systems matrix of each system's recommendation list
+        rec_rows, rec_cols, rec_scores = [], [], []
+        for system_id, recs in recommendations.items():
+            for other_id, score in recs:
+                rec_rows.append(system_id)
+                rec_cols.append(other_id)
+                rec_scores.append(score)
+        lists = sparse.csr_matrix(
+            (np.asarray(rec_scores, dtype=np.float32),
+             (np.searchsorted(system_ids, np.asarray(rec_rows, dtype=np.int64)),
+              np.searchsorted(system_ids, np.asarray(rec_cols, dtype=np.int64)))),
+            shape=(n_systems, n_systems))
+
+        evaluated = np.flatnonzero((np.diff(train.indptr) > 0) & (np.diff(held_out.indptr) > 0))
+        scores = (train[evaluated] @ lists).tocsr()
+        precision, recall = [], []
+        for i, user in enumerate(evaluated):
+            start, stop = scores.indptr[i], scores.indptr[i + 1]
+            candidates = scores.indices[start:stop]
+            values = scores.data[start:stop]
+            unseen = ~np.isin(candidates, train.indices[train.indptr[user]:train.indptr[user + 1]])
+            candidates, values = candidates[unseen], values[unseen]
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-values, k)[:k]]
+            relevant = held_out.indices[held_out.indptr[user]:held_out.indptr[user + 1]]
+            hits = np.isin(candidates, relevant).sum()
+            precision.append(hits / k)
+            recall.append(hits / len(relevant))
+
+        return {
+            'users': len(evaluated),
+            'precision': float(np.mean(precision)) if precision else 0.0,
+            'recall': float(np.mean(recall)) if recall else 0.0,
+        }
+
+    pass
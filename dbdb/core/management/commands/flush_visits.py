@@ -0,0 +1,19 @@
+from dbdb.core.management.base import DbdbBaseCommand
+from dbdb.core.utils.visits import recover_visits
+
+
+class Command(DbdbBaseCommand):
+    help = 'Write the SystemVisit rows spooled by worker processes that exited before flushing'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--spool-dir', default=None, metavar='DIR',
+                            help='Spool directory (default: settings.DBDB_VISIT_SPOOL_DIRECTORY)')
+        return
+
+    def handle(self, *args, **options):
+        written = recover_visits(options['spool_dir'])
+        self.stdout.write(f"Recovered {written} visit(s).")
+        return
+
+    pass
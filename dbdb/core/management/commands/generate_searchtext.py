@@ -1,7 +1,7 @@
 from django.core.management import BaseCommand
 
-from dbdb.core.models import SystemSearchText, SystemVersion
-from dbdb.core.utils.searchtext import generate_searchtext
+from dbdb.core.models import SystemVersion
+from dbdb.core.utils.searchtext import update_searchtext
 
 
 class Command(BaseCommand):
@@ -22,12 +22,8 @@ class Command(BaseCommand):
                 versions = versions.filter(system__name__icontains=keyword)
 
         for ver in versions.order_by("system__name"):
-            sstext, created = SystemSearchText.objects.update_or_create(system=ver.system)
             try:
-                sstext.system = ver.system
-                sstext.name = ver.system.name
-                sstext.search_text = generate_searchtext(ver)
-                sstext.save()
+                update_searchtext(ver)
                 print(f"Added search text for {ver}")
             except:
                 print(f"Failed to update search text for {ver}")
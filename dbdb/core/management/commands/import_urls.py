@@ -1,11 +1,11 @@
 import logging
-import sys
 
 from django.core.management import BaseCommand
-from django.db import connection
+from django.db import connection, transaction
+from django.utils import timezone
 
 from dbdb.core.models import CitationUrl
-from dbdb.core.utils.citations import normalize_url
+from dbdb.core.utils.pagecache import bump_citation_status
 
 LOG = logging.getLogger(__name__)
 
@@ -23,6 +23,35 @@ COPY_FIELDS = [
     'last_statuscode',
 ]
 
+# Each source row is matched to the live CitationUrl with the same url, or
+# failing that (the url was normalized since) the one with the same id
+MATCH_SQL = f"""
+    SELECT s.*, COALESCE(by_url.id, by_pk.id) AS target_id, by_url.id IS NOT NULL AS url_match
+      FROM {{table}} s
+      LEFT JOIN {CitationUrl._meta.db_table} by_url ON by_url.url = s.url
+      LEFT JOIN {CitationUrl._meta.db_table} by_pk ON by_url.id IS NULL AND by_pk.id = s.id
+"""
+
+# Copy the checked state onto matched rows that were never checked and make
+# them due for a recrawl. When several source rows match the same
+# CitationUrl, url matches win.
+UPDATE_SQL = f"""
+    UPDATE {CitationUrl._meta.db_table} c
+       SET {', '.join(f'{f} = m.{f}' for f in COPY_FIELDS)},
+           next_check = %(now)s
+      FROM (SELECT DISTINCT ON (target_id) *
+              FROM ({MATCH_SQL}) matched
+             WHERE target_id IS NOT NULL
+             ORDER BY target_id, url_match DESC, id) m
+     WHERE c.id = m.target_id
+       AND c.status = %(unknown)s
+       AND m.status <> %(unknown)s
+"""
+
+NOT_FOUND_SQL = f"""
+    SELECT COUNT(*) FROM ({MATCH_SQL}) matched WHERE target_id IS NULL
+"""
+
 
 class Command(BaseCommand):
 
@@ -32,54 +61,21 @@ class Command(BaseCommand):
         return
 
     def handle(self, *args, **options):
-        table = options['table']
-
-        cols = ', '.join(['id', 'url'] + COPY_FIELDS)
-        sql = f'SELECT {cols} FROM "{table}"'  # noqa: S608
-
-        with connection.cursor() as cursor:
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-
-        col_names = ['id', 'url'] + COPY_FIELDS
-        success = 0
-        not_found = 0
-
-        for row in rows:
-            data = dict(zip(col_names, row))
-            row_id = data.pop('id')
-            url = data.pop('url')
-
-            try:
-                obj = CitationUrl.objects.get(url=url)
-            except CitationUrl.DoesNotExist:
-                try:
-                    obj = CitationUrl.objects.get(pk=row_id)
-                    # print(f"IMPORT: {url}")
-                    # print(f"FOUND: {obj}")
-                    # print(f"NORMALIZE: {normalize_url(obj.url)}")
-
-                    # if normalize_url(obj.url) != url:
-                    #     LOG.warning(f"No CitationUrl found for URL: {url!r} [#{row_id}]")
-                    #     not_found += 1
-                    #     # sys.exit(1)
-                    #     continue
-                    LOG.debug(f"Matched CitationUrl by pk={row_id} via normalized URL: {url!r}")
-                except CitationUrl.DoesNotExist:
-                    LOG.warning(f"No CitationUrl found for URL: {url!r} [#{row_id}]")
-                    # sys.exit(1)
-                    not_found += 1
-                    continue
-
-            if obj.status == CitationUrl.Status.UNKNOWN and data["status"] != CitationUrl.Status.UNKNOWN:
-                for field, value in data.items():
-                    setattr(obj, field, value)
-                obj.save(update_fields=COPY_FIELDS)
-                success += 1
-                LOG.debug(f"Updated: {obj}")
-
-        LOG.info(f"Done. Updated {success} CitationUrls ({not_found} not found) from table '{table}'.")
+        table = connection.ops.quote_name(options['table'])
+        params = {'unknown': CitationUrl.Status.UNKNOWN.value, 'now': timezone.now()}
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(NOT_FOUND_SQL.format(table=table))
+            not_found = cursor.fetchone()[0]
+            cursor.execute(UPDATE_SQL.format(table=table), params)
+            success = cursor.rowcount
+        if not_found:
+            LOG.warning(f"No CitationUrl found for {not_found} rows of '{options['table']}'")
+        if success:
+            bump_citation_status()
+
+        LOG.info(f"Done. Updated {success} CitationUrls ({not_found} not found) from table '{options['table']}'.")
         self.stdout.write(self.style.SUCCESS(
-            f"Updated {success} CitationUrls ({not_found} not found) from '{table}'."
+            f"Updated {success} CitationUrls ({not_found} not found) from '{options['table']}'."
         ))
         return
@@ -1,14 +1,46 @@
+import datetime
 import logging
 
 from django.core.management import BaseCommand
-from django.db import connection
+from django.db import connection, transaction
 
 from dbdb.core.models import System, SystemVisit
+from dbdb.core.utils.visits import (
+    ensure_visit_partitions,
+    list_visit_partitions,
+    refresh_view_counts,
+    rollup_visits,
+)
 
 LOG = logging.getLogger(__name__)
 
 VISIT_FIELDS = ['id', 'system_id', 'ip_address', 'user_agent', 'created']
 
+# Classifies every source row the way the import treats it; evaluated once
+# for the report, the partitions and the rollup range
+CLASSIFY_SQL = f"""
+    SELECT CASE
+             WHEN EXISTS (SELECT 1 FROM {SystemVisit._meta.db_table} v WHERE v.id = s.id) THEN 'existing'
+             WHEN NOT EXISTS (SELECT 1 FROM {System._meta.db_table} y WHERE y.id = s.system_id) THEN 'missing_system'
+             WHEN s.created < %(horizon)s THEN 'compacted'
+             ELSE 'new'
+           END AS status,
+           COUNT(*), MIN(s.created), MAX(s.created), MIN(s.id), MAX(s.id)
+      FROM {{table}} s
+     GROUP BY 1
+"""
+
+# Anti-join insert of one id range of the source table
+INSERT_SQL = f"""
+    INSERT INTO {SystemVisit._meta.db_table} ({', '.join(VISIT_FIELDS)})
+    SELECT {', '.join('s.' + f for f in VISIT_FIELDS)}
+      FROM {{table}} s
+     WHERE s.id >= %(low)s AND s.id < %(high)s
+       AND s.created >= %(horizon)s
+       AND EXISTS (SELECT 1 FROM {System._meta.db_table} y WHERE y.id = s.system_id)
+       AND NOT EXISTS (SELECT 1 FROM {SystemVisit._meta.db_table} v WHERE v.id = s.id)
+"""
+
 
 class Command(BaseCommand):
     help = 'Import SystemVisit rows from a copy table and recompute System.view_count'
@@ -18,48 +50,57 @@ class Command(BaseCommand):
                             help='Name of the source Postgres table (copy of core_systemvisit)')
         parser.add_argument('--dry-run', action='store_true',
                             help='Show how many visits would be imported without writing anything')
+        parser.add_argument('--batch-size', type=int, default=500000, metavar='N',
+                            help='Source ids per INSERT ... SELECT statement (default: 500000)')
 
     def handle(self, *args, **options):
-        table = options['table']
+        table = connection.ops.quote_name(options['table'])
         dry_run = options['dry_run']
 
-        cols = ', '.join(VISIT_FIELDS)
-        with connection.cursor() as cursor:
-            cursor.execute(f'SELECT {cols} FROM "{table}"')  # noqa: S608
-            rows = cursor.fetchall()
-
-        self.stdout.write(f"Read {len(rows)} rows from '{table}'")
-
-        existing_ids = set(SystemVisit.objects.values_list('id', flat=True))
-        valid_system_ids = set(System.objects.values_list('id', flat=True))
-
-        imported = skipped = missing_system = 0
+        # Months before the oldest partition were compacted into the daily
+        # rollup; their visits are not imported
+        partitions = list_visit_partitions()
+        horizon = partitions[0][0] if partitions else None
+        horizon_ts = datetime.datetime.combine(horizon or datetime.date.min, datetime.time.min,
+                                               tzinfo=datetime.UTC)
 
         with connection.cursor() as cursor:
-            for row in rows:
-                data = dict(zip(VISIT_FIELDS, row))
-                if data['id'] in existing_ids:
-                    skipped += 1
-                    continue
-                if data['system_id'] not in valid_system_ids:
-                    LOG.warning("Skipping visit #%s — system_id=%s not found", data['id'], data['system_id'])
-                    missing_system += 1
-                    continue
-                if not dry_run:
-                    cursor.execute(
-                        'INSERT INTO core_systemvisit (id, system_id, ip_address, user_agent, created) '
-                        'VALUES (%s, %s, %s, %s, %s)',
-                        [data['id'], data['system_id'], data['ip_address'], data['user_agent'], data['created']],
-                    )
-                imported += 1
-
+            cursor.execute(CLASSIFY_SQL.format(table=table), {'horizon': horizon_ts})
+            stats = {row[0]: row[1:] for row in cursor.fetchall()}
+        counts = {status: stats.get(status, (0,))[0]
+                  for status in ('new', 'existing', 'missing_system', 'compacted')}
+        self.stdout.write(f"Read {sum(counts.values())} rows from '{options['table']}'")
+        if counts['missing_system']:
+            LOG.warning("Skipping %d visits whose system no longer exists", counts['missing_system'])
+
+        summary = (f"{counts['existing']} existing, {counts['missing_system']} unknown systems, "
+                   f"{counts['compacted']} in compacted months")
         if dry_run:
             self.stdout.write(self.style.SUCCESS(
-                f"DRY RUN: {imported} visits would be imported ({skipped} existing, {missing_system} unknown systems)."
+                f"DRY RUN: {counts['new']} visits would be imported ({summary})."
             ))
             return
 
-        self.stdout.write(f"Imported {imported}, skipped {skipped} existing, {missing_system} unknown systems")
+        imported = 0
+        if counts['new']:
+            _, first_imported, last_imported, low_id, high_id = stats['new']
+            # Make sure every month being imported has a partition
+            last_month = last_imported.astimezone(datetime.UTC).date()
+            if horizon is not None and last_month >= horizon:
+                ensure_visit_partitions(horizon, last_month)
+
+            with connection.cursor() as cursor:
+                for low in range(low_id, high_id + 1, options['batch_size']):
+                    with transaction.atomic():
+                        cursor.execute(INSERT_SQL.format(table=table), {
+                            'low': low,
+                            'high': low + options['batch_size'],
+                            'horizon': horizon_ts,
+                        })
+                        imported += cursor.rowcount
+                    LOG.debug("Imported ids [%d, %d): %d rows", low, low + options['batch_size'], cursor.rowcount)
+
+        self.stdout.write(f"Imported {imported}, skipped {summary}")
 
         # Reset the PK sequence so future auto-inserts don't collide.
         with connection.cursor() as cursor:
@@ -68,19 +109,11 @@ class Command(BaseCommand):
                 "COALESCE(MAX(id), 1)) FROM core_systemvisit"
             )
 
-        # Recompute view_count for all systems.
+        # Re-aggregate the imported days and recompute view_count for all systems.
         self.stdout.write("Recomputing view_count...")
-        with connection.cursor() as cursor:
-            cursor.execute('SELECT system_id, COUNT(*) FROM core_systemvisit GROUP BY system_id')
-            counts = dict(cursor.fetchall())
-
-        updated = 0
-        for system in System.objects.only('id', 'view_count'):
-            new_count = counts.get(system.id, 0)
-            if system.view_count != new_count:
-                system.view_count = new_count
-                system.save(update_fields=['view_count'])
-                updated += 1
+        if imported:
+            rollup_visits(first_imported.astimezone(datetime.UTC).date())
+        updated = refresh_view_counts()
 
         self.stdout.write(self.style.SUCCESS(
             f"Done. Imported {imported} visits. Updated view_count for {updated} systems."
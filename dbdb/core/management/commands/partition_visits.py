@@ -0,0 +1,48 @@
+import datetime
+
+from django.conf import settings
+
+from dbdb.core.management.base import DbdbBaseCommand
+from dbdb.core.utils.visits import (
+    add_months,
+    compact_visit_partitions,
+    ensure_visit_partitions,
+    stray_visit_months,
+)
+
+
+class Command(DbdbBaseCommand):
+    help = ('Pre-create monthly SystemVisit partitions and compact partitions older than the '
+            'retention window into SystemVisitDaily')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--ahead', type=int, default=3, metavar='N',
+                            help='Make sure partitions exist for the next N months (default: 3)')
+        parser.add_argument('--retain', type=int, default=settings.DBDB_VISIT_RETENTION_MONTHS, metavar='N',
+                            help='Keep raw visits for the last N months; 0 keeps everything '
+                                 '(default: settings.DBDB_VISIT_RETENTION_MONTHS)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show which partitions would be compacted without dropping them')
+        return
+
+    def handle(self, *args, **options):
+        this_month = datetime.datetime.now(datetime.UTC).date().replace(day=1)
+
+        # Visits that landed in the default partition get their months' partitions
+        for month in stray_visit_months():
+            for name in ensure_visit_partitions(month, month):
+                self.stdout.write(f"Created partition {name} for visits in the default partition")
+
+        for name in ensure_visit_partitions(this_month, add_months(this_month, options['ahead'])):
+            self.stdout.write(f"Created partition {name}")
+
+        if options['retain'] > 0:
+            prefix = '[DRY RUN] ' if options['dry_run'] else ''
+            dropped = compact_visit_partitions(add_months(this_month, -options['retain']),
+                                               dry_run=options['dry_run'])
+            for name in dropped:
+                self.stdout.write(f"{prefix}Compacted and dropped partition {name}")
+        return
+
+    pass
@@ -1,15 +1,17 @@
 import logging
 import sys
-import time
 from argparse import ArgumentParser
 from pprint import pformat
 
 from django.core.management import CommandError
+from django.db import close_old_connections
 from django.utils.dateparse import parse_datetime
 
 from dbdb.core.models import CitationUrl, CitationUrlContent
-from dbdb.core.utils.citations import _check_if_exists
+from dbdb.core.utils.citations import _check_if_exists, configure_sessions, recrawl_queue
 from dbdb.core.utils.citations import *
+from dbdb.core.utils.crawler import CrawlScheduler
+from dbdb.core.utils.pagecache import bump_citation_status
 from dbdb.core.management.base import DbdbBaseCommand
 
 LOG = logging.getLogger(__name__)
@@ -26,12 +28,20 @@ class Command(DbdbBaseCommand):
                     help="Normalize URLs to avoid duplicates")
         parser.add_argument('--only-new', action='store_true',
                     help="Only visit citations that have never been checked before")
+        parser.add_argument('--due', action='store_true',
+                    help="Only visit citations whose scheduled recheck time has passed")
         parser.add_argument("--last-checked", metavar='YYYY-MM-DD', required=False, type=parse_datetime,
                     help="Process URLs there were checked before date",)
         parser.add_argument('--timeout', type=int, default=15,
                     help="How many seconds to wait for each request attempt")
-        parser.add_argument('--sleep', type=int, default=5,
-                    help="How many seconds to sleep between processing each citation")
+        parser.add_argument('--sleep', type=float, default=5,
+                    help="How many seconds to wait between requests to the same domain")
+        parser.add_argument('--workers', type=int, default=8,
+                    help="How many citations to fetch in parallel (from different domains)")
+        parser.add_argument('--domain-concurrency', type=int, default=1, metavar='N',
+                    help="Maximum number of requests in flight to one domain")
+        parser.add_argument('--domain-burst', type=int, default=1, metavar='N',
+                    help="How many requests to one domain may start back-to-back before --sleep applies")
         parser.add_argument('--limit', type=int, default=None,
                     help="# of citations to process before exiting")
         parser.add_argument('--statuscode', type=int, default=None, metavar='N',
@@ -134,18 +144,46 @@ class Command(DbdbBaseCommand):
                 self.stdout.write(f"[dry-run] Would update {count} citation(s): {update_fields}")
             else:
                 count = citations.update(**update_fields)
+                bump_citation_status()
                 self.stdout.write(self.style.SUCCESS(f"Updated {count} citation(s): {update_fields}"))
             return
 
-        citation_ctr = 0
-        for c in citations.order_by("id"):
-            citation_ctr += 1
-            if 'limit' in options and options['limit']:
-                if citation_ctr >= options['limit']: break
+        scheduler = CrawlScheduler(
+            workers=options['workers'],
+            interval=options['sleep'],
+            burst=options['domain_burst'],
+            max_active=options['domain_concurrency'],
+        )
+        configure_sessions(options['domain_concurrency'])
+        # Most urgent first: unchecked/unknown, then dead, then by how overdue
+        citations = recrawl_queue(citations, due_only=options['due'])
+        if options['limit']:
+            citations = citations[:options['limit']]
+        LOG.info(f"Crawling with {scheduler.workers} workers, one request per domain every {options['sleep']}s")
+
+        results = scheduler.run(citations.iterator(), lambda c: c.url,
+                                lambda c: self.process_one(c, options))
+        try:
+            for c, _, error in results:
+                if error is not None:
+                    LOG.error(f"Failed: {c}", exc_info=error)
+                    if not options['skip_errors']:
+                        raise error
+        except KeyboardInterrupt:
+            sys.exit(0)
+        finally:
+            results.close()
+        return
 
-            prefix = "[dry-run] " if dry_run else ""
-            LOG.debug(f"{prefix}#{c.id}  {c.url}")
+    def process_one(self, c: CitationUrl, options) -> dict | None:
+        """Fetch one citation and save its new state. Runs on a crawler worker thread."""
+        dry_run = options['dry_run']
+        prefix = "[dry-run] " if dry_run else ""
+        LOG.debug(f"{prefix}#{c.id}  {c.url}")
 
+        info = None
+        merged = False
+        try:
             # First get the list of systems that use this citation
             systems = get_systems(c, current_only=False)
 
@@ -156,43 +194,33 @@ class Command(DbdbBaseCommand):
 
             LOG.info(f"Citation {c} => {systems}")
 
-            if citation_ctr > 1 and 'sleep' in options and int(options['sleep']) > 0:
-                LOG.info(f"Sleeping for {options['sleep']} seconds...")
-                time.sleep(int(options['sleep']))
-
-            info = None
-            merged = False
-            try:
-                # Just grab the first system to use as a hint
-                c, info = process_citation_url(
-                    c,
-                    system=systems[0] if systems else None,
-                    skip_spamcheck=options["skip_spamcheck"],
-                    normalize=options["normalize"],
-                    allow_redirects=False,
-                )
-                if info is None:  # was merged and deleted
-                    merged = True
-                    continue
-
-            except KeyboardInterrupt:
-                sys.exit(0)
-
-            except Exception:
-                LOG.error(f"Failed: {c}", exc_info=True)
-                if not options['skip_errors']:
-                    raise
-            finally:
-                if not merged:
-                    if dry_run:
-                        LOG.info(f"[dry-run] Would save: status={c.get_status_display()} title={c.last_title!r}")
-                    else:
-                        c.save()
-                    try:
-                        raw_bytes = len(c.content.raw.encode('utf-8'))
-                        content_info = f"content={raw_bytes:,}b"
-                    except CitationUrlContent.DoesNotExist:
-                        content_info = "no content"
-                    LOG.info(f"Result: status={c.get_status_display()} {content_info}")
-                    if info: LOG.debug(pformat(info))
+            # Just grab the first system to use as a hint
+            c, info = process_citation_url(
+                c,
+                system=systems[0] if systems else None,
+                skip_spamcheck=options["skip_spamcheck"],
+                normalize=options["normalize"],
+                allow_redirects=False,
+            )
+            if info is None:  # was merged and deleted
+                merged = True
+                return None
+
+        finally:
+            if not merged:
+                if dry_run:
+                    LOG.info(f"[dry-run] Would save: status={c.get_status_display()} title={c.last_title!r}")
+                else:
+                    c.save()
+                try:
+                    raw_bytes = len(c.content.raw.encode('utf-8'))
+                    content_info = f"content={raw_bytes:,}b"
+                except CitationUrlContent.DoesNotExist:
+                    content_info = "no content"
+                LOG.info(f"Result: status={c.get_status_display()} {content_info}")
+                if info: LOG.debug(pformat(info))
+            # Each worker thread has its own database connection
+            close_old_connections()
+        return info
+
     pass
@@ -1,14 +1,25 @@
 # stdlib imports
+import collections
+import datetime
 import logging
 
 # django imports
-import numpy as np
-from django.db import connection
-from django.db.models import Q
-from sklearn.metrics import mean_squared_error
+from django.db.models import F, Q
 
 from dbdb.core.management.base import DbdbBaseCommand
-from dbdb.core.models import System, SystemRecommendation, SystemVisit
+from dbdb.core.models import System, SystemCooccurrence, SystemRecommendation, SystemVisit
+from dbdb.core.utils.pagecache import bump_related_systems, bump_system_pages
+from dbdb.core.utils.recommender import (
+    blend_recommendations,
+    content_top_k,
+    cooccurrence_top_k,
+    cosine_similarity,
+    load_visit_matrix,
+    store_recommendations,
+    top_k,
+    update_cooccurrences,
+)
+from dbdb.core.utils.visits import add_months, refresh_view_counts, rollup_visits
 
 LOG = logging.getLogger(__name__)
 
@@ -31,6 +42,21 @@ class Command(DbdbBaseCommand):
                             help="Store the recommendation in the database")
         parser.add_argument('--show-missing', action='store_true',
                             help="Show which systems are missing recommendations")
+        parser.add_argument('--months', type=int, default=None, metavar='N',
+                            help="Only use visits from the last N months (scans only those partitions)")
+        parser.add_argument('--top-k', type=int, default=4, metavar='K',
+                            help="Number of recommendations per system")
+        parser.add_argument('--incremental', action='store_true',
+                            help="Fold visits since the last run into the co-occurrence store and only "
+                                 "refresh the systems that changed. The thresholds then count distinct "
+                                 "systems per user and distinct users per system")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Clear the co-occurrence store and rebuild it from all raw visits (implies --incremental)")
+        parser.add_argument('--content', action='store_true',
+                            help="Blend in content-based recommendations (features, attributes and relations), "
+                                 "which also fill systems without enough visits")
+        parser.add_argument('--content-weight', type=float, default=0.2, metavar='W',
+                            help="Weight of the content-based score when blending (default: 0.2)")
         return
 
     def show_missing(self, options):
@@ -56,144 +82,127 @@ class Command(DbdbBaseCommand):
             return
         # IF
 
-        # Get the total # of visits per system so that we can update
-        # the System objects for our stats calculation
-        visits_per_system = { }
-        with connection.cursor() as cursor:
-            sql = "SELECT system_id, count(*) AS cnt FROM core_systemvisit GROUP BY system_id"
-            cursor.execute(sql)
-            visits_per_system = dict([ (row[0],int(row[1])) for row in cursor.fetchall() ])
-        # WITH
-        for system_id, visits in visits_per_system.items():
-            system = System.objects.get(id=system_id)
-            system.view_count = visits
-            system.save()
-            #print(system, "=>", visits_per_system[system_id])
-        #sys.exit(0)
-
-        # For each unique (ip, user_agent) pair, get the systems that they viewed.
-        # A single CTE query handles all three filters:
-        #   - ignore list applied once in filtered_visits
-        #   - valid_users: total visits between min/max threshold
-        #   - valid_systems: total visits >= min_visit
-        params = {
-            'min_threshold': options['min_threshold'],
-            'max_threshold': options['max_threshold'],
-            'min_visit': options['min_visit'],
-        }
-        ignore_clause = ""
-        if options['ignore']:
-            ignore_clause = "WHERE ip_address NOT IN %(ignore_list)s"
-            params['ignore_list'] = tuple(options['ignore'])
-
-        sql = f"""
-            WITH filtered_visits AS (
-                SELECT ip_address, user_agent, system_id
-                FROM core_systemvisit
-                {ignore_clause}
-            ),
-            valid_users AS (
-                SELECT ip_address, user_agent
-                FROM filtered_visits
-                GROUP BY ip_address, user_agent
-                HAVING COUNT(*) BETWEEN %(min_threshold)s AND %(max_threshold)s
-            ),
-            valid_systems AS (
-                SELECT system_id
-                FROM filtered_visits
-                GROUP BY system_id
-                HAVING COUNT(*) >= %(min_visit)s
-            )
-            SELECT DISTINCT fv.ip_address, fv.user_agent, fv.system_id
-            FROM filtered_visits fv
-            JOIN valid_users vu USING (ip_address, user_agent)
-            JOIN valid_systems vs USING (system_id)
-            ORDER BY fv.ip_address, fv.user_agent
-        """
-
-        all_visits = {}
-        user_info = {}
-        system_idx_xref = {}
-        idx_system_xref = {}
-        next_user_idx = 0
-        next_system_idx = 0
-        current_user_key = None
-
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            for ip, ua, system_id in cursor.fetchall():
-                if system_id not in system_idx_xref:
-                    system_idx_xref[system_id] = next_system_idx
-                    idx_system_xref[next_system_idx] = system_id
-                    next_system_idx += 1
-
-                user_key = (ip, ua)
-                if user_key != current_user_key:
-                    current_user_key = user_key
-                    all_visits[next_user_idx] = []
-                    user_info[next_user_idx] = user_key
-                    next_user_idx += 1
-
-                all_visits[next_user_idx - 1].append(system_idx_xref[system_id])
-
-        LOG.info("idx_system_xref: %d", len(idx_system_xref))
-        system_cnt = System.objects.all().count()
-        #sys.exit(1)
-
-        #for user_idx in sorted(all_visits.keys(), key=lambda x: -1*len(all_visits[x]))[:10]:
-            #self.stdout.write(user_info[user_idx], "=>", len(all_visits[user_idx]))
-        #sys.exit(1)
+        # Update the total # of visits per system for our stats calculation
+        # from the daily rollup (catching up on any days not rolled up yet)
+        rollup_visits()
+        refresh_view_counts()
 
-        LOG.info("# of Users: %d" % next_user_idx)
-        LOG.info("# of Sytems: %d (total=%d)" % (next_system_idx, system_cnt))
+        if options['incremental'] or options['rebuild']:
+            self.handle_incremental(options)
+            return
+        # IF
 
-        data = np.zeros((next_user_idx, next_system_idx))
-        for user_idx in all_visits.keys():
-            for system_idx in all_visits[user_idx]:
-                data[user_idx, system_idx] += 1
-        LOG.info(str(data))
-        sparsity = float(len(data.nonzero()[0]))
-        sparsity /= (data.shape[0] * data.shape[1])
-        sparsity *= 100
-        LOG.info(f'Sparsity: {sparsity:4.2f}%')
+        since = None
+        if options['months']:
+            this_month = datetime.datetime.now(datetime.UTC).date().replace(day=1)
+            since = datetime.datetime.combine(add_months(this_month, -options['months']),
+                                              datetime.time.min, tzinfo=datetime.UTC)
+
+        # Binary users x systems matrix of who viewed what, streamed from a
+        # server-side cursor. Users are (ip, user_agent) hashed to integers.
+        data, system_ids = load_visit_matrix(
+            min_threshold=options['min_threshold'],
+            max_threshold=options['max_threshold'],
+            min_visit=options['min_visit'],
+            ignore=options['ignore'],
+            since=since,
+        )
 
-        train_data, test_data = self.train_test_split(data)
+        system_cnt = System.objects.all().count()
+        LOG.info(f"# of Users: {data.shape[0]}")
+        LOG.info(f"# of Sytems: {data.shape[1]} (total={system_cnt})")
+        if data.nnz:
+            sparsity = 100.0 * data.nnz / (data.shape[0] * data.shape[1])
+            LOG.info(f'Sparsity: {sparsity:4.2f}%')
+
+        similarity = cosine_similarity(data)
+        recommendations = top_k(similarity, system_ids, options['top_k'])
+        if options['content']:
+            recommendations = blend_recommendations(
+                recommendations, content_top_k(2 * options['top_k']),
+                options['top_k'], options['content_weight'])
+            system_ids = sorted(set(int(x) for x in system_ids) | set(recommendations))
+
+        before = collections.defaultdict(list)
+        processed = SystemRecommendation.objects.filter(system_id__in=[int(x) for x in system_ids])
+        for rec in processed.order_by('-score'):
+            before[rec.system_id].append((rec.recommendation_id, rec.score))
+
+        if options['store']:
+            created = store_recommendations(recommendations, system_ids if options['clear'] else None)
+            LOG.info(f"Stored {created} recommendations for {len(recommendations)} systems")
+        elif options['clear']:
+            processed.delete()
+
+        # "People Also Viewed" sidebars changed on every system page
+        if options['clear'] or options['store']:
+            bump_system_pages()
+
+        self.print_report(system_ids, before, recommendations)
+        return
 
-        similarity = self.compute_similarity(train_data)
-        LOG.info(str(similarity[:4, :4]))
-        pred = data.dot(similarity) / np.array([np.abs(similarity).sum(axis=1)])
+    def handle_incremental(self, options):
+        changed = update_cooccurrences(
+            ignore=options['ignore'],
+            min_systems=options['min_threshold'],
+            max_systems=options['max_threshold'],
+            rebuild=options['rebuild'],
+        )
+        # A changed system's norm also moves its score in the lists of the
+        # systems recommending it
+        refresh = set(changed)
+        refresh.update(SystemRecommendation.objects
+                       .filter(recommendation_id__in=changed)
+                       .values_list('system_id', flat=True))
+        if options['rebuild']:
+            refresh.update(SystemRecommendation.objects.values_list('system_id', flat=True))
+        LOG.info(f"Co-occurrences changed for {len(changed)} systems, refreshing {len(refresh)}")
+
+        recommendations = cooccurrence_top_k(refresh, options['top_k'], options['min_visit'])
+        if options['content']:
+            content = content_top_k(2 * options['top_k'])
+            # Systems below --min-visit only ever get content-based recommendations
+            warm = set(SystemCooccurrence.objects
+                       .filter(system_id=F('other_id'), visitors__gte=options['min_visit'])
+                       .values_list('system_id', flat=True))
+            refresh.update(set(content) - warm)
+            recommendations = blend_recommendations(
+                recommendations, {s: content[s] for s in refresh if s in content},
+                options['top_k'], options['content_weight'])
+
+        before = collections.defaultdict(list)
+        for rec in SystemRecommendation.objects.filter(system_id__in=refresh).order_by('-score'):
+            before[rec.system_id].append((rec.recommendation_id, rec.score))
+
+        # Pages only show the order, so lists that kept it are left alone
+        refresh = {
+            s for s in refresh
+            if [o for o, _ in before[s]] != [o for o, _ in recommendations.get(s, [])]
+        }
+        if options['store'] and refresh:
+            created = store_recommendations({s: recommendations[s] for s in refresh if s in recommendations}, refresh)
+            LOG.info(f"Stored {created} recommendations for {len(refresh)} systems")
+            bump_related_systems(refresh)
 
-        LOG.info('MSE: ' + str(self.get_mse(pred, test_data)))
+        self.print_report(refresh, before, recommendations)
+        return
 
-        #self.stdout.write("# of IPs: %s" % len(ip_addresses))
+    def print_report(self, system_ids, before, recommendations):
+        # One query for every name in the report
+        names = dict(System.objects.values_list('id', 'name'))
 
         output = { }
-        for system_idx in range(0, next_system_idx):
-            recommendations = self.top_k_systems(similarity, system_idx, 5)
-            system = System.objects.get(id=idx_system_xref[system_idx])
-
-            before_recs = SystemRecommendation.objects.filter(system=system)
+        for system_id in system_ids:
+            system_id = int(system_id)
             before_output = [ "*BEFORE*" ]
-            for rec in before_recs:
-                before_output.append("+ %s [%f]" % (rec.recommendation, rec.score))
-
-            if options['clear']: before_recs.delete()
+            for other_id, score in before[system_id]:
+                before_output.append(f"+ {names.get(other_id)} [{score:f}]")
 
             new_output = [ "*AFTER*" ]
-            for i in range(1, len(recommendations)):
-                score = similarity[system_idx, recommendations[i]]
-                other_sys = System.objects.get(id=idx_system_xref[recommendations[i]])
-
-                if system == other_sys: continue
+            for other_id, score in recommendations.get(system_id, []):
+                new_output.append(f"+ {names.get(other_id)} [{score:f}]")
 
-                if options['store']:
-                    rec = SystemRecommendation(system=system, recommendation=other_sys, score=score)
-                    rec.save()
-
-                new_output.append("+ %s [%f]" % (other_sys, score))
-            ## FOR
-
-            output_buffer = str(system) + "\n"
+            output_buffer = str(names.get(system_id)) + "\n"
             for i in range(0, max(len(before_output), len(new_output))):
                 right = ""
                 left = ""
@@ -201,7 +210,7 @@ class Command(DbdbBaseCommand):
                 if i < len(new_output): right = new_output[i]
                 output_buffer += f'  {left:30}  {right}\n'
             ## FOR
-            output[system.name] = output_buffer
+            output[names.get(system_id)] = output_buffer
         ## FOR
 
         # Print them sorted by name
@@ -210,36 +219,4 @@ class Command(DbdbBaseCommand):
 
         return
 
-    def top_k_systems(self, similarity, system_idx, k=6):
-        #assert system_idx in mapper
-        return [x for x in np.argsort(similarity[system_idx,:])[:-k-1:-1]]
-
-    def train_test_split(self, data):
-        test = np.zeros(data.shape)
-        train = data.copy()
-        for user_idx in range(data.shape[0]):
-            test_data = np.random.choice(data[user_idx, :].nonzero()[0],
-                                            size=10,
-                                            replace=True)
-            train[user_idx, test_data] = 0.
-            test[user_idx, test_data] = data[user_idx, test_data]
-
-        # Test and training are truly disjoint
-        assert(np.all((train * test) == 0))
-        return train, test
-
-    def compute_similarity(self, data, epsilon=1e-9):
-        # epsilon -> small number for handling dived-by-zero errors
-        sim = data.T.dot(data) + epsilon
-        norms = np.array([np.sqrt(np.diagonal(sim))])
-        return (sim / norms / norms.T)
-
-    def get_mse(self, pred, actual):
-        # Ignore nonzero terms.
-        pred = pred[actual.nonzero()].flatten()
-        actual = actual[actual.nonzero()].flatten()
-        return mean_squared_error(pred, actual)
-
-
-
     pass
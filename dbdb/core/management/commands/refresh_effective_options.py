@@ -0,0 +1,31 @@
+from dbdb.core.management.base import DbdbBaseCommand
+from dbdb.core.models import System
+from dbdb.core.utils.facets import bump_facet_index
+from dbdb.core.utils.features import refresh_effective_options
+
+
+class Command(DbdbBaseCommand):
+    help = 'Rebuild the materialized EffectiveFeatureOption table'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('system', metavar='S', type=str, nargs='?',
+                            help='Only refresh this system (id or name keyword) and the systems inheriting from it')
+        return
+
+    def handle(self, *args, **options):
+        system_ids = None
+        if options['system']:
+            keyword = options['system']
+            systems = System.objects.all()
+            if keyword.isdigit():
+                systems = systems.filter(id=int(keyword))
+            else:
+                systems = systems.filter(name__icontains=keyword)
+            system_ids = list(systems.values_list('id', flat=True))
+
+        num_rows = refresh_effective_options(system_ids)
+        bump_facet_index()
+        self.stdout.write(f"Wrote {num_rows} effective feature options")
+        return
+    pass
@@ -0,0 +1,23 @@
+import datetime
+
+from dbdb.core.management.base import DbdbBaseCommand
+from dbdb.core.utils.visits import refresh_view_counts, rollup_visits
+
+
+class Command(DbdbBaseCommand):
+    help = 'Roll up SystemVisit rows into SystemVisitDaily since the last rolled-up day and refresh view_count'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--since', type=datetime.date.fromisoformat, default=None, metavar='YYYY-MM-DD',
+                            help='Re-aggregate every day from this date (default: the last rolled-up day, or '
+                                 'the first day with visits written since)')
+        return
+
+    def handle(self, *args, **options):
+        written = rollup_visits(options['since'])
+        updated = refresh_view_counts()
+        self.stdout.write(f"Wrote {written} daily row(s). Updated view_count for {updated} system(s).")
+        return
+
+    pass
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 
 from dbdb.core.models import CitationUrl
+from dbdb.core.utils.pagecache import bump_citation_status
 
 
 class Command(BaseCommand):
@@ -88,4 +89,5 @@ class Command(BaseCommand):
             return
 
         updated = qs.update(status=new_status.value)
+        bump_citation_status()
         self.stdout.write(self.style.SUCCESS(f'Updated {updated} citation(s).'))
@@ -0,0 +1,22 @@
+from dbdb.core.management.base import DbdbBaseCommand
+from dbdb.core.utils.visitfilter import visit_filter_counts
+
+
+class Command(DbdbBaseCommand):
+    help = 'Show how many counter hits the ingest filter accepted and dropped, by reason'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--reset', action='store_true',
+                            help='Reset the counters after showing them')
+        return
+
+    def handle(self, *args, **options):
+        counts = visit_filter_counts(reset=options['reset'])
+        total = sum(counts.values())
+        for reason, hits in counts.items():
+            share = 100.0 * hits / total if total else 0.0
+            self.stdout.write(f"{reason:>10}  {hits:>10}  {share:5.1f}%")
+        return
+
+    pass
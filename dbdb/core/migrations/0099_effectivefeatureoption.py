@@ -0,0 +1,71 @@
+import collections
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_effective_options(apps, schema_editor):
+    SystemFeature = apps.get_model('core', 'SystemFeature')
+    EffectiveFeatureOption = apps.get_model('core', 'EffectiveFeatureOption')
+
+    sfs = SystemFeature.objects.filter(version__is_current=True).order_by()
+    by_key = {
+        (sys_id, fid): (sf_id, vid, parent_id)
+        for sf_id, vid, sys_id, fid, parent_id
+        in sfs.values_list('id', 'version_id', 'version__system_id', 'feature_id', 'system_id')
+    }
+    own = collections.defaultdict(list)
+    for sf_id, oid in SystemFeature.options.through.objects \
+            .filter(systemfeature__in=sfs) \
+            .values_list('systemfeature_id', 'featureoption_id'):
+        own[sf_id].append(oid)
+
+    def resolve(sys_id, fid, seen):
+        if (sys_id, fid) not in by_key:
+            return []
+        sf_id, _, parent_id = by_key[(sys_id, fid)]
+        if own[sf_id]:
+            return own[sf_id]
+        if parent_id is None or parent_id in seen:
+            return []
+        return resolve(parent_id, fid, seen | {parent_id})
+
+    rows = []
+    for (sys_id, fid), (sf_id, vid, parent_id) in by_key.items():
+        if own[sf_id]:
+            rows.extend(
+                EffectiveFeatureOption(version_id=vid, feature_id=fid, option_id=oid)
+                for oid in own[sf_id]
+            )
+        elif parent_id is not None:
+            rows.extend(
+                EffectiveFeatureOption(version_id=vid, feature_id=fid, option_id=oid,
+                                       inherited_from_id=parent_id)
+                for oid in resolve(parent_id, fid, {sys_id, parent_id})
+            )
+    EffectiveFeatureOption.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0098_unique_user_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectiveFeatureOption',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.feature')),
+                ('inherited_from', models.ForeignKey(blank=True, default=None, help_text='The system this option is inherited from (via SystemFeature.system)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.system')),
+                ('option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_options', to='core.featureoption')),
+                ('version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_options', to='core.systemversion')),
+            ],
+            options={
+                'unique_together': {('version', 'option')},
+                'indexes': [models.Index(fields=['feature', 'option'], name='core_effopt_feature_option')],
+            },
+        ),
+        migrations.RunPython(populate_effective_options, migrations.RunPython.noop),
+    ]
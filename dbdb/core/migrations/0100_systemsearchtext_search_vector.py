@@ -0,0 +1,36 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0099_effectivefeatureoption'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='systemsearchtext',
+            name='core_system_search__cf51c1_gin',
+        ),
+        migrations.AddField(
+            model_name='systemsearchtext',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Weighted tsvector of the search text (see update_searchtext)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='systemsearchtext',
+            index=django.contrib.postgres.indexes.GinIndex(fastupdate=False, fields=['search_vector'], name='core_systemsearch_vector_gin'),
+        ),
+        # Provisional weights until `manage.py generate_searchtext` rebuilds
+        # every row with the full name/term/prose split
+        migrations.RunSQL(
+            sql="""
+                UPDATE core_systemsearchtext
+                   SET search_vector = setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+                                    || setweight(to_tsvector('simple', coalesce(search_text, '')), 'B')
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
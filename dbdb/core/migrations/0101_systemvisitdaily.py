@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0100_systemsearchtext_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='systemvisit',
+            index=models.Index(fields=['created'], name='core_systemvisit_created'),
+        ),
+        migrations.CreateModel(
+            name='SystemVisitDaily',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('unique_visitors', models.PositiveIntegerField(default=0, help_text='Distinct (ip_address, user_agent) pairs')),
+                ('system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_visits', to='core.system')),
+            ],
+            options={
+                'verbose_name': 'Daily Visits',
+                'verbose_name_plural': 'Daily Visits',
+                'indexes': [models.Index(fields=['day'], name='core_visitdaily_day')],
+                'unique_together': {('system', 'day')},
+            },
+        ),
+        # Backfill from the raw visits; later days are added by rollup_visits
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO core_systemvisitdaily (system_id, day, visits, unique_visitors)
+                SELECT system_id, (created AT TIME ZONE 'UTC')::date,
+                       COUNT(*), COUNT(DISTINCT (ip_address, user_agent))
+                  FROM core_systemvisit
+                 GROUP BY 1, 2
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
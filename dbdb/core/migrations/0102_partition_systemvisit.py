@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# Rebuild core_systemvisit as a table range-partitioned by `created` with one
+# partition per UTC month (core_systemvisit_pYYYYMM). Postgres requires the
+# partition key in the primary key, so the constraint becomes (id, created);
+# the Django model still treats `id` alone as the primary key.
+# Later partitions are created by `manage.py partition_visits`.
+PARTITION_SQL = """
+ALTER TABLE core_systemvisit RENAME TO core_systemvisit_unpartitioned;
+
+CREATE SEQUENCE core_systemvisit_part_id_seq AS integer;
+SELECT setval('core_systemvisit_part_id_seq',
+              COALESCE((SELECT MAX(id) FROM core_systemvisit_unpartitioned), 0) + 1, false);
+
+CREATE TABLE core_systemvisit (
+    id          integer      NOT NULL DEFAULT nextval('core_systemvisit_part_id_seq'),
+    system_id   integer      NOT NULL
+                REFERENCES core_system (id) DEFERRABLE INITIALLY DEFERRED,
+    ip_address  inet         NOT NULL,
+    user_agent  varchar(128) NOT NULL,
+    created     timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, created)
+) PARTITION BY RANGE (created);
+
+DO $$
+DECLARE
+    month date := date_trunc('month', LEAST(
+        (SELECT MIN(created) FROM core_systemvisit_unpartitioned),
+        now() - interval '1 month') AT TIME ZONE 'UTC');
+    last_month date := date_trunc('month', (now() + interval '3 months') AT TIME ZONE 'UTC');
+BEGIN
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF core_systemvisit FOR VALUES FROM (%L) TO (%L)',
+            'core_systemvisit_p' || to_char(month, 'YYYYMM'),
+            month::timestamp AT TIME ZONE 'UTC',
+            (month + interval '1 month')::timestamp AT TIME ZONE 'UTC');
+        month := month + interval '1 month';
+    END LOOP;
+END $$;
+
+INSERT INTO core_systemvisit (id, system_id, ip_address, user_agent, created)
+SELECT id, system_id, ip_address, user_agent, created FROM core_systemvisit_unpartitioned;
+
+DROP TABLE core_systemvisit_unpartitioned;
+ALTER SEQUENCE core_systemvisit_part_id_seq OWNED BY core_systemvisit.id;
+
+CREATE INDEX core_systemvisit_created ON core_systemvisit (created);
+CREATE INDEX core_systemvisit_system_id ON core_systemvisit (system_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0101_systemvisitdaily'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=PARTITION_SQL,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0102_partition_systemvisit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemVisitor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visitor', models.BigIntegerField()),
+                ('first_seen', models.DateTimeField()),
+                ('weight', models.FloatField(default=1.0, help_text='Forward-decay weight of first_seen (1.0 without decay)')),
+                ('system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitors', to='core.system')),
+            ],
+            options={
+                'verbose_name': 'Visitor',
+                'indexes': [models.Index(fields=['first_seen'], name='core_systemvisitor_seen')],
+                'unique_together': {('visitor', 'system')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SystemCooccurrence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visitors', models.PositiveIntegerField(default=0)),
+                ('weight', models.FloatField(default=0.0)),
+                ('system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cooccurrences', to='core.system')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.system')),
+            ],
+            options={
+                'verbose_name': 'Co-occurrence',
+                'unique_together': {('system', 'other')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0103_cooccurrence'),
+    ]
+
+    operations = [
+        # Filled by rollup_visits; run `manage.py rollup_visits --since <date>`
+        # to sketch the days still in the raw visit partitions
+        migrations.AddField(
+            model_name='systemvisitdaily',
+            name='visitor_sketch',
+            field=models.BinaryField(blank=True, editable=False, null=True, help_text='HyperLogLog sketch of the visitors (see dbdb.core.utils.hll)'),
+        ),
+    ]
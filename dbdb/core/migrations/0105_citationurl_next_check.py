@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0104_systemvisitdaily_visitor_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='citationurl',
+            name='recheck_interval',
+            field=models.DurationField(blank=True, default=None, help_text='Current adaptive interval between checks', null=True),
+        ),
+        migrations.AddField(
+            model_name='citationurl',
+            name='next_check',
+            field=models.DateTimeField(blank=True, db_index=True, default=None, help_text='When the URL is next due to be recrawled', null=True),
+        ),
+        # Spread the first recrawl pass out from when each URL was last
+        # checked, using the starting intervals of the recrawl schedule
+        # (see dbdb.core.utils.citations). Unchecked URLs stay due now.
+        migrations.RunSQL(
+            """
+            UPDATE core_citationurl
+               SET recheck_interval = CASE status
+                                        WHEN 0 THEN interval '1 hour'
+                                        WHEN 1 THEN interval '7 days'
+                                        WHEN 2 THEN interval '1 day'
+                                        ELSE interval '90 days'
+                                      END
+             WHERE last_checked IS NOT NULL
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            "UPDATE core_citationurl SET next_check = last_checked + recheck_interval WHERE last_checked IS NOT NULL",
+            migrations.RunSQL.noop,
+        ),
+    ]
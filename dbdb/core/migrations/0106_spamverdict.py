@@ -0,0 +1,30 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0105_citationurl_next_check'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamVerdict',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_hash', models.CharField(help_text='SHA-256 of the normalized text the model saw', max_length=64)),
+                ('fingerprint', models.BigIntegerField(help_text='64-bit SimHash of the normalized text')),
+                ('model', models.CharField(max_length=100)),
+                ('prompt_version', models.PositiveSmallIntegerField()),
+                ('is_spam', models.BooleanField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('system', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.system')),
+            ],
+            options={
+                'verbose_name': 'Spam Verdict',
+                'indexes': [models.Index(fields=['system', 'model', 'prompt_version'], name='core_spamverdict_key')],
+                'constraints': [models.UniqueConstraint(fields=('text_hash', 'system', 'model', 'prompt_version'), name='unique_spam_verdict', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# Catch visits that fall outside every monthly partition (e.g. when
+# `manage.py partition_visits` has not run in time) instead of failing the
+# insert. partition_visits moves them into their monthly partitions.
+DEFAULT_PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS core_systemvisit_default PARTITION OF core_systemvisit DEFAULT;
+"""
+
+REVERSE_SQL = """
+ALTER TABLE core_systemvisit DETACH PARTITION core_systemvisit_default;
+DROP TABLE core_systemvisit_default;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0106_spamverdict'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=DEFAULT_PARTITION_SQL,
+            reverse_sql=REVERSE_SQL,
+        ),
+    ]
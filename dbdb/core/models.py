@@ -6,6 +6,7 @@ from colorfield.fields import ColorField
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Max
@@ -20,7 +21,6 @@ from django_countries.fields import CountryField
 # third-party imports
 from easy_thumbnails.fields import ThumbnailerField
 
-from dbdb.core.common.searchvector import SearchVector
 from dbdb.core.utils.logos import color_to_hex, extract_color, extract_dimensions
 
 
@@ -85,6 +85,10 @@ class CitationUrl(models.Model):
     last_etag = models.CharField(max_length=100, default=None, blank=True, null=True)
     last_cachecontrol = models.JSONField(default=dict, blank=True, null=True)
     last_statuscode = models.PositiveIntegerField(default=None, blank=True, null=True, db_comment="HTTP Status Code")
+    recheck_interval = models.DurationField(default=None, blank=True, null=True,
+                                            help_text="Current adaptive interval between checks")
+    next_check = models.DateTimeField(default=None, blank=True, null=True, db_index=True,
+                                      help_text="When the URL is next due to be recrawled")
 
     @property
     def display_url(self):
@@ -231,6 +235,43 @@ class CitationUrlContent(models.Model):
     pass
 
 
+# ==============================================
+# SpamVerdict
+# ==============================================
+class SpamVerdict(models.Model):
+    """
+    Cached answer of the LLM spam checker for one page text, so unchanged
+    (or nearly unchanged) pages are not classified again on every recrawl.
+    See dbdb.core.utils.spam.is_spam().
+    """
+
+    text_hash = models.CharField(max_length=64, help_text="SHA-256 of the normalized text the model saw")
+    fingerprint = models.BigIntegerField(help_text="64-bit SimHash of the normalized text")
+    system = models.ForeignKey('System', models.CASCADE, null=True, blank=True, related_name='+')
+    model = models.CharField(max_length=100)
+    prompt_version = models.PositiveSmallIntegerField()
+    is_spam = models.BooleanField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{'Spam' if self.is_spam else 'Not spam'} [{self.model}] {self.text_hash[:12]}"
+
+    class Meta:
+        verbose_name = "Spam Verdict"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['text_hash', 'system', 'model', 'prompt_version'],
+                nulls_distinct=False,
+                name='unique_spam_verdict',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['system', 'model', 'prompt_version'], name='core_spamverdict_key'),
+        ]
+
+    pass
+
+
 # ==============================================
 # DocPage
 # ==============================================
@@ -538,14 +579,21 @@ class SystemFeature(models.Model):
         """Return the resolved FeatureOption list for this SystemFeature.
 
         If this instance has its own options, return them.
-        If it delegates to a parent system, recurse into that system's
-        corresponding SystemFeature.
+        If it delegates to a parent system, use the materialized
+        EffectiveFeatureOption rows (current versions only) or else recurse
+        into that system's corresponding SystemFeature.
         Otherwise return an empty list.
         """
         own = list(self.options.all())
         if own:
             return own
-        if self.system is not None:
+        if self.system_id is not None:
+            inherited = list(FeatureOption.objects.filter(
+                effective_options__version_id=self.version_id,
+                effective_options__feature_id=self.feature_id,
+            ))
+            if inherited:
+                return inherited
             try:
                 parent_sf = SystemFeature.objects.get(
                     version=self.system.current(),
@@ -569,6 +617,34 @@ class SystemFeature(models.Model):
 
     pass
 
+# ==============================================
+# EffectiveFeatureOption
+# ==============================================
+class EffectiveFeatureOption(models.Model):
+    """
+    The resolved FeatureOptions of every current SystemVersion, with
+    SystemFeature.system inheritance already applied. Maintained by
+    dbdb.core.utils.features.refresh_effective_options().
+    """
+
+    version = models.ForeignKey('SystemVersion', models.CASCADE, related_name='effective_options')
+    feature = models.ForeignKey('Feature', models.CASCADE, related_name='+')
+    option = models.ForeignKey('FeatureOption', models.CASCADE, related_name='effective_options')
+    inherited_from = models.ForeignKey('System', models.CASCADE, blank=True, null=True, default=None,
+                                       related_name='+',
+                                       help_text="The system this option is inherited from (via SystemFeature.system)")
+
+    class Meta:
+        unique_together = ('version', 'option')
+        indexes = [
+            models.Index(fields=['feature', 'option'], name='core_effopt_feature_option'),
+        ]
+
+    def __str__(self):
+        return f'{self.version} > {self.option}'
+
+    pass
+
 # ==============================================
 # SystemRedirect
 # ==============================================
@@ -597,6 +673,91 @@ class SystemVisit(models.Model):
 
     class Meta:
         verbose_name = "Visit"
+        indexes = [
+            models.Index(fields=['created'], name='core_systemvisit_created'),
+        ]
+
+    pass
+
+# ==============================================
+# SystemVisitDaily
+# ==============================================
+class SystemVisitDaily(models.Model):
+    """
+    Per-system visit totals for each UTC day, rolled up from SystemVisit by
+    dbdb.core.utils.visits.rollup_visits().
+    """
+
+    system = models.ForeignKey('System', models.CASCADE, related_name='daily_visits')
+    day = models.DateField()
+    visits = models.PositiveIntegerField(default=0)
+    unique_visitors = models.PositiveIntegerField(default=0,
+                                                  help_text="Distinct (ip_address, user_agent) pairs")
+    visitor_sketch = models.BinaryField(null=True, blank=True, editable=False,
+                                        help_text="HyperLogLog sketch of the visitors (see dbdb.core.utils.hll)")
+
+    def __str__(self):
+        return f'{self.system} @ {self.day}: {self.visits}'
+
+    class Meta:
+        verbose_name = "Daily Visits"
+        verbose_name_plural = "Daily Visits"
+        unique_together = ('system', 'day')
+        indexes = [
+            models.Index(fields=['day'], name='core_visitdaily_day'),
+        ]
+
+    pass
+
+# ==============================================
+# SystemVisitor
+# ==============================================
+class SystemVisitor(models.Model):
+    """
+    Distinct (visitor, system) pairs seen in SystemVisit, where the visitor is
+    the (ip_address, user_agent) pair hashed to a bigint. Maintained by
+    dbdb.core.utils.recommender.update_cooccurrences().
+    """
+
+    visitor = models.BigIntegerField()
+    system = models.ForeignKey('System', models.CASCADE, related_name='visitors')
+    first_seen = models.DateTimeField()
+    weight = models.FloatField(default=1.0,
+                               help_text="Forward-decay weight of first_seen (1.0 without decay)")
+
+    def __str__(self):
+        return f'{self.visitor} -> {self.system}'
+
+    class Meta:
+        verbose_name = "Visitor"
+        unique_together = ('visitor', 'system')
+        indexes = [
+            models.Index(fields=['first_seen'], name='core_systemvisitor_seen'),
+        ]
+
+    pass
+
+# ==============================================
+# SystemCooccurrence
+# ==============================================
+class SystemCooccurrence(models.Model):
+    """
+    Number of visitors that viewed both systems (and the decayed weight of
+    those co-visits), stored in both directions. The row with system == other
+    holds the system's own visitor count and squared norm.
+    """
+
+    system = models.ForeignKey('System', models.CASCADE, related_name='cooccurrences')
+    other = models.ForeignKey('System', models.CASCADE, related_name='+')
+    visitors = models.PositiveIntegerField(default=0)
+    weight = models.FloatField(default=0.0)
+
+    def __str__(self):
+        return f'({self.system}, {self.other}): {self.visitors}'
+
+    class Meta:
+        verbose_name = "Co-occurrence"
+        unique_together = ('system', 'other')
 
     pass
 
@@ -626,12 +787,14 @@ class SystemSearchText(models.Model):
     name = models.CharField(max_length=64, blank=False, null=False)
     search_text = models.TextField(default=None, null=True,
                                    help_text="Synthesized text for searching")
+    search_vector = SearchVectorField(null=True, editable=False,
+                                      help_text="Weighted tsvector of the search text (see update_searchtext)")
     created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "System Search Text"
         indexes = [
-            GinIndex(SearchVector("search_text", config="simple"), name="core_system_search__cf51c1_gin", fastupdate=False)
+            GinIndex(fields=["search_vector"], name="core_systemsearch_vector_gin", fastupdate=False)
         ]
 
     pass
@@ -1107,6 +1270,7 @@ __all__ = (
     'CitationUrl',
     'CitationUrlContent',
     'DocPage',
+    'EffectiveFeatureOption',
     'Feature',
     'FeatureOption',
     'FlatPageMeta',
@@ -1114,16 +1278,20 @@ __all__ = (
     'RepositoryInfo',
     'RepositorySnapshot',
     'SavedSearch',
+    'SpamVerdict',
     'SystemSuggestion',
     'System',
     'SystemFeature',
     'SystemVersion',
     'SystemVersionCodingAgent',
     'SystemACL',
+    'SystemCooccurrence',
     'SystemRecommendation',
     'SystemRedirect',
     'SystemSearchText',
     'SystemVisit',
+    'SystemVisitDaily',
+    'SystemVisitor',
     'user_can_edit_system',
 )
 
@@ -1,5 +1,7 @@
 import logging
 
+from django.db.models.signals import post_save
+
 from dbdb.core.models import Organization, OrgType
 
 LOG = logging.getLogger(__name__)
@@ -62,3 +64,80 @@ def developer_orgs_changed(sender, instance, action, **kwargs):
     if len(orgs) != 1:
         return
     maybe_mark_individual(orgs[0])
+
+
+def _refresh_system_feature(system_feature):
+    """Re-materialize the effective options of a SystemFeature on a current version."""
+    from dbdb.core.utils.facets import bump_facet_index
+    from dbdb.core.utils.features import refresh_effective_options
+    version = system_feature.version
+    if not version.is_current:
+        return
+    refresh_effective_options([version.system_id], [system_feature.feature_id])
+    bump_facet_index()
+
+
+def system_feature_saved(sender, instance, created, **kwargs):
+    # New rows only matter once they have options or inherit from another system
+    if created and instance.system_id is None:
+        return
+    _refresh_system_feature(instance)
+
+
+def system_feature_options_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance is a FeatureOption; refresh everything using its Feature
+        from dbdb.core.utils.facets import bump_facet_index
+        from dbdb.core.utils.features import refresh_effective_options
+        refresh_effective_options(None, [instance.feature_id])
+        bump_facet_index()
+        return
+    _refresh_system_feature(instance)
+
+
+def facet_definitions_changed(sender, **kwargs):
+    """Feature/Attribute (or option) edits change the browse sidebar and index."""
+    from dbdb.core.utils.facets import bump_facet_index
+    from dbdb.core.utils.pagecache import bump_page_cache, bump_system_pages
+    bump_facet_index()
+    bump_page_cache()
+    bump_system_pages()
+
+
+def organization_changed(sender, **kwargs):
+    """Org names and logos appear on cached system, browse and stats pages."""
+    from dbdb.core.utils.pagecache import bump_page_cache, bump_system_pages
+    bump_page_cache()
+    bump_system_pages()
+
+
+# CitationUrl fields shown on system pages
+CITATION_DISPLAY_FIELDS = ('url', 'status', 'last_title')
+
+
+def _citation_capture_state(sender, instance, **kwargs):
+    """Store the displayed DB values on the instance before save."""
+    if instance.pk:
+        instance._original_display = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list(*CITATION_DISPLAY_FIELDS)
+            .first()
+        )
+    else:
+        instance._original_display = None
+
+
+def citation_changed(sender, instance, **kwargs):
+    """
+    Citation URLs, titles and statuses are listed on cached system pages.
+    Saves that leave them unchanged (e.g. a crawl that got a 304) do not
+    invalidate anything.
+    """
+    from dbdb.core.utils.pagecache import bump_citation_status
+    if kwargs.get('signal') is post_save and not kwargs.get('created'):
+        current = tuple(getattr(instance, f) for f in CITATION_DISPLAY_FIELDS)
+        if getattr(instance, '_original_display', None) == current:
+            return
+    bump_citation_status()
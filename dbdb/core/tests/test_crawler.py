@@ -0,0 +1,182 @@
+import datetime
+import io
+import threading
+import time
+import zipfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from dbdb.core.models import CitationUrl, CitationUrlContent
+from dbdb.core.utils.citations import (
+    RECHECK_DEAD,
+    RECHECK_INTERVAL,
+    RECHECK_MAX,
+    _extract_pdf_prefix_metadata,
+    _extract_pptx_prefix_title,
+    _read_body,
+    process_citation_url,
+    recrawl_queue,
+)
+from dbdb.core.utils.crawler import CrawlScheduler, DomainThrottle, registered_domain
+
+
+class CrawlSchedulerTestCase(SimpleTestCase):
+
+    def _crawl(self, urls, **kwargs):
+        starts = {}
+        lock = threading.Lock()
+
+        def fetch(url):
+            with lock:
+                starts[url] = time.monotonic()
+            time.sleep(0.2)
+            return url.upper()
+
+        results = list(CrawlScheduler(**kwargs).run(urls, lambda u: u, fetch))
+        return starts, results
+
+    def test_registered_domain(self):
+        self.assertEqual(registered_domain("https://docs.example.com/a"), "example.com")
+        self.assertEqual(registered_domain("http://www.example.co.uk"), "example.co.uk")
+        self.assertEqual(registered_domain("http://127.0.0.1:8000/x"), "127.0.0.1")
+
+    def test_throttle_spaces_requests(self):
+        throttle = DomainThrottle(interval=10, burst=2, max_active=5, now=0)
+        for _ in range(2):
+            self.assertEqual(throttle.delay(0), 0)
+            throttle.start(0)
+        self.assertAlmostEqual(throttle.delay(0), 10)
+        self.assertAlmostEqual(throttle.delay(4), 6)
+        self.assertEqual(throttle.delay(10), 0)
+
+    def test_throttle_caps_concurrency(self):
+        throttle = DomainThrottle(interval=0, max_active=1, now=0)
+        throttle.start(0)
+        self.assertIsNone(throttle.delay(100))
+        throttle.finish()
+        self.assertEqual(throttle.delay(100), 0)
+
+    def test_domains_crawl_in_parallel(self):
+        urls = [f"https://site{i}.example{i}.org/page" for i in range(4)]
+        starts, results = self._crawl(urls, workers=4, interval=1.0)
+        self.assertCountEqual([r for _, r, _ in results], [u.upper() for u in urls])
+        # Four different domains all start at once
+        self.assertLess(max(starts.values()) - min(starts.values()), 0.1)
+
+    def test_same_domain_is_spaced(self):
+        urls = ["https://a.example.com/1", "https://b.example.com/2", "https://other.org/3"]
+        starts, _ = self._crawl(urls, workers=4, interval=0.3)
+        self.assertGreaterEqual(starts[urls[1]] - starts[urls[0]], 0.29)
+        self.assertLess(starts[urls[2]] - starts[urls[0]], 0.1)
+
+    def test_errors_are_returned(self):
+        def fetch(url):
+            raise ValueError(url)
+
+        [(item, result, error)] = list(CrawlScheduler(interval=0).run(["https://example.com"], str, fetch))
+        self.assertIsNone(result)
+        self.assertIsInstance(error, ValueError)
+
+    pass
+
+
+def _response(url, **overrides):
+    info = {
+        "url": url,
+        "status": CitationUrl.Status.VALID,
+        "status-code": 200,
+        "content-type": "text/html",
+        "content-length": None,
+        "title": "Page",
+        "etag": '"v1"',
+        "last-modified": None,
+        "cache-control": {},
+        "revalidate": None,
+        "raw": "<html>text</html>",
+        "text": "text",
+    }
+    info.update(overrides)
+    return info
+
+
+@patch('dbdb.core.utils.citations.fetch_url_metadata')
+class RecrawlScheduleTestCase(TestCase):
+
+    def test_unchanged_page_is_revalidated(self, fetch):
+        c = CitationUrl.objects.create(url="https://example.com/a")
+        fetch.return_value = _response(c.url)
+        process_citation_url(c)
+        self.assertEqual(c.recheck_interval, RECHECK_INTERVAL)
+
+        fetch.return_value = _response(c.url, **{"status-code": 304, "title": None, "raw": None, "text": None})
+        process_citation_url(c)
+        self.assertEqual(fetch.call_args.kwargs["if_none_match"], '"v1"')
+        c.refresh_from_db()
+        self.assertEqual(c.last_title, "Page")
+        self.assertEqual(c.last_statuscode, 200)
+        self.assertEqual(CitationUrlContent.objects.get(citation=c).text, "text")
+        # Unchanged pages are checked less and less often
+        self.assertEqual(c.recheck_interval, RECHECK_INTERVAL * 1.5)
+        self.assertEqual(c.next_check, c.last_checked + c.recheck_interval)
+
+    def test_interval_follows_cache_control(self, fetch):
+        c = CitationUrl.objects.create(url="https://example.com/b")
+        fetch.return_value = _response(c.url, **{"cache-control": {"immutable": True}})
+        process_citation_url(c)
+        self.assertEqual(c.recheck_interval, RECHECK_MAX)
+
+    def test_dead_pages_back_off(self, fetch):
+        c = CitationUrl.objects.create(url="https://example.com/c")
+        fetch.return_value = _response(c.url, status=CitationUrl.Status.DEAD, **{"status-code": 404})
+        process_citation_url(c)
+        self.assertEqual(c.recheck_interval, RECHECK_DEAD)
+        process_citation_url(c)
+        self.assertEqual(c.recheck_interval, RECHECK_DEAD * 2)
+
+    def test_queue_order(self, fetch):
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        valid = CitationUrl.objects.create(url="https://example.com/valid", status=CitationUrl.Status.VALID,
+                                           last_checked=now - 9 * day, next_check=now - 2 * day)
+        dead = CitationUrl.objects.create(url="https://example.com/dead", status=CitationUrl.Status.DEAD,
+                                          last_checked=now - day, next_check=now - 60)
+        later = CitationUrl.objects.create(url="https://example.com/later", status=CitationUrl.Status.VALID,
+                                           last_checked=now, next_check=now + day)
+        new = CitationUrl.objects.create(url="https://example.com/new")
+        self.assertEqual(list(recrawl_queue()), [new, dead, valid, later])
+        self.assertEqual(list(recrawl_queue(due_only=True)), [new, dead, valid])
+
+    pass
+
+
+class BoundedReadTestCase(SimpleTestCase):
+
+    def test_read_stops_at_limit(self):
+        class Response:
+            def iter_content(self, chunk_size):
+                while True:
+                    yield b"x" * chunk_size
+
+        data, truncated = _read_body(Response(), 100_000)
+        self.assertTrue(truncated)
+        self.assertEqual(len(data), 100_000)
+
+    def test_pdf_metadata_from_prefix(self):
+        data = (b"%PDF-1.4\n1 0 obj\n<< /Title (Bigtable: A Distributed Storage System) "
+                b"/CreationDate (D:20060102030405+01'00') /ModDate (D:20070101000000Z) >>\nendobj\n")
+        title, oldest = _extract_pdf_prefix_metadata(data + b"stream...")
+        self.assertEqual(title, "Bigtable: A Distributed Storage System")
+        self.assertEqual(oldest, datetime.datetime(2006, 1, 2, 2, 4, 5, tzinfo=datetime.UTC))
+
+    def test_pptx_title_from_prefix(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('[Content_Types].xml', '<Types/>')
+            archive.writestr('docProps/core.xml', '<cp:coreProperties><dc:title>Query &amp; Storage</dc:title>'
+                                                  '</cp:coreProperties>')
+            archive.writestr('ppt/slides/slide1.xml', 'x' * 100_000)
+        self.assertEqual(_extract_pptx_prefix_title(buf.getvalue()[:1024]), "Query & Storage")
+
+    pass
@@ -0,0 +1,78 @@
+"""
+Tests for the materialized EffectiveFeatureOption table and
+refresh_effective_options() in utils/features.py
+"""
+from django.test import TestCase
+
+from dbdb.core.models import (
+    EffectiveFeatureOption,
+    Feature,
+    FeatureOption,
+    System,
+    SystemFeature,
+    SystemVersion,
+)
+from dbdb.core.utils.features import refresh_effective_options
+
+_FIXTURES = [
+    'adminuser.json',
+    'core_features.json',
+    'core_attributes.json',
+    'core_system.json',
+]
+
+
+class EffectiveFeatureOptionTestCase(TestCase):
+
+    fixtures = _FIXTURES
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.sqlite = System.objects.get(slug='sqlite')
+        cls.child = System.objects.get(name='XXX')
+        cls.feature = Feature.objects.get(slug='storage-model')
+        cls.rowstore = FeatureOption.objects.get(feature=cls.feature, slug='n-ary-storage-model-rowrecord')
+        cls.columnar = FeatureOption.objects.get(feature=cls.feature, slug='decomposition-storage-model-columnar')
+
+    def _options(self, system):
+        return set(
+            EffectiveFeatureOption.objects
+            .filter(version__system=system, version__is_current=True, feature=self.feature)
+            .values_list('option__slug', flat=True)
+        )
+
+    def _inherit(self):
+        child_ver = SystemVersion.objects.get(system=self.child, is_current=True)
+        return SystemFeature.objects.create(version=child_ver, feature=self.feature, system=self.sqlite)
+
+    def test_direct_options_materialized(self):
+        self.assertEqual(self._options(self.sqlite), {self.rowstore.slug})
+
+    def test_inherited_options_materialized(self):
+        self._inherit()
+        self.assertEqual(self._options(self.child), {self.rowstore.slug})
+        row = EffectiveFeatureOption.objects.get(version__system=self.child, option=self.rowstore)
+        self.assertEqual(row.inherited_from_id, self.sqlite.id)
+
+    def test_parent_option_change_updates_child(self):
+        self._inherit()
+        parent_sf = SystemFeature.objects.get(version__system=self.sqlite, version__is_current=True,
+                                              feature=self.feature)
+        parent_sf.options.set([self.columnar])
+        self.assertEqual(self._options(self.child), {self.columnar.slug})
+
+    def test_own_options_override_inherited(self):
+        child_sf = self._inherit()
+        child_sf.options.add(self.columnar)
+        self.assertEqual(self._options(self.child), {self.columnar.slug})
+        self.assertEqual(child_sf.get_my_or_parent_options(), [self.columnar])
+
+    def test_full_rebuild_matches_incremental(self):
+        self._inherit()
+        before = set(EffectiveFeatureOption.objects.values_list('version_id', 'option_id', 'inherited_from_id'))
+        refresh_effective_options()
+        after = set(EffectiveFeatureOption.objects.values_list('version_id', 'option_id', 'inherited_from_id'))
+        self.assertEqual(before, after)
+
+    pass
@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from dbdb.core.models import SpamVerdict
+from dbdb.core.utils import spam
+
+PAGE = " ".join(f"SQLite stores table {i} in a single file with B-tree pages." for i in range(20))
+
+
+@patch('dbdb.core.utils.spam._run_prompt', return_value="false")
+class SpamVerdictCacheTestCase(TestCase):
+
+    def test_identical_text_skips_llm(self, run_prompt):
+        self.assertFalse(spam.is_spam(PAGE, None, model="m1"))
+        # Whitespace and case are normalized away
+        self.assertFalse(spam.is_spam("  " + PAGE.upper(), None, model="m1"))
+        self.assertEqual(run_prompt.call_count, 1)
+        self.assertEqual(SpamVerdict.objects.count(), 1)
+
+    def test_similar_text_reuses_verdict(self, run_prompt):
+        run_prompt.return_value = "true"
+        self.assertTrue(spam.is_spam(PAGE + " Updated 2026-10-17 09:00", None, model="m1"))
+        self.assertTrue(spam.is_spam(PAGE + " Updated 2026-10-18 10:30", None, model="m1"))
+        self.assertEqual(run_prompt.call_count, 1)
+
+    @override_settings(CRAWLER_SPAM_VERDICT_SIMILARITY=1.0)
+    def test_similarity_disabled(self, run_prompt):
+        spam.is_spam(PAGE + " Updated 2026-10-17 09:00", None, model="m1")
+        spam.is_spam(PAGE + " Updated 2026-10-18 10:30", None, model="m1")
+        self.assertEqual(run_prompt.call_count, 2)
+
+    def test_verdicts_are_per_model_and_prompt(self, run_prompt):
+        spam.is_spam(PAGE, None, model="m1")
+        spam.is_spam(PAGE, None, model="m2")
+        with patch.object(spam, 'PROMPT_VERSION', spam.PROMPT_VERSION + 1):
+            spam.is_spam(PAGE, None, model="m1")
+        self.assertEqual(run_prompt.call_count, 3)
+
+    pass
@@ -5,15 +5,33 @@ import environ
 import jwt
 from django.conf import settings
 from django.contrib.auth import get_user, get_user_model
+from django.contrib.postgres.search import SearchVector
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.models import Value
+from django.http import QueryDict
 from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 # local imports
-from dbdb.core.models import Attribute, Feature, System, SystemSearchText, SystemVersion, SystemVisit
-from dbdb.core.utils.searchtext import generate_searchtext
+from dbdb.core.models import (
+    Attribute,
+    CitationUrl,
+    Feature,
+    System,
+    SystemFeature,
+    SystemSearchText,
+    SystemVersion,
+    SystemVisit,
+)
+from dbdb.core.utils.facets import FacetIndex, bump_facet_index
+from dbdb.core.utils.pagecache import bump_page_cache, bump_related_systems, get_page_generation
+from dbdb.core.utils.searchtext import update_searchtext
 from dbdb.core.views import CounterView
 from dbdb.core.views.auth import CreateUserView, SetupUserView, SignupRequestView
-from dbdb.core.views.browse import _is_doi_query
+from dbdb.core.views.browse import BrowseView, ColumnLoader, _is_doi_query, load_column
 
 root = environ.Path(__file__) - 4
 
@@ -40,10 +58,7 @@ class SearchTestCase(TestCase):
     def setUpTestData(cls):
         super().setUpTestData()
         for ver in SystemVersion.objects.filter(is_current=True):
-            sst, _ = SystemSearchText.objects.update_or_create(system=ver.system)
-            sst.name = ver.system.name
-            sst.search_text = generate_searchtext(ver)
-            sst.save()
+            update_searchtext(ver)
 
     def test_search_no_parameters(self):
         response = self.client.get(reverse('browse'))
@@ -71,6 +86,15 @@ class SearchTestCase(TestCase):
         response = self.client.get(reverse('browse'), data={'q': 'https://doi.org/10.1145/3786704'})
         self.assertEqual(response.status_code, 200)
 
+    def test_search_ranks_name_above_description(self):
+        SystemVersion.objects.filter(system__name='XXX', is_current=True) \
+            .update(description='An embedded engine similar to SQLite.')
+        update_searchtext(SystemVersion.objects.get(system__name='XXX', is_current=True))
+
+        response = self.client.get(reverse('browse'), data={'q': 'sqlite'})
+        names = [r['name'] for r in response.context['results']]
+        self.assertEqual(names, ['SQLite', 'XXX'])
+
     pass
 
 # ==============================================
@@ -90,10 +114,7 @@ class AutoCompleteTestCase(TestCase):
     def setUpTestData(cls):
         super().setUpTestData()
         for ver in SystemVersion.objects.filter(is_current=True):
-            sst, _ = SystemSearchText.objects.update_or_create(system=ver.system)
-            sst.name = ver.system.name
-            sst.search_text = generate_searchtext(ver)
-            sst.save()
+            update_searchtext(ver)
 
     def test_autocom_valid_parameters(self):
         target = "SQLite"
@@ -196,6 +217,40 @@ class SystemViewTestCase(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn('unrecognized', response.json()['status'])
 
+    def test_query_budget_independent_of_features(self):
+        system = System.objects.get(name='SQLite')
+        version = system.current()
+        linked = System.objects.get(name='XXX')
+        url = reverse('system', args=[system.slug])
+        features = iter(Feature.objects
+                        .exclude(id__in=version.features.values_list('feature_id', flat=True))
+                        .order_by('id'))
+
+        def _add_features(count):
+            # Every other feature is "same as" another system
+            for i in range(count):
+                feature = next(features)
+                sf = SystemFeature.objects.create(
+                    version=version, feature=feature, description=f'About {feature.label}',
+                    system=linked if i % 2 else None)
+                sf.options.set(feature.options.all()[:2])
+                sf.citations.add(CitationUrl.objects.create(url=f'https://example.com/{feature.slug}'))
+            return
+
+        def _num_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries)
+
+        _add_features(2)
+        _num_queries()  # warm up per-process caches (e.g. ContentTypes)
+        baseline = _num_queries()
+
+        _add_features(10)
+        self.assertEqual(_num_queries(), baseline)
+        return
+
     pass
 
 # ==============================================
@@ -421,6 +476,225 @@ class NegationFilterTestCase(TestCase):
 
     pass
 
+# ==============================================
+# FacetIndexTestCase
+# ==============================================
+class FacetIndexTestCase(TestCase):
+    """The in-memory bitmap index used by BrowseView.do_search."""
+
+    fixtures = [
+        'adminuser.json',
+        'testuser.json',
+        'core_features.json',
+        'core_attributes.json',
+        'core_system.json',
+    ]
+
+    def test_ids_round_trip(self):
+        index = FacetIndex.build()
+        current = sorted(SystemVersion.objects.filter(is_current=True).values_list('id', flat=True))
+        self.assertEqual(index.ids(index.universe), current)
+        self.assertEqual(index.ids(0), [])
+
+    def test_feature_option_bits(self):
+        from dbdb.core.models import FeatureOption
+        index = FacetIndex.build()
+        sv = SystemVersion.objects.get(system__name='SQLite', is_current=True)
+        rowstore = FeatureOption.objects.get(feature__slug='storage-model', slug='n-ary-storage-model-rowrecord')
+        columnar = FeatureOption.objects.get(feature__slug='storage-model', slug='decomposition-storage-model-columnar')
+        self.assertEqual(index.ids(index.get(('feature+inherited', rowstore.id))), [sv.id])
+        self.assertEqual(index.ids(index.all_of([
+            ('feature+inherited', rowstore.id), ('feature+inherited', columnar.id),
+        ])), [])
+
+    def test_country_matches_any_listed_code(self):
+        sv = SystemVersion.objects.get(system__name='SQLite', is_current=True)
+        SystemVersion.objects.filter(pk=sv.pk).update(countries='US,CA')
+        bump_facet_index()
+        response = self.client.get(reverse('browse'), data={'country': 'ca'})
+        self.assertContains(response, 'SQLite')
+
+    pass
+
+# ==============================================
+# FacetCatalogCacheTestCase
+# ==============================================
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'facet-catalog-tests',
+    }
+})
+class FacetCatalogCacheTestCase(TestCase):
+    """The browse sidebar is served from the cache until a facet definition changes."""
+
+    fixtures = [
+        'adminuser.json',
+        'testuser.json',
+        'core_features.json',
+        'core_attributes.json',
+        'core_system.json',
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_catalog_served_from_cache(self):
+        view = BrowseView()
+        groups, groups_json = view.get_filter_groups(QueryDict())
+        with self.assertNumQueries(0):
+            cached_groups, cached_json = view.get_filter_groups(QueryDict())
+        self.assertEqual(groups, cached_groups)
+        self.assertEqual(groups_json, cached_json)
+
+    def test_feature_edit_invalidates_catalog(self):
+        view = BrowseView()
+        view.get_filter_groups(QueryDict())
+        Feature.objects.create(slug='test-feature', label='Test Feature')
+        groups, _ = view.get_filter_groups(QueryDict())
+        self.assertIn('test-feature', [fg.id for fg in groups])
+
+    def test_choice_counts_follow_result_set(self):
+        view = BrowseView()
+        sqlite = SystemVersion.objects.get(system__name='SQLite', is_current=True)
+        other = SystemVersion.objects.get(system__name='XXX', is_current=True)
+
+        def rowstore_count(result_ids):
+            _, groups_json = view.get_filter_groups(QueryDict(), result_ids)
+            storage = next(fg for fg in groups_json if fg['id'] == 'storage-model')
+            return next(c['count'] for c in storage['choices'] if c['id'] == 'n-ary-storage-model-rowrecord')
+
+        self.assertEqual(rowstore_count([sqlite.id, other.id]), 1)
+        self.assertEqual(rowstore_count([other.id]), 0)
+
+        # The cached catalog itself never carries counts
+        _, groups_json = view.get_filter_groups(QueryDict())
+        self.assertTrue(all(c['count'] is None for fg in groups_json for c in fg['choices']))
+
+    pass
+
+# ==============================================
+# PageCacheTestCase
+# ==============================================
+@override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'page-cache-l2'},
+        'local':   {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'page-cache-l1'},
+    },
+    DBDB_PAGE_CACHE_TIMEOUT=60,
+)
+class PageCacheTestCase(TestCase):
+    """Anonymous GETs are served from the page cache until its generation is bumped."""
+
+    fixtures = [
+        'adminuser.json',
+        'testuser.json',
+        'core_features.json',
+        'core_attributes.json',
+        'core_system.json',
+    ]
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['local'].clear()
+
+    def test_anonymous_hit_runs_no_queries(self):
+        first = self.client.get(reverse('browse'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('browse'))
+        self.assertEqual(first.content, second.content)
+
+    def test_bump_invalidates_pages(self):
+        self.client.get(reverse('browse'))
+        System.objects.filter(name='XXX').update(name='Renamed')
+        bump_page_cache()
+        self.assertContains(self.client.get(reverse('browse')), 'Renamed')
+
+    def test_organization_save_invalidates_pages(self):
+        from dbdb.core.models import Organization
+        self.client.get(reverse('browse'))
+        generation = get_page_generation()
+        Organization.objects.create(name='Cache Test Org', slug='cache-test-org')
+        self.assertNotEqual(get_page_generation(), generation)
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.login(username='admin', password='testpassword')
+        self.client.get(reverse('browse'))
+        self.assertEqual(len(caches['local']._cache), 0)
+
+    pass
+
+# ==============================================
+# SystemPageCacheTestCase
+# ==============================================
+@override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'system-cache-l2'},
+        'local':   {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'system-cache-l1'},
+    },
+    DBDB_PAGE_CACHE_TIMEOUT=60,
+)
+class SystemPageCacheTestCase(TestCase):
+    """System pages are keyed by the system's version and stamps, not the page generation."""
+
+    fixtures = [
+        'adminuser.json',
+        'testuser.json',
+        'core_features.json',
+        'core_attributes.json',
+        'core_system.json',
+    ]
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['local'].clear()
+        self.system = System.objects.get(name='SQLite')
+        self.url = reverse('system', args=[self.system.slug])
+
+    def _rename(self, name):
+        System.objects.filter(pk=self.system.pk).update(name=name)
+
+    def test_etag_not_modified(self):
+        first = self.client.get(self.url)
+        self.assertIn('ETag', first)
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_page_generation_does_not_evict(self):
+        self.client.get(self.url)
+        bump_page_cache()
+        # Only the System lookup that builds the key
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_related_stamp_invalidates(self):
+        self.client.get(self.url)
+        self._rename('Renamed')
+        self.assertNotContains(self.client.get(self.url), 'Renamed')
+        bump_related_systems([self.system.id])
+        self.assertContains(self.client.get(self.url), 'Renamed')
+
+    def test_citation_save_invalidates(self):
+        self.client.get(self.url)
+        self._rename('Renamed')
+        CitationUrl.objects.create(url='https://example.com/cache-test')
+        self.assertContains(self.client.get(self.url), 'Renamed')
+
+    def test_unchanged_citation_save_keeps_cache(self):
+        citation = CitationUrl.objects.create(url='https://example.com/cache-test')
+        self.client.get(self.url)
+        self._rename('Renamed')
+        # A recrawl that only touches last_checked leaves the page alone
+        citation.last_checked = timezone.now()
+        citation.save()
+        self.assertNotContains(self.client.get(self.url), 'Renamed')
+
+        citation.status = CitationUrl.Status.DEAD
+        citation.save()
+        self.assertContains(self.client.get(self.url), 'Renamed')
+
+    pass
+
 # ==============================================
 # BrowseColumnTestCase
 # ==============================================
@@ -508,6 +782,15 @@ class BrowseColumnTestCase(TestCase):
         names = [d['name'] for d in cv['data']]
         self.assertIn('Public Domain', names)
 
+    def test_column_loader_is_one_query(self):
+        """Each multi-valued column is fetched with a single narrow query."""
+        sqlite = SystemVersion.objects.get(system__name='SQLite', is_current=True)
+        loader = ColumnLoader('col_programming_language', 'written_in', ('name', 'slug', 'icon'))
+        with self.assertNumQueries(1):
+            column = load_column([sqlite.id], loader)
+        self.assertIn('C', [d['name'] for d in column[sqlite.id]])
+        self.assertEqual(set(column[sqlite.id][0]), {'name', 'slug', 'icon'})
+
     # --- feature column ---
 
     def test_feature_storage_model_column_populated(self):
@@ -540,6 +823,68 @@ class BrowseColumnTestCase(TestCase):
         self.assertEqual(cv['type'], 'tags')
         self.assertIsInstance(cv['data'], list)
 
+# ==============================================
+# BrowsePaginationTestCase
+# ==============================================
+@override_settings(DBDB_BROWSE_PAGE_SIZE=1)
+class BrowsePaginationTestCase(TestCase):
+    """Browse results are keyset paginated on the order-by column."""
+
+    fixtures = [
+        'adminuser.json',
+        'testuser.json',
+        'core_features.json',
+        'core_attributes.json',
+        'core_system.json',
+    ]
+
+    def _names(self, response):
+        return [r['name'] for r in response.context['results']]
+
+    def test_pages_follow_name_order(self):
+        response = self.client.get(reverse('browse'))
+        self.assertEqual(self._names(response), ['SQLite'])
+        self.assertEqual(response.context['num_results'], 2)
+        self.assertIsNone(response.context['first_page_url'])
+
+        response = self.client.get(reverse('browse') + response.context['next_page_url'])
+        self.assertEqual(self._names(response), ['XXX'])
+        self.assertIsNone(response.context['next_page_url'])
+        self.assertIsNotNone(response.context['first_page_url'])
+
+    def test_pages_follow_descending_order(self):
+        response = self.client.get(reverse('browse'), data={'order-by': '-name'})
+        self.assertEqual(self._names(response), ['XXX'])
+        response = self.client.get(reverse('browse') + response.context['next_page_url'])
+        self.assertEqual(self._names(response), ['SQLite'])
+
+    def test_pages_across_tied_search_ranks(self):
+        for ver in SystemVersion.objects.filter(is_current=True):
+            update_searchtext(ver)
+        # Identical vectors tie on a D-weighted rank, a fraction that is not
+        # exact in binary
+        SystemSearchText.objects.update(
+            search_vector=SearchVector(Value('tiedterm'), config='simple', weight='D'))
+
+        response = self.client.get(reverse('browse'), data={'q': 'tiedterm'})
+        first = self._names(response)
+        self.assertEqual(response.context['num_results'], 2)
+        response = self.client.get(reverse('browse') + response.context['next_page_url'])
+        self.assertEqual(sorted(first + self._names(response)), ['SQLite', 'XXX'])
+        self.assertIsNone(response.context['next_page_url'])
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('browse'), data={'after': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._names(response), ['SQLite'])
+
+    def test_limit_is_a_single_page(self):
+        response = self.client.get(reverse('browse'), data={'limit': 1})
+        self.assertEqual(self._names(response), ['SQLite'])
+        self.assertIsNone(response.context['next_page_url'])
+
+    pass
+
 # ==============================================
 # WildcardNameSearchTestCase
 # ==============================================
@@ -789,10 +1134,7 @@ class MetaTagsTestCase(TestCase):
     def setUpTestData(cls):
         super().setUpTestData()
         for ver in SystemVersion.objects.filter(is_current=True):
-            sst, _ = SystemSearchText.objects.update_or_create(system=ver.system)
-            sst.name = ver.system.name
-            sst.search_text = generate_searchtext(ver)
-            sst.save()
+            update_searchtext(ver)
 
     # --- System page ---
 
@@ -0,0 +1,426 @@
+"""Tests for the SystemVisit buffering, rollup and partitioning (dbdb.core.utils.visits) and the visit recommender."""
+import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from dbdb.core.models import (
+    System,
+    SystemCooccurrence,
+    SystemRecommendation,
+    SystemVisit,
+    SystemVisitDaily,
+    SystemVisitor,
+)
+from dbdb.core.utils import visits
+from dbdb.core.utils.recommender import (
+    blend_recommendations,
+    build_visit_matrix,
+    content_top_k,
+    cooccurrence_top_k,
+    cosine_similarity,
+    load_visit_matrix,
+    store_recommendations,
+    top_k,
+    update_cooccurrences,
+)
+from dbdb.core.utils.visitfilter import TimeBucketedBloomFilter, VisitFilter, classify_user_agent
+from dbdb.core.utils.visits import (
+    VisitBuffer,
+    add_months,
+    compact_visit_partitions,
+    ensure_visit_partitions,
+    get_visit_buffer,
+    list_visit_partitions,
+    recover_visits,
+    refresh_view_counts,
+    rollup_visits,
+    stray_visit_months,
+    unique_visitor_counts,
+    unique_visitor_total,
+    write_visits,
+)
+from dbdb.core.views import CounterView
+
+_FIXTURES = [
+    'adminuser.json',
+    'core_features.json',
+    'core_attributes.json',
+    'core_system.json',
+]
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+class VisitBufferTestCase(TestCase):
+
+    fixtures = _FIXTURES
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.system = System.objects.get(name='SQLite')
+        visits._BUFFER = None
+
+    def tearDown(self):
+        visits._BUFFER = None
+
+    def test_flush_writes_buffered_visits(self):
+        buffer = VisitBuffer(self.spool_dir, size=100, interval=0)
+        for i in range(3):
+            buffer.add(self.system.id, f'10.0.0.{i}', 'test-agent')
+        self.assertEqual(SystemVisit.objects.filter(system=self.system).count(), 0)
+
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(SystemVisit.objects.filter(system=self.system).count(), 3)
+        self.assertEqual(SystemVisitDaily.objects.get(system=self.system).visits, 3)
+        # Only the (now empty) live spool file remains
+        self.assertEqual([f for f in os.listdir(self.spool_dir) if f.endswith('.flush')], [])
+
+    def test_flush_retries_failed_flush(self):
+        buffer = VisitBuffer(self.spool_dir, size=100, interval=0)
+        path = os.path.join(self.spool_dir, f'visits-{buffer.pid}-1.flush')
+        with open(path, 'w') as fd:
+            fd.write(json.dumps([self.system.id, '10.0.0.1', 'test-agent', timezone.now().isoformat()]) + '\n')
+        # A live worker's stranded batch is not recovered by other processes
+        self.assertEqual(recover_visits(self.spool_dir), 0)
+
+        buffer.add(self.system.id, '10.0.0.2', 'test-agent')
+        self.assertEqual(buffer.flush(), 2)
+        self.assertFalse(os.path.exists(path))
+
+    def test_bad_batch_is_set_aside(self):
+        buffer = VisitBuffer(self.spool_dir, size=100, interval=0)
+        buffer.add(self.system.id, 'unknown', 'test-agent')
+        buffer.add(self.system.id, '10.0.0.1', 'test-agent')
+        self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len([f for f in os.listdir(self.spool_dir) if f.endswith('.flush.bad')]), 1)
+
+        # Later batches are not held up by the rejected one
+        buffer.add(self.system.id, '10.0.0.2', 'test-agent')
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(SystemVisit.objects.filter(system=self.system).count(), 1)
+
+    def test_invalid_ip_is_dropped(self):
+        with override_settings(DBDB_VISIT_BUFFER_SIZE=10, DBDB_VISIT_FLUSH_INTERVAL=0,
+                               DBDB_VISIT_SPOOL_DIRECTORY=self.spool_dir):
+            self.assertEqual(visits.record_visit(self.system.id, 'unknown', 'test-agent'), 'invalid_ip')
+            self.assertEqual(visits.record_visit(self.system.id, '', 'test-agent'), 'invalid_ip')
+            self.assertIsNone(visits.record_visit(self.system.id, ' 2001:DB8::1 ', 'test-agent'))
+            self.assertEqual(get_visit_buffer().flush(), 1)
+        self.assertEqual(SystemVisit.objects.get(system=self.system).ip_address, '2001:db8::1')
+
+    def test_recover_replays_dead_worker_spool(self):
+        path = os.path.join(self.spool_dir, f'visits-{_dead_pid()}.spool')
+        created = timezone.now() - datetime.timedelta(hours=1)
+        with open(path, 'w') as fd:
+            fd.write(json.dumps([self.system.id, '10.0.0.1', 'test-agent', created.isoformat()]) + '\n')
+            fd.write('[1, "10.0.0')  # torn write
+
+        self.assertEqual(recover_visits(self.spool_dir), 1)
+        visit = SystemVisit.objects.get(system=self.system)
+        self.assertEqual(visit.created, created)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_deleted_systems_are_dropped(self):
+        now = timezone.now().isoformat()
+        rows = [
+            (self.system.id, '10.0.0.1', 'test-agent', now),
+            (999999, '10.0.0.2', 'test-agent', now),
+        ]
+        self.assertEqual(write_visits(rows), 1)
+
+    def test_counter_buffers_visits(self):
+        data = {'token': CounterView.build_token('system', pk=self.system.id)}
+        with override_settings(DBDB_VISIT_BUFFER_SIZE=10, DBDB_VISIT_FLUSH_INTERVAL=0,
+                               DBDB_VISIT_SPOOL_DIRECTORY=self.spool_dir):
+            response = self.client.post(reverse('system_counter'), data)
+            self.assertEqual(response.json()['status'], 'ok')
+            self.assertEqual(SystemVisit.objects.filter(system=self.system).count(), 0)
+            get_visit_buffer().flush()
+        self.assertEqual(SystemVisit.objects.filter(system=self.system).count(), 1)
+
+    pass
+
+
+class VisitFilterTestCase(TestCase):
+
+    fixtures = _FIXTURES
+
+    def test_user_agent_classes(self):
+        browser = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36'
+        self.assertIsNone(classify_user_agent(browser))
+        self.assertEqual(classify_user_agent('Mozilla/5.0 (compatible; Googlebot/2.1)'), 'crawler')
+        self.assertEqual(classify_user_agent('python-requests/2.32'), 'tool')
+        self.assertEqual(classify_user_agent(browser.replace('Chrome', 'HeadlessChrome')), 'headless')
+
+    def test_bloom_filter_forgets_after_window(self):
+        seen = TimeBucketedBloomFilter(window=60, capacity=1000)
+        self.assertFalse(seen.add(b'key', now=0))
+        self.assertTrue(seen.add(b'key', now=59))
+        self.assertFalse(seen.add(b'key', now=61))
+        self.assertFalse(any(seen.add(f'other-{i}'.encode(), now=61) for i in range(500)))
+
+    def test_repeat_hits_are_dropped(self):
+        system = System.objects.get(name='SQLite')
+        visit_filter = VisitFilter(window=60, capacity=1000)
+        self.assertIsNone(visit_filter.check(system.id, '10.0.0.1', 'agent', now=0))
+        self.assertEqual(visit_filter.check(system.id, '10.0.0.1', 'agent', now=10), 'duplicate')
+        self.assertIsNone(visit_filter.check(system.id, '10.0.0.2', 'agent', now=10))
+        self.assertEqual(visit_filter.check(system.id, '10.0.0.3', 'curl/8.0', now=10), 'tool')
+        self.assertEqual(visit_filter.counts, {'accepted': 2, 'duplicate': 1, 'tool': 1})
+
+    pass
+
+
+class VisitRollupTestCase(TestCase):
+
+    fixtures = _FIXTURES
+
+    def setUp(self):
+        self.system = System.objects.get(name='SQLite')
+
+    def _visit(self, ip, days_ago=0, user_agent='test-agent'):
+        visit = SystemVisit.objects.create(system=self.system, ip_address=ip, user_agent=user_agent)
+        if days_ago:
+            SystemVisit.objects.filter(pk=visit.pk).update(created=timezone.now() - datetime.timedelta(days=days_ago))
+        return visit
+
+    def test_rollup_counts_visits_and_visitors(self):
+        self._visit('10.0.0.1', days_ago=3)
+        self._visit('10.0.0.1', days_ago=3)
+        self._visit('10.0.0.2', days_ago=3)
+        self._visit('10.0.0.1')
+
+        rollup_visits()
+        rows = {d.day: d for d in SystemVisitDaily.objects.filter(system=self.system)}
+        self.assertEqual(len(rows), 2)
+        old = rows[min(rows)]
+        self.assertEqual((old.visits, old.unique_visitors), (3, 2))
+
+        refresh_view_counts()
+        self.assertEqual(System.objects.get(pk=self.system.pk).view_count, 4)
+
+    def test_rollup_resumes_from_watermark(self):
+        old = self._visit('10.0.0.1', days_ago=3)
+        self._visit('10.0.0.1', days_ago=2)
+        rollup_visits()
+        # Raw rows before the last rolled-up day are no longer read
+        SystemVisit.objects.filter(pk=old.pk).delete()
+        self._visit('10.0.0.1')
+
+        rollup_visits()
+        self.assertEqual(SystemVisitDaily.objects.filter(system=self.system).count(), 3)
+
+        # An explicit start date re-aggregates from there
+        rollup_visits(timezone.now().date() - datetime.timedelta(days=5))
+        self.assertEqual(SystemVisitDaily.objects.filter(system=self.system).count(), 2)
+
+    def test_unique_visitors_merge_daily_sketches(self):
+        self._visit('10.0.0.1', days_ago=2)
+        self._visit('10.0.0.2', days_ago=2)
+        self._visit('10.0.0.1')
+        self._visit('10.0.0.3')
+        rollup_visits()
+
+        since = timezone.now().date() - datetime.timedelta(days=5)
+        self.assertEqual(unique_visitor_counts(since), {self.system.id: 3})
+        self.assertEqual(unique_visitor_counts(timezone.now().date()), {self.system.id: 2})
+        self.assertEqual(unique_visitor_total(since), 3)
+
+    def test_import_skips_existing_and_unknown(self):
+        existing = self._visit('10.0.0.1')
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE visit_import AS SELECT * FROM core_systemvisit WITH NO DATA")
+            cursor.execute("""
+                INSERT INTO visit_import (id, system_id, ip_address, user_agent, created) VALUES
+                    (%(existing)s, %(system)s, '10.0.0.1', 'test-agent', now()),
+                    (%(existing)s + 1000, %(system)s, '10.0.0.2', 'test-agent', now() - interval '2 days'),
+                    (%(existing)s + 1001, 999999, '10.0.0.3', 'test-agent', now())
+            """, {'existing': existing.id, 'system': self.system.id})
+
+        call_command('import_visits', 'visit_import', stdout=io.StringIO())
+        self.assertEqual(SystemVisit.objects.filter(system=self.system).count(), 2)
+        self.assertEqual(System.objects.get(pk=self.system.pk).view_count, 2)
+
+    pass
+
+
+class VisitPartitionTestCase(TestCase):
+
+    fixtures = _FIXTURES
+
+    def setUp(self):
+        self.system = System.objects.get(name='SQLite')
+        self.this_month = timezone.now().date().replace(day=1)
+
+    def test_current_month_has_partition(self):
+        months = [month for month, _ in list_visit_partitions()]
+        self.assertIn(self.this_month, months)
+        self.assertEqual(ensure_visit_partitions(self.this_month, self.this_month), [])
+
+    def test_default_partition_catches_unpartitioned_months(self):
+        future_month = add_months(self.this_month, 12)
+        visit = SystemVisit.objects.create(system=self.system, ip_address='10.0.0.1', user_agent='test-agent')
+        future = datetime.datetime.combine(future_month, datetime.time(12), tzinfo=datetime.UTC)
+        SystemVisit.objects.filter(pk=visit.pk).update(created=future)
+        self.assertEqual(stray_visit_months(), [future_month])
+
+        # Creating the month's partition moves the visit out of the default one
+        self.assertEqual(ensure_visit_partitions(future_month, future_month),
+                         [f'core_systemvisit_p{future_month:%Y%m}'])
+        self.assertEqual(stray_visit_months(), [])
+        self.assertEqual(SystemVisit.objects.get(pk=visit.pk).created, future)
+
+    def test_compaction_keeps_daily_totals(self):
+        old_month = add_months(self.this_month, -30)
+        ensure_visit_partitions(old_month, old_month)
+        visit = SystemVisit.objects.create(system=self.system, ip_address='10.0.0.1', user_agent='test-agent')
+        old_created = datetime.datetime.combine(old_month, datetime.time(12), tzinfo=datetime.UTC)
+        SystemVisit.objects.filter(pk=visit.pk).update(created=old_created)
+
+        dropped = compact_visit_partitions(add_months(old_month, 1))
+        self.assertIn(f'core_systemvisit_p{old_month:%Y%m}', dropped)
+        self.assertFalse(SystemVisit.objects.filter(pk=visit.pk).exists())
+
+        # Compacted days survive later rollups that start before the horizon
+        rollup_visits(old_month)
+        daily = SystemVisitDaily.objects.get(system=self.system, day=old_month)
+        self.assertEqual(daily.visits, 1)
+
+    pass
+
+
+class RecommenderTestCase(TestCase):
+
+    fixtures = _FIXTURES
+
+    def test_top_k_orders_by_similarity(self):
+        # System 1 shares two users with system 2 and one with system 3
+        users = [1, 1, 2, 2, 3, 3, 4]
+        systems = [1, 2, 1, 2, 1, 3, 3]
+        matrix, ids = build_visit_matrix(users, systems)
+        self.assertEqual(matrix.shape, (4, 3))
+
+        recs = top_k(cosine_similarity(matrix), ids, k=1)
+        self.assertEqual([other for other, _ in recs[1]], [2])
+        recs = top_k(cosine_similarity(matrix), ids, k=5)
+        self.assertEqual([other for other, _ in recs[1]], [2, 3])
+        self.assertNotIn(1, [other for other, _ in recs[1]])
+
+    def test_store_replaces_recommendations(self):
+        sqlite = System.objects.get(name='SQLite')
+        other = System.objects.get(name='XXX')
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            for system in (sqlite, other):
+                SystemVisit.objects.create(system=system, ip_address=ip, user_agent='test-agent')
+
+        matrix, ids = load_visit_matrix(min_threshold=2, min_visit=2, ignore=['10.0.0.9'])
+        self.assertEqual(matrix.shape, (2, 2))
+        recs = top_k(cosine_similarity(matrix), ids)
+        self.assertEqual(store_recommendations(recs), 2)
+        self.assertEqual(store_recommendations(recs), 2)
+        rec = SystemRecommendation.objects.get(system=sqlite)
+        self.assertEqual(rec.recommendation_id, other.id)
+        self.assertAlmostEqual(rec.score, 1.0, places=5)
+
+    def test_cooccurrences_update_incrementally(self):
+        sqlite = System.objects.get(name='SQLite')
+        other = System.objects.get(name='XXX')
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            for system in (sqlite, other):
+                SystemVisit.objects.create(system=system, ip_address=ip, user_agent='test-agent')
+
+        self.assertEqual(update_cooccurrences(half_life_days=0), {sqlite.id, other.id})
+        self.assertEqual(update_cooccurrences(half_life_days=0), set())
+
+        # A single-system visitor only counts once they view a second system
+        SystemVisit.objects.create(system=sqlite, ip_address='10.0.0.3', user_agent='test-agent')
+        self.assertEqual(update_cooccurrences(half_life_days=0), set())
+        SystemVisit.objects.create(system=other, ip_address='10.0.0.3', user_agent='test-agent')
+        self.assertEqual(update_cooccurrences(half_life_days=0), {sqlite.id, other.id})
+
+        pair = SystemCooccurrence.objects.get(system=sqlite, other=other)
+        self.assertEqual(pair.visitors, 3)
+        recs = cooccurrence_top_k([sqlite.id], k=4)
+        self.assertEqual([o for o, _ in recs[sqlite.id]], [other.id])
+        self.assertAlmostEqual(recs[sqlite.id][0][1], 1.0, places=5)
+        self.assertEqual(cooccurrence_top_k([sqlite.id], min_visit=4), {})
+
+    def test_cooccurrence_decay_rebases_weights(self):
+        sqlite = System.objects.get(name='SQLite')
+        other = System.objects.get(name='XXX')
+        month_ago = timezone.now() - datetime.timedelta(days=30)
+
+        def visit(ip, created):
+            for system in (sqlite, other):
+                v = SystemVisit.objects.create(system=system, ip_address=ip, user_agent='test-agent')
+                SystemVisit.objects.filter(pk=v.pk).update(created=created)
+
+        # A 15-minute half-life puts 2880 half-lives between the two visitors,
+        # well past what a double can hold as 2 ** (age / half_life)
+        visit('10.0.0.1', month_ago)
+        update_cooccurrences(half_life_days=1 / 96, rebuild=True)
+        visit('10.0.0.2', timezone.now())
+        self.assertEqual(update_cooccurrences(half_life_days=1 / 96), {sqlite.id, other.id})
+
+        weights = dict(SystemVisitor.objects.filter(system=sqlite).values_list('first_seen', 'weight'))
+        self.assertEqual(weights[min(weights)], 0.0)
+        self.assertEqual(weights[max(weights)], 1.0)
+        pair = SystemCooccurrence.objects.get(system=sqlite, other=other)
+        self.assertEqual((pair.visitors, pair.weight), (2, 1.0))
+        recs = cooccurrence_top_k([sqlite.id])
+        self.assertAlmostEqual(recs[sqlite.id][0][1], 1.0, places=5)
+
+    def test_content_links_related_systems(self):
+        sqlite = System.objects.get(name='SQLite')
+        other = System.objects.get(name='XXX')
+        other.current().derived_from.add(sqlite)
+
+        recs = content_top_k(k=4)
+        self.assertEqual([o for o, _ in recs[sqlite.id]], [other.id])
+        self.assertEqual([o for o, _ in recs[other.id]], [sqlite.id])
+
+    def test_blend_fills_cold_start_systems(self):
+        visits = {1: [(2, 0.9), (3, 0.5)]}
+        content = {1: [(3, 1.0)], 4: [(2, 0.4)]}
+        blended = blend_recommendations(visits, content, k=2, content_weight=0.5)
+        self.assertEqual([o for o, _ in blended[1]], [3, 2])
+        self.assertEqual(blended[4], [(2, 0.4)])
+
+    def test_evaluation_report(self):
+        sqlite = System.objects.get(name='SQLite')
+        other = System.objects.get(name='XXX')
+        three_days_ago = timezone.now() - datetime.timedelta(days=3)
+        for ip, system, created in (('10.0.0.1', sqlite, three_days_ago),
+                                    ('10.0.0.1', other, three_days_ago),
+                                    ('10.0.0.2', sqlite, three_days_ago),
+                                    ('10.0.0.2', other, timezone.now())):
+            visit = SystemVisit.objects.create(system=system, ip_address=ip, user_agent='test-agent')
+            SystemVisit.objects.filter(pk=visit.pk).update(created=created)
+
+        output = os.path.join(tempfile.mkdtemp(), 'report.json')
+        cutoff = (timezone.now() - datetime.timedelta(days=1)).date()
+        call_command('evaluate_recommender', '--cutoff', cutoff.isoformat(), '--test-days', '2',
+                     '--top-k', '1', '--variant', 'sparse', '--output', output)
+        with open(output) as fd:
+            report = json.load(fd)
+        self.assertEqual((report['train_pairs'], report['test_pairs']), (3, 1))
+        sparse_result = report['variants']['sparse']
+        self.assertEqual(sparse_result['users'], 1)
+        self.assertEqual(sparse_result['precision'], 1.0)
+        self.assertEqual(sparse_result['recall'], 1.0)
+
+    pass
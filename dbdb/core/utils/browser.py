@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import contextlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+LOG = logging.getLogger(__name__)
+
+# Subresources that never change a page's title or text
+BLOCKED_RESOURCE_TYPES = {'image', 'font', 'media'}
+
+# Each context is replaced after this many pages to shed cookies and leaks
+PAGES_PER_CONTEXT = 100
+
+# Seconds past the navigation timeout allowed for capturing a partial page
+CAPTURE_GRACE = 5
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+class BrowserPool:
+    """
+    One headless Firefox with `size` long-lived browser contexts, driven by
+    an asyncio loop on a background thread so that any thread (e.g. the
+    crawler workers) can render pages with it. Each page gets one context
+    from the pool and a hard time budget; images, fonts and media are never
+    downloaded.
+    """
+
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.pid = os.getpid()
+        self._playwright = None
+        self._browser = None
+        self._launch = 0        # bumped on every (re)launch of the browser
+        self._contexts = None   # asyncio.Queue of (context, launch, pages rendered)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='browser-pool', daemon=True)
+        self._thread.start()
+        self._call(self._start())
+        return
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.firefox.launch(headless=True)
+        self._contexts = asyncio.Queue()
+        for _ in range(self.size):
+            self._contexts.put_nowait((await self._new_context(), self._launch, 0))
+        LOG.debug("Started browser pool with %d contexts", self.size)
+        return
+
+    async def _new_context(self):
+        if not self._browser.is_connected():
+            LOG.warning("Browser disconnected, relaunching")
+            self._browser = await self._playwright.firefox.launch(headless=True)
+            self._launch += 1
+        context = await self._browser.new_context(
+            user_agent=settings.CRAWLER_USER_AGENT,
+            java_script_enabled=True,
+        )
+        # Hide navigator.webdriver before any page script runs
+        await context.add_init_script(
+            "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+        )
+        await context.route('**/*', self._route)
+        return context
+
+    @staticmethod
+    async def _route(route):
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+        return
+
+    async def _load(self, page, url, timeout):
+        try:
+            # wait_until='networkidle' blocks until there are no more than
+            # 0 in-flight network requests for 500 ms — ideal for SPAs.
+            await page.goto(url, wait_until='networkidle', timeout=timeout * 1000)
+            LOG.debug(f"Page loaded (networkidle): {await page.title()!r}")
+        except PlaywrightTimeoutError:
+            LOG.debug(f"Timed out waiting for networkidle on {url}; capturing partial page source")
+        with contextlib.suppress(PlaywrightError):
+            return await page.content()
+        return None
+
+    async def _render(self, url, timeout):
+        context, launch, rendered = await self._contexts.get()
+        page = None
+        try:
+            # Contexts of a browser that has since been relaunched are dead too
+            if rendered >= PAGES_PER_CONTEXT or launch != self._launch or not self._browser.is_connected():
+                with contextlib.suppress(PlaywrightError):
+                    await context.close()
+                context, rendered = await self._new_context(), 0
+                launch = self._launch
+            page = await context.new_page()
+            # The budget starts once a context is free, not while queued
+            return await asyncio.wait_for(self._load(page, url, timeout), timeout + CAPTURE_GRACE)
+        except TimeoutError:
+            LOG.warning(f"Gave up rendering {url} after {timeout + CAPTURE_GRACE}s")
+            return None
+        except PlaywrightError:
+            rendered = PAGES_PER_CONTEXT   # replace the context before its next use
+            raise
+        finally:
+            if page is not None:
+                with contextlib.suppress(PlaywrightError):
+                    await page.close()
+            self._contexts.put_nowait((context, launch, rendered + 1))
+
+    def render(self, url: str, timeout: float) -> str | None:
+        """Return the rendered HTML of the page (possibly partial), or None."""
+        return self._call(self._render(url, timeout))
+
+    async def _stop(self):
+        while not self._contexts.empty():
+            context, _, _ = self._contexts.get_nowait()
+            with contextlib.suppress(PlaywrightError):
+                await context.close()
+        with contextlib.suppress(PlaywrightError):
+            await self._browser.close()
+        await self._playwright.stop()
+        return
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        try:
+            self._call(self._stop())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+        return
+
+    pass
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return this process's BrowserPool, starting it on first use."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.pid != os.getpid():
+            _POOL = BrowserPool(settings.DBDB_CRAWLER_BROWSER_CONTEXTS)
+            atexit.register(_POOL.close)
+        return _POOL
@@ -3,9 +3,14 @@ import json
 import logging
 import posixpath
 import re
+import struct
+import threading
 import time
-from datetime import datetime
+import zlib
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta, timezone as dt_timezone
 from email.utils import parsedate_to_datetime
+from html import unescape
 from subprocess import TimeoutExpired
 from typing import Any
 from urllib.parse import (
@@ -21,12 +26,12 @@ import requests
 from bs4 import BeautifulSoup
 from django.conf import settings
 from django.db import connection, transaction
-from django.db.models import Q
+from django.db.models import Case, F, Q, When
 from django.utils import timezone
 from pptx import Presentation
 from PyPDF2 import PdfReader
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError, sync_playwright
 from requests import ConnectTimeout
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError, InvalidURL, ReadTimeout
 from tldextract import tldextract
 from urllib3.exceptions import NewConnectionError, ReadTimeoutError
@@ -36,6 +41,7 @@ from dbdb.core.models import (
     RepositoryInfo, System, SystemFeature, SystemVersion,
 )
 from dbdb.core.utils import spam
+from dbdb.core.utils.browser import get_browser_pool
 from dbdb.core.utils.repository import get_collector
 from dbdb.core.utils.spam import UnexpectedResponseError
 
@@ -43,9 +49,40 @@ LOG = logging.getLogger(__name__)
 
 # --- Configuration ---
 
-MAX_DOWNLOAD_BYTES = 60 * 1024 * 1024
 REQUEST_TIMEOUT = 15 # seconds
 
+# Bodies are read up to settings.DBDB_CITATION_MAX_BYTES, and less for the
+# content types whose extractors only need the start of the body
+HTML_MAX_BYTES = 4 * 1024 * 1024
+DOCUMENT_PREFIX_BYTES = 1024 * 1024 # PDF/PPTX larger than the max: metadata only
+SNIFF_BYTES = 1024                  # other types are not parsed
+
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
+PPT_CONTENT_TYPES = {
+    "application/vnd.ms-powerpoint",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+# Keep-alive sessions, one per scheme://host, least recently used first;
+# each keeps up to _SESSION_POOL_SIZE idle connections (see configure_sessions)
+MAX_SESSIONS = 64
+_SESSIONS: OrderedDict[str, requests.Session] = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+_SESSION_POOL_SIZE = 1
+
+# Recrawl schedule. Valid pages start at RECHECK_INTERVAL, which halves
+# every time the page has changed and grows by half every time it has not,
+# within [RECHECK_MIN, RECHECK_MAX] and never below the page's own
+# Cache-Control freshness lifetime. Dead pages are retried after
+# RECHECK_DEAD, backing off to RECHECK_DEAD_MAX while they stay dead.
+RECHECK_INTERVAL = timedelta(days=7)
+RECHECK_MIN = timedelta(days=1)
+RECHECK_MAX = timedelta(days=180)
+RECHECK_UNKNOWN = timedelta(hours=1)
+RECHECK_DEAD = timedelta(days=1)
+RECHECK_DEAD_MAX = timedelta(days=30)
+RECHECK_IGNORED = timedelta(days=90)
+
 SKIP_DOMAINS = {
     "//www.crunchbase.com/", # Recaptcha blocks
     "//twitter.com",
@@ -102,6 +139,139 @@ def _url_has_path(url: str) -> bool:
     """Return True if the URL has a meaningful path beyond the root."""
     return bool(urlsplit(url).path.strip('/'))
 
+def _get_session(url: str) -> requests.Session:
+    """Return the pooled keep-alive session for the URL's host."""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc.lower()}"
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.pop(key, None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_SESSION_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        _SESSIONS[key] = session
+        while len(_SESSIONS) > MAX_SESSIONS:
+            _, evicted = _SESSIONS.popitem(last=False)
+            evicted.close()
+    return session
+
+def configure_sessions(pool_size: int) -> None:
+    """
+    Keep up to pool_size connections to each host alive, e.g. the crawler's
+    per-domain concurrency, so none are discarded under load.
+    """
+    global _SESSION_POOL_SIZE
+    with _SESSIONS_LOCK:
+        _SESSION_POOL_SIZE = max(1, pool_size)
+        while _SESSIONS:
+            _, session = _SESSIONS.popitem()
+            session.close()
+
+def _body_limit(content_type: str | None, content_length: str | None) -> int:
+    """How many bytes of the body the extractor for *content_type* needs."""
+    limit = settings.DBDB_CITATION_MAX_BYTES
+    if content_type in HTML_CONTENT_TYPES:
+        return min(limit, HTML_MAX_BYTES)
+    if content_type == "application/pdf" or content_type in PPT_CONTENT_TYPES:
+        try:
+            too_large = int(content_length) > limit
+        except (TypeError, ValueError):
+            too_large = False
+        return min(limit, DOCUMENT_PREFIX_BYTES) if too_large else limit
+    return SNIFF_BYTES
+
+def _read_body(resp: requests.Response, limit: int) -> tuple[bytes, bool]:
+    """Read at most *limit* bytes of a streamed response. Returns (data, truncated)."""
+    data = bytearray()
+    for chunk in resp.iter_content(chunk_size=64 * 1024):
+        data.extend(chunk)
+        if len(data) > limit:
+            del data[limit:]
+            return bytes(data), True
+    return bytes(data), False
+
+def _parse_pdf_date(value: str) -> datetime | None:
+    """Parse a PDF date string (D:YYYYMMDDHHmmSS+HH'mm') or an XMP ISO date."""
+    m = re.match(r"(?:D:)?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?(?:([Z+-])(\d{2})?'?(\d{2})?)?", value.strip())
+    if m and not re.match(r"\d{4}-", value.strip()):
+        year, month, day, hour, minute, second, sign, tz_hours, tz_minutes = m.groups()
+        offset = timedelta(hours=int(tz_hours or 0), minutes=int(tz_minutes or 0))
+        try:
+            return datetime(int(year), int(month or 1), int(day or 1), int(hour or 0), int(minute or 0),
+                            int(second or 0), tzinfo=dt_timezone(-offset if sign == "-" else offset))
+        except ValueError:
+            return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+def _decode_pdf_string(raw: bytes) -> str:
+    if raw.startswith(b"<"):
+        raw = bytes.fromhex(re.sub(rb"\s", b"", raw[1:-1]).decode("ascii", "ignore"))
+    else:
+        raw = re.sub(rb"\\([nrtbf()\\])",
+                     lambda m: {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}.get(m.group(1), m.group(1)),
+                     raw[1:-1])
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", errors="replace")
+    return raw.decode("latin-1")
+
+def _extract_pdf_prefix_metadata(data: bytes) -> tuple[str | None, datetime | None]:
+    """
+    Title and oldest date of a PDF from only the start of the file. This
+    finds uncompressed XMP metadata or document information dictionaries,
+    which linearized and most generated PDFs put before the page content.
+    """
+    title = None
+    dates = []
+    xmp = re.search(rb"<dc:title>.*?<rdf:li[^>]*>(.*?)</rdf:li>", data, re.DOTALL)
+    if xmp:
+        title = unescape(xmp.group(1).decode("utf-8", errors="replace")).strip() or None
+    for m in re.finditer(rb"<xmp:(?:CreateDate|ModifyDate)>([^<]+)<", data):
+        dates.append(_parse_pdf_date(m.group(1).decode("ascii", "ignore")))
+
+    string = rb"(\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>)"
+    if title is None:
+        m = re.search(rb"/Title\s*" + string, data)
+        if m:
+            title = _decode_pdf_string(m.group(1)).strip() or None
+    for m in re.finditer(rb"/(?:CreationDate|ModDate)\s*" + string, data):
+        dates.append(_parse_pdf_date(_decode_pdf_string(m.group(1))))
+
+    dates = [d for d in dates if d is not None]
+    return title, min(dates) if dates else None
+
+def _extract_pptx_prefix_title(data: bytes) -> str | None:
+    """
+    Title of a PPTX from only the start of the file, by walking the ZIP
+    local file headers up to docProps/core.xml (usually one of the first
+    members) instead of reading the central directory at the end.
+    """
+    offset = 0
+    while data[offset:offset + 4] == b"PK\x03\x04" and offset + 30 <= len(data):
+        _, _, flags, method, _, _, _, size, _, name_length, extra_length = \
+            struct.unpack_from("<4sHHHHHIIIHH", data, offset)
+        if flags & 0x08:
+            # Sizes are only given after the data; the members can't be walked
+            return None
+        start = offset + 30 + name_length + extra_length
+        name = data[offset + 30:offset + 30 + name_length]
+        if name == b"docProps/core.xml":
+            member = data[start:start + size]
+            if len(member) < size:
+                return None
+            try:
+                xml = zlib.decompress(member, -15) if method == 8 else member
+            except zlib.error:
+                return None
+            m = re.search(rb"<dc:title>(.*?)</dc:title>", xml, re.DOTALL)
+            return unescape(m.group(1).decode("utf-8", errors="replace")).strip() or None if m else None
+        offset = start + size
+    return None
+
 def _extract_pdf_metadata(url:str, data: bytes, system: System | None = None) -> tuple[str | None, datetime | None]:
     """
     Extract title and oldest date (CreationDate or ModDate) from PDF metadata.
@@ -170,6 +340,31 @@ def _parse_cache_control(header: str | None) -> dict[str, str | bool]:
             directives[part.lower()] = True
     return directives
 
+def _expires_max_age(expires: str | None, date: str | None) -> int | None:
+    """Seconds between the Expires and Date headers (0 if already expired), or None."""
+    if not expires:
+        return None
+    try:
+        expires_at = parsedate_to_datetime(expires)
+        now = parsedate_to_datetime(date) if date else timezone.now()
+        return max(0, int((expires_at - now).total_seconds()))
+    except (TypeError, ValueError):
+        # "Expires: 0" and other invalid dates mean already expired
+        return 0
+
+def _freshness_lifetime(cache_control: dict | None) -> timedelta | None:
+    """How long the server says the page stays fresh, from the stored Cache-Control."""
+    if not cache_control:
+        return None
+    if cache_control.get("immutable"):
+        return RECHECK_MAX
+    if cache_control.get("no-store") or cache_control.get("no-cache"):
+        return None
+    try:
+        return timedelta(seconds=int(cache_control["max-age"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
 def _extract_html_title(
         url: str,
         data: bytes,
@@ -245,40 +440,7 @@ def _get_html_page(
         url,
         render_wait: float = 10,
         request_timeout: int | None = None) -> str | None:
-    timeout_ms = int((request_timeout or render_wait) * 1000)
-
-    html_source = None
-    with sync_playwright() as pw:
-        browser = pw.firefox.launch(headless=True)
-        try:
-            context = browser.new_context(
-                user_agent=settings.CRAWLER_USER_AGENT,
-                # Mask automation signals: JS property and HTTP header
-                java_script_enabled=True,
-            )
-            # Hide navigator.webdriver before any page script runs
-            context.add_init_script(
-                "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
-            )
-            page = context.new_page()
-            try:
-                # wait_until='networkidle' blocks until there are no more than
-                # 0 in-flight network requests for 500 ms — ideal for SPAs.
-                page.goto(url, wait_until="networkidle", timeout=timeout_ms)
-                LOG.debug(f"Page loaded (networkidle): {page.title()!r}")
-                html_source = page.content()
-            except PlaywrightTimeoutError:
-                LOG.debug(f"Timed out waiting for networkidle on {url}; capturing partial page source")
-                try:
-                    html_source = page.content()
-                except Exception:
-                    pass
-            finally:
-                page.close()
-        finally:
-            browser.close()
-
-    return html_source
+    return get_browser_pool().render(url, timeout=request_timeout or render_wait)
 
 # --- Main API ---
 
@@ -403,10 +565,11 @@ def fetch_url_metadata(
     _html_encoding = 'utf-8'
 
     LOG.debug(f"Fetching '{url}'\n -> Headers: {headers}" )
-    with requests.get(
+    truncated = False
+    with _get_session(url).get(
         url,
         stream=True,
-        timeout=REQUEST_TIMEOUT,
+        timeout=request_timeout,
         headers=headers,
         allow_redirects=True if redirect_ctr > 8 else allow_redirects,
     ) as resp:
@@ -494,6 +657,10 @@ def fetch_url_metadata(
         cache_control = _parse_cache_control(
             resp.headers.get("Cache-Control")
         )
+        expires = _expires_max_age(resp.headers.get("Expires"), resp.headers.get("Date"))
+        if expires is not None and "max-age" not in cache_control:
+            # max-age overrides Expires, so only keep the latter when alone
+            cache_control["max-age"] = str(expires)
 
         # --- Short-circuit on 304 ---
         if status_code == 304:
@@ -513,13 +680,10 @@ def fetch_url_metadata(
                 },
             }
 
-        # --- Download body ---
-        data = bytearray()
-        for chunk in resp.iter_content(chunk_size=8192):
-            data.extend(chunk)
-            if len(data) > MAX_DOWNLOAD_BYTES:
-                raise RuntimeError(f"Download exceeds size limit [#bytes={len(data)}]")
-        data = bytes(data)
+        # --- Download body (only as much as the extractor needs) ---
+        data, truncated = _read_body(resp, _body_limit(content_type, content_length))
+        if truncated:
+            LOG.debug(f"Stopped reading '{url}' after {len(data):,} bytes")
         if status_code != 404 and len(data) == 0:
             LOG.error(f"Unexpected empty contents for '{url}'")
             status = CitationUrl.Status.IGNORE
@@ -532,10 +696,15 @@ def fetch_url_metadata(
     # --- Content-Type dispatch ---
 
     if status_code != 404 and status != CitationUrl.Status.IGNORE:
-        # PDF
-        if content_type == "application/pdf":
+        # PDF (only the metadata if it was too large to read whole)
+        if content_type == "application/pdf" and truncated:
+            title, pdf_last_modified = _extract_pdf_prefix_metadata(data)
+            if pdf_last_modified:
+                last_modified = pdf_last_modified
+        elif content_type == "application/pdf":
             title, pdf_last_modified = _extract_pdf_metadata(url, data)
-            if pdf_last_modified: last_modified = pdf_last_modified
+            if pdf_last_modified:
+                last_modified = pdf_last_modified
             try:
                 reader = PdfReader(io.BytesIO(data))
                 raw_content = '\n'.join(page.extract_text() or '' for page in reader.pages)
@@ -544,14 +713,11 @@ def fetch_url_metadata(
                 pass
 
         # PPTX
-        elif content_type in {
-            "application/vnd.ms-powerpoint",
-            "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        }:
-            title = _extract_ppt_title(url, data)
+        elif content_type in PPT_CONTENT_TYPES:
+            title = _extract_pptx_prefix_title(data) if truncated else _extract_ppt_title(url, data)
 
         # HTML — Wikipedia: parse raw bytes directly, skip JS rendering
-        elif content_type in {"text/html", "application/xhtml+xml"} and "wikipedia.org" in url:
+        elif content_type in HTML_CONTENT_TYPES and "wikipedia.org" in url:
             wiki_title, wiki_last_modified = _extract_wikipedia_metadata(data, _html_encoding)
             if wiki_title:
                 title = wiki_title
@@ -565,7 +731,7 @@ def fetch_url_metadata(
                 pass
 
         # HTML
-        elif content_type in {"text/html", "application/xhtml+xml"}:
+        elif content_type in HTML_CONTENT_TYPES:
             title, page_status = _extract_html_title(url, data,
                                                      encoding=_html_encoding,
                                                      skip_spamcheck=skip_spamcheck,
@@ -787,6 +953,59 @@ def merge_citations(merge_to: CitationUrl, merge_from: list[CitationUrl]) -> Cit
     return merge_to
 
 
+def _recheck_interval(citation_url: CitationUrl, previous_status: int, changed: bool) -> timedelta:
+    """Interval until *citation_url* should be crawled again, given how its last check went."""
+    previous = citation_url.recheck_interval
+    status = citation_url.status
+    if status == CitationUrl.Status.UNKNOWN:
+        return RECHECK_UNKNOWN
+    if status == CitationUrl.Status.DEAD:
+        if previous and previous_status == CitationUrl.Status.DEAD:
+            return min(previous * 2, RECHECK_DEAD_MAX)
+        return RECHECK_DEAD
+    if status != CitationUrl.Status.VALID:
+        return RECHECK_IGNORED
+
+    if not previous or previous_status != CitationUrl.Status.VALID:
+        interval = RECHECK_INTERVAL
+    elif changed:
+        interval = previous / 2
+    else:
+        interval = previous * 1.5
+    interval = max(RECHECK_MIN, interval, _freshness_lifetime(citation_url.last_cachecontrol) or RECHECK_MIN)
+    return min(interval, RECHECK_MAX)
+
+
+def _content_changed(citation_url: CitationUrl, info: dict[str, Any]) -> bool:
+    """Whether a full (non-304) fetch found different content than the last one."""
+    if info["etag"] and citation_url.last_etag:
+        return info["etag"] != citation_url.last_etag
+    if info["last-modified"] and citation_url.last_modified:
+        return info["last-modified"] != citation_url.last_modified
+    previous = CitationUrlContent.objects.filter(citation=citation_url).values_list('text', flat=True).first()
+    return previous is None or previous != (info.get("text") or '')
+
+
+def recrawl_queue(citations=None, *, due_only: bool = False):
+    """
+    Order *citations* (default: all) by recrawl priority: URLs never checked
+    or still UNKNOWN first, then DEAD ones, then everything else, each lane
+    by how long it has been due. A URL without a next_check is due now.
+    With *due_only*, skip URLs not yet due.
+    """
+    if citations is None:
+        citations = CitationUrl.objects.all()
+    if due_only:
+        citations = citations.filter(Q(next_check__isnull=True) | Q(next_check__lte=timezone.now()))
+    lane = Case(
+        When(Q(last_checked__isnull=True) | Q(status=CitationUrl.Status.UNKNOWN), then=0),
+        When(status=CitationUrl.Status.DEAD, then=1),
+        default=2,
+    )
+    return citations.annotate(recrawl_lane=lane).order_by(
+        'recrawl_lane', F('next_check').asc(nulls_first=True), 'id')
+
+
 def process_citation_url(
         citation_url: CitationUrl,
     *,
@@ -807,6 +1026,8 @@ def process_citation_url(
                                caller should apply info["title"] and then save.
     """
     info = None
+    previous_status = citation_url.status
+    changed = True
 
     # URL cleanup — fix common malformed URL patterns
     if not citation_url.url.lower().startswith("http"):
@@ -830,11 +1051,14 @@ def process_citation_url(
         return other, info
 
     try:
+        # Always revalidate, so that an unchanged page is only a 304
         info = fetch_url_metadata(
             citation_url.url,
             system=system,
             skip_spamcheck=skip_spamcheck,
             request_timeout=request_timeout,
+            if_none_match=citation_url.last_etag,
+            if_modified_since=citation_url.last_modified,
             allow_redirects=allow_redirects,
         )
 
@@ -847,6 +1071,17 @@ def process_citation_url(
                 return other, info
             citation_url.url = new_url
 
+        if info["status-code"] == 304:
+            # Not modified: keep everything the last full fetch found
+            changed = False
+            citation_url.last_etag = info["etag"] or citation_url.last_etag
+            citation_url.last_modified = info["last-modified"] or citation_url.last_modified
+            if info["cache-control"]:
+                citation_url.last_cachecontrol = info["cache-control"]
+            return citation_url, info
+
+        changed = _content_changed(citation_url, info)
+
         # Update metadata fields (status and last_title are set below, after the try block)
         citation_url.last_statuscode = info["status-code"]
         citation_url.last_contenttype = info["content-type"]
@@ -890,6 +1125,8 @@ def process_citation_url(
         if info is not None:
             citation_url.status = info["status"]
         citation_url.last_checked = timezone.now()
+        citation_url.recheck_interval = _recheck_interval(citation_url, previous_status, changed)
+        citation_url.next_check = citation_url.last_checked + citation_url.recheck_interval
         citation_url.save()
 
     return citation_url, info
@@ -929,6 +1166,10 @@ def crawl_citation_url(
     LOG.info(f"  Crawling {citation.url} [skip_spamcheck={skip_spamcheck}]")
     _citation, result = process_citation_url(citation, system=system, skip_spamcheck=skip_spamcheck)
     if result and _citation.status == CitationUrl.Status.VALID:
+        if result.get('status-code') == 304:
+            # Unchanged since the content we already have
+            content = CitationUrlContent.objects.filter(citation=_citation).first()
+            return content.text if content and content.text else None
         return result.get('text') or None
     return None
 
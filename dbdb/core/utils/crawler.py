@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import logging
+import time
+from urllib.parse import urlsplit
+
+from tldextract import tldextract
+
+LOG = logging.getLogger(__name__)
+
+
+def registered_domain(url: str) -> str:
+    """
+    Return the registered domain of the URL (e.g. 'example.co.uk' for
+    'https://docs.example.co.uk/x'), or its host if it has none (IP addresses).
+    """
+    extracted = tldextract.extract(url)
+    if extracted.domain and extracted.suffix:
+        return f'{extracted.domain}.{extracted.suffix}'
+    return (urlsplit(url).hostname or '').lower()
+
+
+class DomainThrottle:
+    """
+    Politeness state of one registered domain: a token bucket that refills
+    one token every `interval` seconds up to `burst` tokens, and a cap of
+    `max_active` requests in flight at once.
+    """
+
+    def __init__(self, interval, burst=1, max_active=1, now=None):
+        self.interval = interval
+        self.burst = max(1, burst)
+        self.max_active = max(1, max_active)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic() if now is None else now
+        self.active = 0
+        return
+
+    def _refill(self, now):
+        if self.interval > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+        else:
+            self.tokens = float(self.burst)
+        self.updated = now
+        return
+
+    def delay(self, now) -> float | None:
+        """
+        Seconds until the next request may start, or None while the domain
+        is at its concurrency cap (it becomes ready when one finishes).
+        """
+        if self.active >= self.max_active:
+            return None
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) * self.interval
+
+    def start(self, now) -> None:
+        self._refill(now)
+        self.tokens -= 1
+        self.active += 1
+        return
+
+    def finish(self) -> None:
+        self.active -= 1
+        return
+
+    pass
+
+
+class CrawlScheduler:
+    """
+    Runs `func(item)` for a stream of items on a pool of `workers` threads,
+    keeping each registered domain within its DomainThrottle. Items of
+    unrelated domains run in parallel; items of one domain are started in
+    the order they arrive. Only a window of the stream is held in memory, so
+    it can be fed a lazily evaluated queryset.
+    """
+
+    def __init__(self, workers=8, interval=5.0, burst=1, max_active=1, lookahead=None):
+        self.workers = max(1, workers)
+        self.interval = interval
+        self.burst = burst
+        self.max_active = max_active
+        self.lookahead = lookahead or self.workers * 64
+        return
+
+    def run(self, items, url, func):
+        """
+        Generator of (item, result, exception) tuples in completion order,
+        where `url(item)` gives the URL used to pick the item's domain.
+        Closing the generator cancels everything that has not started.
+        """
+        items = iter(items)
+        exhausted = False
+        queues = collections.OrderedDict()   # domain -> deque of waiting items
+        throttles = {}
+        waiting = 0
+        running = {}                          # future -> (domain, item)
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                         thread_name_prefix='crawler')
+        try:
+            while True:
+                # Read ahead so that blocked domains don't starve the pool
+                while not exhausted and waiting < self.lookahead:
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    domain = registered_domain(url(item))
+                    queues.setdefault(domain, collections.deque()).append(item)
+                    waiting += 1
+
+                # Start as many ready domains as there are idle workers,
+                # round-robin over the domains in the order they were queued
+                now = time.monotonic()
+                next_ready = None
+                for domain in list(queues):
+                    if len(running) >= self.workers:
+                        break
+                    throttle = throttles.get(domain)
+                    if throttle is None:
+                        throttle = throttles[domain] = DomainThrottle(
+                            self.interval, self.burst, self.max_active, now)
+                    delay = throttle.delay(now)
+                    if delay is None:
+                        continue
+                    if delay > 0:
+                        next_ready = delay if next_ready is None else min(next_ready, delay)
+                        continue
+                    queue = queues.pop(domain)
+                    item = queue.popleft()
+                    waiting -= 1
+                    if queue:
+                        queues[domain] = queue   # back of the line
+                    throttle.start(now)
+                    running[executor.submit(func, item)] = (domain, item)
+
+                if not running:
+                    if exhausted and not waiting:
+                        break
+                    if next_ready is not None:
+                        LOG.debug("All queued domains are throttled, waiting %.1fs", next_ready)
+                        time.sleep(next_ready)
+                    continue
+
+                done, _ = concurrent.futures.wait(list(running), timeout=next_ready,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    domain, item = running.pop(future)
+                    throttles[domain].finish()
+                    exception = future.exception()
+                    yield item, None if exception else future.result(), exception
+
+                # Forget idle domains whose bucket has refilled
+                if len(throttles) > self.lookahead:
+                    now = time.monotonic()
+                    for domain in [d for d, t in throttles.items()
+                                   if d not in queues and t.active == 0 and t.delay(now) == 0
+                                   and t.tokens >= t.burst]:
+                        del throttles[domain]
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return
+
+    pass
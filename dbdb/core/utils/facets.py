@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import collections
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from dbdb.core.models import Attribute, EffectiveFeatureOption, SystemFeature, SystemVersion
+
+LOG = logging.getLogger(__name__)
+
+# Shared cache key holding the current facet index stamp.  Every worker keeps
+# its own in-memory FacetIndex and rebuilds it when this value changes.
+_STAMP_CACHE_KEY = 'dbdb:facet-index:stamp'
+
+# Cache key for the serialized browse sidebar (FilterGroups + JSON payload)
+FACET_CATALOG_CACHE_KEY = 'dbdb:facet-catalog'
+
+# SystemVersion M2M fields indexed by the slug of the related object.
+# Attribute.sv_field values are added at build time.
+_SLUG_FIELDS = {
+    'developer_orgs':   'developer_orgs__slug',
+    'acquisitions':     'acquisitions__organization__slug',
+    'compatible_with':  'compatible_with__slug',
+    'derived_from':     'derived_from__slug',
+    'embedded':         'embedded__slug',
+    'hosted_services':  'hosted_services__slug',
+    'inspired_by':      'inspired_by__slug',
+    'supported_languages': 'supported_languages__slug',
+}
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+
+def _bits_from_positions(positions, size: int) -> int:
+    buf = bytearray((size + 7) // 8)
+    for pos in positions:
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, 'little')
+
+
+# ==============================================
+# FacetIndex
+# ==============================================
+class FacetIndex:
+    """
+    Bitmap index over the current SystemVersions.
+
+    Each indexed facet value maps to a Python int used as a bitset, where bit
+    N is set if the Nth current version (ordered by id) has that value.
+    Filters are evaluated with plain int operators and converted back to
+    SystemVersion ids once via ids().
+
+    Keys:
+        ('countries', CODE)          country of origin
+        (field, slug)                SystemVersion M2M field → related slug
+        ('feature', option_id)       FeatureOption set directly on the version
+        ('feature+inherited', id)    FeatureOption from EffectiveFeatureOption
+        ('feature-exists', fid)      version has a SystemFeature for the Feature
+        ('exists', lookup)           version matches an existence lookup
+    """
+
+    def __init__(self, version_ids, stamp=None):
+        self.version_ids = list(version_ids)
+        self.positions = {vid: pos for pos, vid in enumerate(self.version_ids)}
+        self.universe = (1 << len(self.version_ids)) - 1
+        self.stamp = stamp
+        self.built = time.monotonic()
+        self._bits = {}
+        self._counts = {}
+        return
+
+    @classmethod
+    def build(cls, exists_lookups=(), stamp=None) -> FacetIndex:
+        """
+        Load every indexed facet for the current SystemVersions.
+        `exists_lookups` is an iterable of (orm_lookup, value) pairs whose
+        matching versions are stored under ('exists', orm_lookup).
+        """
+        current = SystemVersion.objects.filter(is_current=True).order_by()
+        rows = sorted(current.values_list('id', 'countries'))
+        index = cls([vid for vid, _ in rows], stamp=stamp)
+        pos_of = index.positions
+
+        members = collections.defaultdict(set)
+        counts = collections.defaultdict(lambda: collections.defaultdict(int))
+
+        # Countries are stored comma-separated on the version
+        for vid, codes in rows:
+            for code in (codes or '').split(','):
+                if code:
+                    members[('countries', code.upper())].add(pos_of[vid])
+
+        # M2M fields keyed by the related object's slug
+        slug_fields = dict(_SLUG_FIELDS)
+        for sv_field in Attribute.objects.filter(sv_field__gt='').values_list('sv_field', flat=True):
+            slug_fields.setdefault(sv_field, f'{sv_field}__slug')
+        for field, path in slug_fields.items():
+            qs = current.filter(**{f'{field}__isnull': False}).values_list('id', path)
+            for vid, slug in qs:
+                pos = pos_of.get(vid)
+                if pos is None:
+                    continue
+                members[(field, slug)].add(pos)
+                members[('exists', f'{field}__isnull')].add(pos)
+                counts[field][pos] += 1
+
+        for lookup, value in exists_lookups:
+            key = ('exists', lookup)
+            qs = current.filter(**{lookup: value}).values_list('id', flat=True).distinct()
+            members[key] = {pos_of[vid] for vid in qs if vid in pos_of}
+
+        # Feature options: direct ones from SystemFeature.options, effective
+        # ones (with SystemFeature.system inheritance) from EffectiveFeatureOption
+        option_rows = SystemFeature.options.through.objects \
+            .filter(systemfeature__version__is_current=True) \
+            .order_by() \
+            .values_list('systemfeature__version_id', 'systemfeature__feature_id', 'featureoption_id')
+        for vid, fid, oid in option_rows:
+            pos = pos_of.get(vid)
+            if pos is None:
+                continue
+            members[('feature', oid)].add(pos)
+            counts[('feature', fid)][pos] += 1
+
+        for vid, oid in EffectiveFeatureOption.objects \
+                .filter(version__is_current=True) \
+                .order_by() \
+                .values_list('version_id', 'option_id'):
+            pos = pos_of.get(vid)
+            if pos is not None:
+                members[('feature+inherited', oid)].add(pos)
+
+        for vid, fid in SystemFeature.objects \
+                .filter(version__is_current=True) \
+                .order_by() \
+                .values_list('version_id', 'feature_id'):
+            pos = pos_of.get(vid)
+            if pos is None:
+                continue
+            members[('feature-exists', fid)].add(pos)
+            counts[('feature', fid)][pos] += 0
+
+        size = len(index.version_ids)
+        index._bits = {key: _bits_from_positions(p, size) for key, p in members.items()}
+        index._counts = {key: dict(c) for key, c in counts.items()}
+        return index
+
+    def get(self, key) -> int:
+        return self._bits.get(key, 0)
+
+    def any_of(self, keys) -> int:
+        bits = 0
+        for key in keys:
+            bits |= self.get(key)
+        return bits
+
+    def all_of(self, keys) -> int:
+        bits = self.universe
+        for key in keys:
+            bits &= self.get(key)
+        return bits
+
+    def at_least(self, key, min_count: int) -> int:
+        """Versions with at least `min_count` values for a counted key
+        (an M2M field name or ('feature', feature_id))."""
+        counts = self._counts.get(key, {})
+        return _bits_from_positions(
+            (pos for pos, n in counts.items() if n >= min_count),
+            len(self.version_ids),
+        )
+
+    def bits(self, version_ids) -> int:
+        """Convert SystemVersion ids into a bitset (unknown ids are ignored)."""
+        pos_of = self.positions
+        return _bits_from_positions(
+            (pos_of[vid] for vid in version_ids if vid in pos_of),
+            len(self.version_ids),
+        )
+
+    def count(self, key, bits: int) -> int:
+        """Number of versions in `bits` that also have `key`."""
+        return (self.get(key) & bits).bit_count()
+
+    def ids(self, bits: int) -> list:
+        """Convert a bitset back into SystemVersion ids."""
+        bits &= self.universe
+        if not bits:
+            return []
+        flags = bin(bits)[:1:-1]
+        return [self.version_ids[pos] for pos, flag in enumerate(flags) if flag == '1']
+
+    pass
+
+
+def bump_facet_index() -> None:
+    """Mark every worker's facet index and the cached facet catalog as stale."""
+    global _INDEX
+    cache.set(_STAMP_CACHE_KEY, time.time_ns(), None)
+    cache.delete(FACET_CATALOG_CACHE_KEY)
+    _INDEX = None
+    return
+
+
+def get_facet_index(exists_lookups=()) -> FacetIndex:
+    """
+    Return this worker's FacetIndex, rebuilding it if the shared stamp has
+    moved or if it is older than settings.DBDB_FACET_INDEX_TTL.  The TTL
+    covers cache backends that cannot share the stamp (e.g. DummyCache).
+    """
+    global _INDEX
+    stamp = cache.get(_STAMP_CACHE_KEY)
+    ttl = getattr(settings, 'DBDB_FACET_INDEX_TTL', 300)
+    with _INDEX_LOCK:
+        index = _INDEX
+        if index is None \
+                or (stamp is not None and stamp != index.stamp) \
+                or time.monotonic() - index.built >= ttl:
+            if stamp is None:
+                stamp = time.time_ns()
+                cache.add(_STAMP_CACHE_KEY, stamp, None)
+            start = time.monotonic()
+            index = FacetIndex.build(exists_lookups, stamp=stamp)
+            LOG.debug("Rebuilt facet index for %d versions in %.3fs",
+                      len(index.version_ids), time.monotonic() - start)
+            _INDEX = index
+    return index
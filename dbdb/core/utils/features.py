@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import collections
+import logging
+
+from django.db import transaction
+
+from dbdb.core.models import EffectiveFeatureOption, SystemFeature
+
+LOG = logging.getLogger(__name__)
+
+
+def _inheriting_systems(system_ids, feature_ids=None) -> set:
+    """
+    Return `system_ids` plus every System whose current version inherits a
+    Feature (directly or transitively) from one of them.
+    """
+    affected = set(system_ids)
+    frontier = set(system_ids)
+    while frontier:
+        children = SystemFeature.objects \
+            .filter(version__is_current=True, system_id__in=frontier) \
+            .order_by()
+        if feature_ids is not None:
+            children = children.filter(feature_id__in=feature_ids)
+        children = set(children.values_list('version__system_id', flat=True)) - affected
+        affected |= children
+        frontier = children
+    return affected
+
+
+def refresh_effective_options(system_ids=None, feature_ids=None) -> int:
+    """
+    Rebuild the EffectiveFeatureOption rows for the current versions of
+    `system_ids` and of every system that inherits from them. If
+    `system_ids` is None, the whole table is rebuilt. `feature_ids`
+    optionally limits the refresh to those Features.
+
+    Resolution follows SystemFeature.get_my_or_parent_options(): a
+    SystemFeature's own options win; otherwise options are taken from the
+    parent system's current SystemFeature for the same Feature, recursively.
+
+    Returns the number of rows written.
+    """
+    current_sfs = SystemFeature.objects.filter(version__is_current=True).order_by()
+    if feature_ids is not None:
+        current_sfs = current_sfs.filter(feature_id__in=feature_ids)
+    if system_ids is None:
+        affected = None
+        sfs = current_sfs
+    else:
+        affected = _inheriting_systems(system_ids, feature_ids)
+        sfs = current_sfs.filter(version__system_id__in=affected)
+
+    # (system_id, feature_id) → (systemfeature_id, version_id, parent_system_id)
+    by_key = {
+        (sys_id, fid): (sf_id, vid, parent_id)
+        for sf_id, vid, sys_id, fid, parent_id
+        in sfs.values_list('id', 'version_id', 'version__system_id', 'feature_id', 'system_id')
+    }
+    own = collections.defaultdict(list)
+    for sf_id, oid in SystemFeature.options.through.objects \
+            .filter(systemfeature__in=sfs) \
+            .values_list('systemfeature_id', 'featureoption_id'):
+        own[sf_id].append(oid)
+
+    # Parents outside the refreshed set keep their already materialized rows
+    stored = collections.defaultdict(list)
+    if affected is not None:
+        outside = {p for _, _, p in by_key.values() if p is not None and p not in affected}
+        features = {fid for _, fid in by_key}
+        if outside:
+            for sys_id, fid, oid in EffectiveFeatureOption.objects \
+                    .filter(version__is_current=True, version__system_id__in=outside, feature_id__in=features) \
+                    .values_list('version__system_id', 'feature_id', 'option_id'):
+                stored[(sys_id, fid)].append(oid)
+
+    def resolve(sys_id, fid, seen):
+        if (sys_id, fid) not in by_key:
+            return stored.get((sys_id, fid), [])
+        sf_id, _, parent_id = by_key[(sys_id, fid)]
+        if own[sf_id]:
+            return own[sf_id]
+        if parent_id is None or parent_id in seen:
+            return []
+        return resolve(parent_id, fid, seen | {parent_id})
+
+    rows = []
+    for (sys_id, fid), (sf_id, vid, parent_id) in by_key.items():
+        if own[sf_id]:
+            rows.extend(
+                EffectiveFeatureOption(version_id=vid, feature_id=fid, option_id=oid)
+                for oid in own[sf_id]
+            )
+        elif parent_id is not None:
+            rows.extend(
+                EffectiveFeatureOption(version_id=vid, feature_id=fid, option_id=oid,
+                                       inherited_from_id=parent_id)
+                for oid in resolve(parent_id, fid, {sys_id, parent_id})
+            )
+
+    with transaction.atomic():
+        stale = EffectiveFeatureOption.objects.all()
+        if affected is not None:
+            stale = stale.filter(version__system_id__in=affected)
+        if feature_ids is not None:
+            stale = stale.filter(feature_id__in=feature_ids)
+        stale.delete()
+        EffectiveFeatureOption.objects.bulk_create(rows, batch_size=1000)
+
+    LOG.debug("Refreshed %d effective feature options for %s systems",
+              len(rows), 'all' if affected is None else len(affected))
+    return len(rows)
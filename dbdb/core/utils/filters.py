@@ -11,6 +11,7 @@ class FilterChoice:
     id: str
     label: str
     # is_hidden: bool = False
+    count: int | None = None  # systems matching if this choice is added
 
 # ==============================================
 # FilterGroup
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import numpy as np
+
+# 2**11 registers: about 2.3% standard error, at most 2 KB per sketch
+PRECISION = 11
+NUM_REGISTERS = 1 << PRECISION
+
+# Sketch encodings (first byte). Sparse sketches store the non-zero
+# registers as uint16 indexes followed by uint8 values.
+_DENSE = b'\x01'
+_SPARSE = b'\x02'
+
+_ALPHA = 0.7213 / (1 + 1.079 / NUM_REGISTERS)
+
+
+def hash_registers(hashes):
+    """
+    Return (register index, rank) arrays for an array of 64-bit hashes: the
+    index is the top PRECISION bits and the rank is the position of the
+    first set bit in the rest.
+    """
+    h = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+    index = (h >> np.uint64(64 - PRECISION)).astype(np.intp)
+    rest = h & np.uint64((1 << (64 - PRECISION)) - 1)
+    # The rest has 53 bits, so frexp() on its float64 value is exact
+    _, exponent = np.frexp(rest.astype(np.float64))
+    rank = np.where(rest == 0, 64 - PRECISION + 1, 64 - PRECISION + 1 - exponent)
+    return index, rank.astype(np.uint8)
+
+
+def build_sketches(groups, hashes) -> dict:
+    """Return {group: sketch bytes} for parallel arrays of group keys and 64-bit hashes."""
+    if len(hashes) == 0:
+        return {}
+    keys, inverse = np.unique(np.asarray(groups), return_inverse=True)
+    index, rank = hash_registers(hashes)
+    registers = np.zeros((len(keys), NUM_REGISTERS), dtype=np.uint8)
+    np.maximum.at(registers, (inverse, index), rank)
+    return {key.item(): encode(row) for key, row in zip(keys, registers, strict=True)}
+
+
+def encode(registers) -> bytes:
+    nonzero = np.flatnonzero(registers)
+    if len(nonzero) * 3 < NUM_REGISTERS:
+        return _SPARSE + nonzero.astype('<u2').tobytes() + registers[nonzero].astype(np.uint8).tobytes()
+    return _DENSE + np.asarray(registers, dtype=np.uint8).tobytes()
+
+
+def decode(sketch) -> np.ndarray:
+    sketch = bytes(sketch)
+    registers = np.zeros(NUM_REGISTERS, dtype=np.uint8)
+    if sketch[:1] == _DENSE:
+        registers[:] = np.frombuffer(sketch, dtype=np.uint8, offset=1)
+    elif sketch[:1] == _SPARSE:
+        n = (len(sketch) - 1) // 3
+        index = np.frombuffer(sketch, dtype='<u2', count=n, offset=1)
+        registers[index] = np.frombuffer(sketch, dtype=np.uint8, count=n, offset=1 + 2 * n)
+    return registers
+
+
+def merge(sketches) -> np.ndarray:
+    """Return the registers of the union of the given sketches (None is skipped)."""
+    registers = np.zeros(NUM_REGISTERS, dtype=np.uint8)
+    for sketch in sketches:
+        if sketch:
+            np.maximum(registers, decode(sketch), out=registers)
+    return registers
+
+
+def estimate(registers) -> int:
+    """Estimated number of distinct hashes behind the registers."""
+    registers = np.asarray(registers)
+    raw = _ALPHA * NUM_REGISTERS ** 2 / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = NUM_REGISTERS - np.count_nonzero(registers)
+    if raw <= 2.5 * NUM_REGISTERS and zeros:
+        # Linear counting is more accurate for small sets
+        raw = NUM_REGISTERS * np.log(NUM_REGISTERS / zeros)
+    return int(round(raw))
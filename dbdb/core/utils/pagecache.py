@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response, set_response_etag
+
+LOG = logging.getLogger(__name__)
+
+# Shared cache key holding the current page cache generation.  Every cached
+# page key embeds it, so bumping it invalidates all pages on every worker.
+_GENERATION_CACHE_KEY = 'dbdb:page-cache:generation'
+
+# Per-process L1 cache alias; the default cache is the shared L2
+LOCAL_CACHE_ALIAS = 'local'
+
+# Stamps embedded in cached system page keys (see cache_system_page)
+_SYSTEM_EPOCH_CACHE_KEY = 'dbdb:system-page:epoch'
+_CITATION_STAMP_CACHE_KEY = 'dbdb:system-page:citations'
+_RELATED_STAMP_CACHE_KEY = 'dbdb:system-page:related:{}'
+
+
+def _shared():
+    return caches['default']
+
+
+def _local():
+    return caches[LOCAL_CACHE_ALIAS]
+
+
+def _get_stamp(key) -> int:
+    stamp = _shared().get(key)
+    if stamp is None:
+        stamp = time.time_ns()
+        if not _shared().add(key, stamp, None):
+            stamp = _shared().get(key, stamp)
+    return stamp
+
+
+def get_page_generation() -> int:
+    return _get_stamp(_GENERATION_CACHE_KEY)
+
+
+def bump_page_cache() -> None:
+    """Invalidate every cached anonymous page on every worker."""
+    _shared().set(_GENERATION_CACHE_KEY, time.time_ns(), None)
+    LOG.debug("Bumped page cache generation")
+    return
+
+
+def bump_system_pages() -> None:
+    """Invalidate every cached system page, including historical revisions."""
+    _shared().set(_SYSTEM_EPOCH_CACHE_KEY, time.time_ns(), None)
+    LOG.debug("Bumped system page epoch")
+    return
+
+
+def bump_citation_status() -> None:
+    """Invalidate cached current system pages after a CitationUrl status change."""
+    _shared().set(_CITATION_STAMP_CACHE_KEY, time.time_ns(), None)
+    return
+
+
+def bump_related_systems(system_ids) -> None:
+    """Invalidate the cached current pages of the given systems."""
+    stamp = time.time_ns()
+    _shared().set_many({_RELATED_STAMP_CACHE_KEY.format(sid): stamp for sid in system_ids}, None)
+    return
+
+
+def _page_cache_key(request, generation) -> str:
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    return f'dbdb:page:{generation}:{path}'
+
+
+def _is_cacheable_request(request) -> bool:
+    return request.method == 'GET' \
+        and not request.user.is_authenticated \
+        and 'messages' not in request.COOKIES
+
+
+def _get_cached(key, timeout):
+    response = _local().get(key)
+    if response is None:
+        response = _shared().get(key)
+        if response is not None:
+            _local().set(key, response, timeout)
+    return response
+
+
+def _is_storable(response) -> bool:
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def _set_cached(key, response, timeout) -> None:
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    _local().set(key, response, timeout)
+    _shared().set(key, response, timeout)
+    return
+
+
+def cache_anonymous_page(view_func):
+    """
+    Cache the rendered response of anonymous GET requests in the local L1
+    cache and the shared L2 cache for settings.DBDB_PAGE_CACHE_TIMEOUT
+    seconds, keyed by the full path and the current page generation.
+    A timeout of 0 disables the cache.
+    """
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        timeout = settings.DBDB_PAGE_CACHE_TIMEOUT
+        if not timeout or not _is_cacheable_request(request):
+            return view_func(request, *args, **kwargs)
+
+        key = _page_cache_key(request, get_page_generation())
+        response = _get_cached(key, timeout)
+        if response is not None:
+            return response
+
+        response = view_func(request, *args, **kwargs)
+        if _is_storable(response):
+            _set_cached(key, response, timeout)
+        return response
+
+    return wrapper
+
+
+def _system_page_cache_key(request, slug, ver):
+    """
+    Return (key, timeout) for a system page request, or (None, None) if the
+    page must not be cached. Historical revisions are immutable and keyed by
+    their ver alone; the current page is keyed by System.ver plus the
+    related-systems and citation-status stamps.
+    """
+    from dbdb.core.models import System
+
+    row = System.objects.filter(slug=slug).values_list('id', 'ver').first()
+    if row is None:
+        # Redirect or 404
+        return None, None
+    system_id, current_ver = row
+    epoch = _get_stamp(_SYSTEM_EPOCH_CACHE_KEY)
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+
+    if ver is not None and int(ver) < current_ver:
+        return f'dbdb:system-page:{epoch}:{system_id}:v{ver}:{path}', None
+    if ver is not None and int(ver) > current_ver:
+        # Pending revisions may still be discarded or renumbered
+        return None, None
+
+    related = _get_stamp(_RELATED_STAMP_CACHE_KEY.format(system_id))
+    citations = _get_stamp(_CITATION_STAMP_CACHE_KEY)
+    key = f'dbdb:system-page:{epoch}:{system_id}:{current_ver}:{related}:{citations}:{path}'
+    return key, settings.DBDB_PAGE_CACHE_TIMEOUT
+
+
+def cache_system_page(view_func):
+    """
+    Cache anonymous system page responses under a key derived from the
+    system's version (see _system_page_cache_key) rather than the global
+    page generation, so approving one system does not evict every other
+    system page. Historical revisions are cached without expiry.
+    Responses carry an ETag and a matching If-None-Match gets a 304.
+    A DBDB_PAGE_CACHE_TIMEOUT of 0 disables the cache.
+    """
+
+    @functools.wraps(view_func)
+    def wrapper(request, slug, ver=None, **kwargs):
+        if not settings.DBDB_PAGE_CACHE_TIMEOUT or not _is_cacheable_request(request):
+            return view_func(request, slug, ver=ver, **kwargs)
+
+        key, timeout = _system_page_cache_key(request, slug, ver)
+        if key is None:
+            return view_func(request, slug, ver=ver, **kwargs)
+
+        response = _get_cached(key, timeout)
+        if response is None:
+            response = view_func(request, slug, ver=ver, **kwargs)
+            if not _is_storable(response):
+                return response
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            set_response_etag(response)
+            _set_cached(key, response, timeout)
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
+    return wrapper
@@ -0,0 +1,499 @@
+from __future__ import annotations
+
+import collections
+import datetime
+import logging
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from scipy import sparse
+
+from dbdb.core.models import (
+    EffectiveFeatureOption,
+    SystemCooccurrence,
+    SystemRecommendation,
+    SystemVersion,
+    SystemVisit,
+    SystemVisitor,
+)
+from dbdb.core.utils.visits import VISITOR_KEY_SQL
+
+LOG = logging.getLogger(__name__)
+
+# Rows fetched per round trip from the server-side visit cursor
+FETCH_SIZE = 50000
+
+# One row per distinct (user, system) pair. Users are the visitor keys of
+# dbdb.core.utils.visits so that no strings are shipped to Python.
+_VISITS_SQL = f"""
+    WITH filtered_visits AS (
+        SELECT {VISITOR_KEY_SQL} AS user_key, system_id
+        FROM {SystemVisit._meta.db_table}
+        {{where}}
+    ),
+    valid_users AS (
+        SELECT user_key
+        FROM filtered_visits
+        GROUP BY user_key
+        HAVING COUNT(*) BETWEEN %(min_threshold)s AND %(max_threshold)s
+    ),
+    valid_systems AS (
+        SELECT system_id
+        FROM filtered_visits
+        GROUP BY system_id
+        HAVING COUNT(*) >= %(min_visit)s
+    )
+    SELECT DISTINCT fv.user_key, fv.system_id
+    FROM filtered_visits fv
+    JOIN valid_users vu USING (user_key)
+    JOIN valid_systems vs USING (system_id)
+"""
+
+
+def build_visit_matrix(user_keys, system_ids, weights=None):
+    """
+    Return (matrix, system_ids) for parallel arrays of user keys and system
+    ids, where matrix is a users x systems CSR matrix and system_ids maps its
+    columns back to System ids. Entries are 1, or the given weights (summed
+    over duplicate pairs).
+    """
+    _, rows = np.unique(np.asarray(user_keys, dtype=np.int64), return_inverse=True)
+    columns_ids, cols = np.unique(np.asarray(system_ids, dtype=np.int64), return_inverse=True)
+    shape = (int(rows.max()) + 1 if len(rows) else 0, len(columns_ids))
+    data = np.ones(len(rows), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=shape)
+    if weights is None:
+        # Duplicate (user, system) pairs are summed by the constructor
+        matrix.data[:] = 1
+    return matrix, columns_ids
+
+
+def _fetch_columns(sql, params):
+    # Stream a query's rows through a server-side cursor into one array per column
+    chunks = []
+    with transaction.atomic(), connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    if not chunks:
+        return None
+    return np.concatenate(chunks).T
+
+
+def load_visit_matrix(*, min_threshold=2, max_threshold=99999, min_visit=2, ignore=None, since=None):
+    """
+    Read the filtered visits through a server-side cursor and return
+    (matrix, system_ids) as built by build_visit_matrix().
+
+    Users with fewer than min_threshold or more than max_threshold visits,
+    systems with fewer than min_visit visits and the `ignore` IP addresses
+    are left out. `since` limits the scan to visits created after it.
+    """
+    params = {
+        'min_threshold': min_threshold,
+        'max_threshold': max_threshold,
+        'min_visit': min_visit,
+    }
+    conditions = []
+    if ignore:
+        conditions.append("ip_address NOT IN %(ignore_list)s")
+        params['ignore_list'] = tuple(ignore)
+    if since is not None:
+        conditions.append("created >= %(since)s")
+        params['since'] = since
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    columns = _fetch_columns(_VISITS_SQL.format(where=where), params)
+    if columns is None:
+        return sparse.csr_matrix((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64)
+    return build_visit_matrix(columns[0], columns[1])
+
+
+def load_visit_pairs(*, ignore=None, since=None):
+    """
+    Return parallel arrays (user_keys, system_ids, first_seen) of the
+    distinct (user, system) pairs in SystemVisit, with first_seen in Unix
+    seconds, read through a server-side cursor.
+    """
+    params = {}
+    conditions = []
+    if ignore:
+        conditions.append("ip_address NOT IN %(ignore_list)s")
+        params['ignore_list'] = tuple(ignore)
+    if since is not None:
+        conditions.append("created >= %(since)s")
+        params['since'] = since
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    sql = f"""
+        SELECT {VISITOR_KEY_SQL}, system_id, EXTRACT(EPOCH FROM MIN(created))::bigint
+          FROM {SystemVisit._meta.db_table}
+          {where}
+         GROUP BY 1, 2
+    """
+    columns = _fetch_columns(sql, params)
+    if columns is None:
+        return tuple(np.empty(0, dtype=np.int64) for _ in range(3))
+    return columns[0], columns[1], columns[2]
+
+
+def cosine_similarity(matrix):
+    """
+    Return the systems x systems cosine similarity of the columns of a
+    users x systems matrix as a CSR matrix with an empty diagonal.
+    """
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    norms = np.sqrt(cooccurrence.diagonal())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    scale = sparse.diags(inverse)
+    similarity = (scale @ cooccurrence @ scale).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    return similarity
+
+
+def top_k(similarity, system_ids, k=5) -> dict:
+    """
+    Return {system_id: [(other_system_id, score)]} with each system's k most
+    similar systems by descending score, taken from a CSR similarity matrix.
+    """
+    recommendations = {}
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        if start == end:
+            continue
+        scores = similarity.data[start:end]
+        columns = similarity.indices[start:end]
+        if len(scores) > k:
+            best = np.argpartition(-scores, k)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        recommendations[int(system_ids[row])] = [
+            (int(system_ids[columns[i]]), float(scores[i])) for i in best
+        ]
+    return recommendations
+
+
+def dense_top_k(matrix, system_ids, k=5) -> dict:
+    """
+    The original process_visits recommender on a dense copy of the matrix
+    (smoothed cosine similarity, full argsort per system), kept as the
+    baseline for benchmark_recommender and evaluate_recommender.
+    """
+    data = matrix.toarray().astype(np.float64)
+    sim = data.T.dot(data) + 1e-9
+    norms = np.array([np.sqrt(np.diagonal(sim))])
+    sim = sim / norms / norms.T
+    recommendations = {}
+    for row in range(sim.shape[0]):
+        best = [i for i in np.argsort(sim[row, :])[:-k - 2:-1] if i != row][:k]
+        recommendations[int(system_ids[row])] = [(int(system_ids[i]), float(sim[row, i])) for i in best]
+    return recommendations
+
+
+def store_recommendations(recommendations, system_ids=None) -> int:
+    """
+    Replace the SystemRecommendation rows of the systems in
+    `recommendations`, plus any other `system_ids`, with one delete and one
+    bulk_create in a single transaction. Returns the number of rows created.
+    """
+    rows = [
+        SystemRecommendation(system_id=system_id, recommendation_id=other_id, score=score)
+        for system_id, recs in recommendations.items()
+        for other_id, score in recs
+        if other_id != system_id
+    ]
+    replaced = set(recommendations)
+    if system_ids is not None:
+        replaced.update(int(x) for x in system_ids)
+    with transaction.atomic():
+        SystemRecommendation.objects.filter(system_id__in=replaced).delete()
+        SystemRecommendation.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# ----------------------------------------------
+# Incremental co-occurrence store
+# ----------------------------------------------
+
+# Visits written up to this long before the newest SystemVisitor are
+# re-read on every update, so late buffer flushes are not missed
+VISIT_GRACE = datetime.timedelta(hours=1)
+
+# The stored forward-decay weights are re-based onto a new epoch once the
+# newest visit is this many half-lives past the current one; see
+# update_cooccurrences()
+REBASE_HALF_LIVES = 64
+
+# Weights below 2 ** MIN_DECAY_EXPONENT are stored as 0 so that rescaling
+# and multiplying them never underflows a double
+MIN_DECAY_EXPONENT = -500
+
+_NEW_PAIRS_SQL = f"""
+    CREATE TEMP TABLE recommender_new_pairs ON COMMIT DROP AS
+    SELECT v.visitor, v.system_id, v.first_seen, 1.0::float8 AS weight
+      FROM (SELECT {VISITOR_KEY_SQL} AS visitor, system_id, MIN(created) AS first_seen
+              FROM {SystemVisit._meta.db_table}
+              {{where}}
+             GROUP BY 1, 2) v
+     WHERE NOT EXISTS (SELECT 1 FROM {SystemVisitor._meta.db_table} o
+                        WHERE o.visitor = v.visitor AND o.system_id = v.system_id)
+"""
+
+# A visitor counts once they have viewed between min_systems and max_systems
+# distinct systems. Visitors reaching min_systems in this batch add their
+# whole history; those already counted add the pairs involving a new system.
+_INCREMENT_SQL = f"""
+    WITH sizes AS (
+        SELECT n.visitor, COUNT(*) AS new_n,
+               (SELECT COUNT(*) FROM {SystemVisitor._meta.db_table} o WHERE o.visitor = n.visitor) AS old_n
+          FROM recommender_new_pairs n
+         GROUP BY n.visitor
+    ),
+    active AS (
+        SELECT visitor, old_n < %(min_systems)s AS crossing
+          FROM sizes
+         WHERE old_n + new_n BETWEEN %(min_systems)s AND %(max_systems)s
+    ),
+    history AS (
+        SELECT n.visitor, n.system_id, n.weight, TRUE AS is_new
+          FROM recommender_new_pairs n JOIN active USING (visitor)
+        UNION ALL
+        SELECT o.visitor, o.system_id, o.weight, FALSE
+          FROM {SystemVisitor._meta.db_table} o JOIN active USING (visitor)
+    )
+    INSERT INTO {SystemCooccurrence._meta.db_table} (system_id, other_id, visitors, weight)
+    SELECT h1.system_id, h2.system_id, COUNT(*), SUM(sqrt(h1.weight * h2.weight))
+      FROM history h1
+      JOIN history h2 USING (visitor)
+      JOIN active USING (visitor)
+     WHERE active.crossing OR h1.is_new OR h2.is_new
+     GROUP BY 1, 2
+    ON CONFLICT (system_id, other_id) DO UPDATE
+       SET visitors = {SystemCooccurrence._meta.db_table}.visitors + EXCLUDED.visitors,
+           weight = {SystemCooccurrence._meta.db_table}.weight + EXCLUDED.weight
+    RETURNING system_id
+"""
+
+_DECAY_NEW_PAIRS_SQL = """
+    UPDATE recommender_new_pairs
+       SET weight = CASE WHEN EXTRACT(EPOCH FROM first_seen - %(epoch)s)::float8 / %(half_life)s
+                              < %(min_exponent)s
+                         THEN 0.0
+                         ELSE power(2.0::float8, EXTRACT(EPOCH FROM first_seen - %(epoch)s)::float8
+                                                 / %(half_life)s) END
+"""
+
+_REBASE_SQL = """
+    UPDATE {table}
+       SET weight = CASE WHEN weight >= %(threshold)s THEN weight * %(factor)s ELSE 0.0 END
+     WHERE weight <> 0
+"""
+
+_STORE_PAIRS_SQL = f"""
+    INSERT INTO {SystemVisitor._meta.db_table} (visitor, system_id, first_seen, weight)
+    SELECT visitor, system_id, first_seen, weight FROM recommender_new_pairs
+"""
+
+# Cosine top-k per system from the stored counts; the diagonal rows hold
+# each system's squared norm and distinct visitor count
+_TOP_K_SQL = f"""
+    SELECT system_id, other_id, score FROM (
+        SELECT c.system_id, c.other_id, c.weight / sqrt(da.weight * db.weight) AS score,
+               ROW_NUMBER() OVER (PARTITION BY c.system_id
+                                  ORDER BY c.weight / sqrt(da.weight * db.weight) DESC, c.other_id) AS rank
+          FROM {SystemCooccurrence._meta.db_table} c
+          JOIN {SystemCooccurrence._meta.db_table} da
+            ON da.system_id = c.system_id AND da.other_id = c.system_id
+          JOIN {SystemCooccurrence._meta.db_table} db
+            ON db.system_id = c.other_id AND db.other_id = c.other_id
+         WHERE c.system_id = ANY(%(system_ids)s)
+           AND c.other_id <> c.system_id
+           AND da.visitors >= %(min_visit)s
+           AND db.visitors >= %(min_visit)s
+           AND da.weight > 0
+           AND db.weight > 0
+    ) ranked
+    WHERE rank <= %(k)s
+    ORDER BY system_id, rank
+"""
+
+
+def update_cooccurrences(*, ignore=None, min_systems=2, max_systems=99999, half_life_days=None, rebuild=False) -> set:
+    """
+    Fold the visits since the store's watermark (the newest
+    SystemVisitor.first_seen, less VISIT_GRACE) into SystemVisitor and
+    SystemCooccurrence, and return the ids of the systems whose rows changed.
+
+    With a half-life each visitor/system pair is weighted by
+    2 ** ((first_seen - epoch) / half_life), i.e. forward decay: scaling
+    every weight by the same factor leaves the cosine scores unchanged. The
+    epoch is not stored; it follows from the newest SystemVisitor's
+    first_seen and weight. Once the newest visit is REBASE_HALF_LIVES past
+    it, every stored weight is rescaled onto an epoch at that visit, so the
+    weights stay within a double's range. The half-life cannot change
+    without a rebuild, which clears the store and replays every visit still
+    in SystemVisit.
+    """
+    if half_life_days is None:
+        half_life_days = settings.DBDB_RECOMMENDER_HALF_LIFE_DAYS
+    half_life = half_life_days * 86400.0
+    params = {
+        'min_systems': min_systems,
+        'max_systems': max_systems,
+    }
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if rebuild:
+            cursor.execute(f"TRUNCATE {SystemVisitor._meta.db_table}, {SystemCooccurrence._meta.db_table}")
+        newest = SystemVisitor.objects.order_by('-first_seen').values_list('first_seen', 'weight').first()
+        watermark = newest[0] if newest else None
+
+        conditions = []
+        if watermark is not None:
+            conditions.append("created >= %(since)s")
+            params['since'] = watermark - VISIT_GRACE
+        if ignore:
+            conditions.append("ip_address NOT IN %(ignore_list)s")
+            params['ignore_list'] = tuple(ignore)
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+        # ON COMMIT DROP only fires at the outermost commit
+        cursor.execute("DROP TABLE IF EXISTS recommender_new_pairs")
+        cursor.execute(_NEW_PAIRS_SQL.format(where=where), params)
+        LOG.debug("New visitor/system pairs since %s: %d", watermark, cursor.rowcount)
+        if half_life > 0:
+            _decay_new_pairs(cursor, newest, half_life)
+        cursor.execute(_INCREMENT_SQL, params)
+        changed = {row[0] for row in cursor.fetchall()}
+        cursor.execute(_STORE_PAIRS_SQL)
+    return changed
+
+
+def _decay_new_pairs(cursor, newest, half_life) -> None:
+    # Weight the new pairs, first moving the epoch up to the newest visit
+    # (and rescaling the stored weights by 2 ** -shift) when it is too old
+    cursor.execute("SELECT MAX(first_seen) FROM recommender_new_pairs")
+    latest = cursor.fetchone()[0]
+    if latest is None:
+        return
+    if newest is None:
+        epoch = latest
+    else:
+        first_seen, weight = newest
+        epoch = first_seen - datetime.timedelta(seconds=half_life * math.log2(weight))
+        shift = (latest - epoch).total_seconds() / half_life
+        if shift > REBASE_HALF_LIVES:
+            rescale = {
+                'threshold': 2.0 ** min(MIN_DECAY_EXPONENT + shift, 1000),
+                'factor': 2.0 ** -shift,
+            }
+            for model in (SystemVisitor, SystemCooccurrence):
+                cursor.execute(_REBASE_SQL.format(table=model._meta.db_table), rescale)
+            LOG.debug("Re-based the decay weights by %.1f half-lives", shift)
+            epoch = latest
+    cursor.execute(_DECAY_NEW_PAIRS_SQL, {
+        'epoch': epoch,
+        'half_life': half_life,
+        'min_exponent': MIN_DECAY_EXPONENT,
+    })
+    return
+
+
+def cooccurrence_top_k(system_ids, k=5, min_visit=1) -> dict:
+    """
+    Return {system_id: [(other_system_id, score)]} with the k most similar
+    systems to each of the given systems by cosine over the co-occurrence
+    store. Systems (on either side) with fewer than min_visit distinct
+    visitors are left out.
+    """
+    recommendations = {}
+    with connection.cursor() as cursor:
+        cursor.execute(_TOP_K_SQL, {'system_ids': list(system_ids), 'k': k, 'min_visit': min_visit})
+        for system_id, other_id, score in cursor.fetchall():
+            recommendations.setdefault(system_id, []).append((other_id, score))
+    return recommendations
+
+
+# ----------------------------------------------
+# Content-based recommendations
+# ----------------------------------------------
+
+# AttributeOption fields of the current version encoded as content tokens
+CONTENT_ATTRIBUTES = ('tags', 'licenses', 'written_in', 'project_types')
+
+# System relations of the current version encoded as content tokens
+CONTENT_RELATIONS = ('derived_from', 'embedded', 'inspired_by', 'compatible_with', 'hosted_services')
+
+
+def content_matrix():
+    """
+    Return (matrix, system_ids) as built by build_visit_matrix() with content
+    tokens in place of users: every current version's effective
+    FeatureOptions, its CONTENT_ATTRIBUTES options and, for each
+    CONTENT_RELATIONS edge, a token for both systems on both ends (so linked
+    systems, and systems linked to the same one, share tokens).
+    Takes one query per field.
+    """
+    # (group, id) pairs are packed into one int64 token key
+    groups = ['features'] + list(CONTENT_ATTRIBUTES) + ['links']
+    tokens, systems = [], []
+
+    def add(group, pairs):
+        offset = groups.index(group) << 32
+        for system_id, value in pairs:
+            tokens.append(offset | value)
+            systems.append(system_id)
+
+    add('features', EffectiveFeatureOption.objects
+        .filter(version__is_current=True)
+        .values_list('version__system_id', 'option_id'))
+    for field in CONTENT_ATTRIBUTES:
+        add(field, getattr(SystemVersion, field).through.objects
+            .filter(systemversion__is_current=True)
+            .values_list('systemversion__system_id', 'attributeoption_id'))
+    for field in CONTENT_RELATIONS:
+        edges = list(getattr(SystemVersion, field).through.objects
+                     .filter(systemversion__is_current=True)
+                     .values_list('systemversion__system_id', 'system_id'))
+        for source, target in edges:
+            add('links', [(source, target), (source, source), (target, source), (target, target)])
+
+    if not tokens:
+        return sparse.csr_matrix((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64)
+    return build_visit_matrix(tokens, systems)
+
+
+def content_top_k(k=5) -> dict:
+    """
+    Return {system_id: [(other_system_id, score)]} with the k systems whose
+    content_matrix() vectors are closest by cosine, for the whole catalog.
+    """
+    matrix, system_ids = content_matrix()
+    return top_k(cosine_similarity(matrix), system_ids, k)
+
+
+def blend_recommendations(visits, content, k=5, content_weight=0.2) -> dict:
+    """
+    Merge visit-based and content-based {system_id: [(other_id, score)]}
+    into the k best per system, scoring each candidate as
+    (1 - content_weight) * visit score + content_weight * content score.
+    Systems without visit-based recommendations get their content-based ones.
+    """
+    blended = {}
+    for system_id in set(visits) | set(content):
+        weight = content_weight if visits.get(system_id) else 1.0
+        scores = collections.defaultdict(float)
+        for other_id, score in visits.get(system_id, ()):
+            scores[other_id] += (1.0 - weight) * score
+        for other_id, score in content.get(system_id, ()):
+            scores[other_id] += weight * score
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        if best:
+            blended[system_id] = best
+    return blended
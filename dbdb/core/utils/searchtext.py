@@ -1,15 +1,34 @@
 import re
 
 from anyascii import anyascii
+from django.contrib.postgres.search import SearchVector
+from django.db.models import Value
 
-from dbdb.core.models import SystemFeature, SystemVersion
+from dbdb.core.models import SystemFeature, SystemSearchText, SystemVersion
 
+# tsvector weights: names rank above related terms, which rank above prose
+WEIGHT_NAME  = 'A'
+WEIGHT_TERM  = 'B'
+WEIGHT_PROSE = 'C'
 
-def generate_searchtext(ver : SystemVersion):
-    words = [ver.system.name]
+
+def _clean(words):
+    return " ".join([w.replace('\r', '').replace('\n', ' ') for w in words if w])
+
+
+def generate_weighted_searchtext(ver : SystemVersion) -> dict:
+    """
+    Return the search text for `ver` split by tsvector weight:
+    WEIGHT_NAME for the system name, former names and their variations,
+    WEIGHT_TERM for orgs, tags, attribute and feature terms, and
+    WEIGHT_PROSE for the descriptions.
+    """
+    name_words = [ver.system.name] + ver.former_names
+    prose = []
+
+    words = []
     words += [f.name for f in ver.governance.all()]
     words += [x.name for x in ver.countries]
-    words += ver.former_names
     words += [acq.organization.name for acq in ver.acquisitions.select_related('organization').all()]
     words += [x.name for x in ver.written_in.all()]
     words += [x.slug for x in ver.written_in.all()]
@@ -53,8 +72,8 @@ def generate_searchtext(ver : SystemVersion):
             if value.find("/") != -1:
                 value = " ".join(value.split("/"))
             words += [o.slug, value]
-        if sf.description: words.append(sf.description)
-    words += [ver.description]
+        if sf.description: prose.append(sf.description)
+    prose += [ver.description]
 
     # Automatically add different variations of the name for better searching
     names = [ver.system.name] + ver.former_names
@@ -63,7 +82,7 @@ def generate_searchtext(ver : SystemVersion):
     clean_name = re.sub('[^a-zA-Z0-9]', '', anyascii(ver.system.name)).strip()
     if ver.system.name != clean_name and clean_name not in names:
         names.append(clean_name)
-        words.append(clean_name)
+        name_words.append(clean_name)
         # print("Cleaned '%s' -> '%s'" % (ver.system.name, clean_name))
 
     # We also add the name of the DBMS with/without common suffixes
@@ -73,10 +92,40 @@ def generate_searchtext(ver : SystemVersion):
         has_suffix = False
         for s in suffixes:
             if name.upper().endswith(s):
-                words.append(name[:-len(s)])
+                name_words.append(name[:-len(s)])
                 has_suffix = True
         if not has_suffix:
             # print("Added variations: ", [name + s for s in suffixes])
-            words += [name + s for s in suffixes]
+            name_words += [name + s for s in suffixes]
+
+    return {
+        WEIGHT_NAME:  _clean(name_words),
+        WEIGHT_TERM:  _clean(words),
+        WEIGHT_PROSE: _clean(prose),
+    }
+
+
+def generate_searchtext(ver : SystemVersion):
+    weighted = generate_weighted_searchtext(ver)
+    return " ".join(text for text in weighted.values() if text)
+
 
-    return " ".join([w.replace('\r', '').replace('\n', ' ') for w in words])
\ No newline at end of file
+def update_searchtext(ver : SystemVersion) -> SystemSearchText:
+    """
+    Store the search text and the weighted tsvector for `ver` in the
+    system's SystemSearchText row.
+    """
+    weighted = generate_weighted_searchtext(ver)
+    sstext, _ = SystemSearchText.objects.update_or_create(
+        system=ver.system,
+        defaults={
+            'name': ver.system.name,
+            'search_text': " ".join(text for text in weighted.values() if text),
+        },
+    )
+    vector = None
+    for weight, text in weighted.items():
+        part = SearchVector(Value(text), config='simple', weight=weight)
+        vector = part if vector is None else vector + part
+    SystemSearchText.objects.filter(pk=sstext.pk).update(search_vector=vector)
+    return sstext
\ No newline at end of file
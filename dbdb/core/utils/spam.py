@@ -1,11 +1,14 @@
+import hashlib
 import logging
 import re
 import time
 
+import numpy as np
 from django.conf import settings
+from django.db.models.expressions import RawSQL
 from ollama import chat
 
-from dbdb.core.models import System
+from dbdb.core.models import SpamVerdict, System
 
 LOG = logging.getLogger(__name__)
 
@@ -13,6 +16,16 @@ LOG = logging.getLogger(__name__)
 class UnexpectedResponseError(RuntimeError):
     pass
 
+# Bump whenever the prompts of is_spam() or _check_response() change, so
+# that the verdicts cached for the old prompts are no longer used
+PROMPT_VERSION = 1
+
+# Characters of the page that the model gets to see
+MAX_PAGE_CHARS = 12000
+
+# Pages with fewer words than this only reuse verdicts of identical text
+SIMILAR_MIN_WORDS = 50
+
 # Sometimes qwen outputs "**not spam**", so we can just treat that as a valid response
 FUDGEY_RESPONSES_NOT_SPAM = [
     '**answer:** not spam',
@@ -53,6 +66,14 @@ def is_spam(
 
     assert len(html) > 0, "Empty HTML contents"
 
+    # Reuse the verdict for the same (or nearly the same) text
+    text = _normalize_text(html[:MAX_PAGE_CHARS])
+    text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    fingerprint = simhash(text)
+    cached = _cached_verdict(text, text_hash, fingerprint, system, model)
+    if cached is not None:
+        return cached
+
     system_prompt = (
         "You are a strict web page classifier.\n"
         "Your task is to decide whether a web page has been taken over by spam.\n"
@@ -92,7 +113,7 @@ def is_spam(
         "Determine whether the following HTML page has been taken over by spam, "
         "rather than legitimately discussing this database system.\n\n"
         "HTML CONTENT START\n"
-        f"{html[:12000]}\n"
+        f"{html[:MAX_PAGE_CHARS]}\n"
         "HTML CONTENT END\n\n"
         "Answer:"
     )
@@ -100,16 +121,64 @@ def is_spam(
     answer = _run_prompt(system_prompt, user_prompt, model, temperature)
 
     if any(fr in answer for fr in FUDGEY_RESPONSES_NOT_SPAM):
-        return False
-    if answer not in {"true", "false"}:
-        # If we don't get definitive answer, check whether at least the response
-        # is a technical summarization of the system. If it is, then we can assume
-        # that it is not spam
-        if _check_response(answer, system, settings.CRAWLER_SPAM_VALIDATION_MODEL, temperature):
-            return False
+        verdict = False
+    elif answer in {"true", "false"}:
+        verdict = answer == "true"
+    # If we don't get definitive answer, check whether at least the response
+    # is a technical summarization of the system. If it is, then we can assume
+    # that it is not spam
+    elif _check_response(answer, system, settings.CRAWLER_SPAM_VALIDATION_MODEL, temperature):
+        verdict = False
+    else:
         raise UnexpectedResponseError(f"Unexpected spam check LLM response [model={model} / temperature={temperature}]:\n{answer!r}")
 
-    return answer == "true"
+    SpamVerdict.objects.update_or_create(
+        text_hash=text_hash, system=system, model=model, prompt_version=PROMPT_VERSION,
+        defaults={'fingerprint': fingerprint, 'is_spam': verdict},
+    )
+    return verdict
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of the word 3-shingles of the text, as a signed bigint.
+    Texts that share most of their shingles differ in only a few bits.
+    """
+    words = text.split()
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+                       for s in shingles], dtype=np.uint64)
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    # Each bit of the fingerprint is set if it is set in most shingle hashes
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int(np.packbits(majority, bitorder='little').view('<i8')[0])
+
+def _cached_verdict(text: str, text_hash: str, fingerprint: int, system: System | None, model: str) -> bool | None:
+    """
+    The stored verdict of the same model and prompts for this text, or for
+    the most similar text whose SimHash is within the configured similarity.
+    """
+    verdicts = SpamVerdict.objects.filter(system=system, model=model, prompt_version=PROMPT_VERSION)
+    verdict = verdicts.filter(text_hash=text_hash).values_list('is_spam', flat=True).first()
+    if verdict is not None:
+        LOG.debug(f"Reusing spam verdict for identical text [system={system} / model={model}]")
+        return verdict
+
+    similarity = settings.CRAWLER_SPAM_VERDICT_SIMILARITY
+    if similarity >= 1 or len(text.split()) < SIMILAR_MIN_WORDS:
+        return None
+    nearest = (verdicts
+               .annotate(distance=RawSQL("bit_count((fingerprint # %s)::bit(64))", (fingerprint,)))
+               .filter(distance__lte=int((1 - similarity) * 64))
+               .order_by('distance', '-created')
+               .values_list('is_spam', 'distance')
+               .first())
+    if nearest is None:
+        return None
+    LOG.debug(f"Reusing spam verdict for text {nearest[1]} bits away [system={system} / model={model}]")
+    return nearest[0]
 
 def _run_prompt(system_prompt: str, user_prompt: str, model: str, temperature: float):
     payload = [
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import collections
+
+from django.db.models import Exists, OuterRef, Prefetch, Q
+
+from dbdb.core.models import (
+    Acquisition,
+    SystemFeature,
+    SystemRecommendation,
+    SystemVersion,
+    SystemVersionCodingAgent,
+)
+
+# Sidebar group -> SystemVersion M2M field that points at the viewed system
+RELATED_SYSTEM_FIELDS = collections.OrderedDict([
+    ('compatible', 'compatible_with'),
+    ('derived', 'derived_from'),
+    ('embeds', 'embedded'),
+    ('hosted_by', 'hosted_services'),
+])
+
+
+def system_page_queryset():
+    """
+    SystemVersion queryset with every relation the system page renders
+    already joined or prefetched, so the template issues no queries of its own.
+    """
+    return SystemVersion.objects \
+        .select_related(
+            'system',
+            'system_url', 'docs_url', 'blog_url',
+            'sourcerepo_url', 'wikipedia_url', 'twitter_url',
+        ) \
+        .prefetch_related(
+            'tags', 'oses', 'licenses', 'governance',
+            'project_types', 'supported_languages', 'written_in',
+            'derived_from', 'embedded', 'inspired_by', 'compatible_with',
+            'hosted_services', 'developer_orgs',
+            'description_citations', 'history_citations',
+            'start_year_citations', 'end_year_citations',
+            Prefetch('acquisitions', queryset=Acquisition.objects
+                     .select_related('organization', 'citation')
+                     .order_by('year', 'organization__name')),
+            Prefetch('coding_agent_entries', queryset=SystemVersionCodingAgent.objects
+                     .select_related('agent', 'citation')
+                     .order_by('agent__name')),
+        )
+
+
+def load_system_features(system_version) -> list:
+    """
+    Return [(SystemFeature, options)] for the version ordered by feature label,
+    where options are the linked system's current options when the
+    SystemFeature points at another system and its own options otherwise.
+    Each SystemFeature has its options and citations prefetched.
+    """
+    system_features = list(
+        SystemFeature.objects
+        .filter(version=system_version)
+        .select_related('feature', 'system')
+        .prefetch_related('options', 'citations')
+        .order_by('feature__label')
+    )
+
+    # Options of the linked systems' current SystemFeatures, in one pass
+    linked = [sf for sf in system_features if sf.system_id]
+    parent_options = {}
+    if linked:
+        parents = SystemFeature.objects \
+            .filter(version__is_current=True,
+                    version__system_id__in={sf.system_id for sf in linked},
+                    feature_id__in={sf.feature_id for sf in linked}) \
+            .select_related('version') \
+            .prefetch_related('options')
+        for parent in parents:
+            parent_options[(parent.version.system_id, parent.feature_id)] = list(parent.options.all())
+
+    return [
+        (sf, parent_options.get((sf.system_id, sf.feature_id), list(sf.options.all())))
+        for sf in system_features
+    ]
+
+
+def load_related_systems(system) -> dict:
+    """
+    Return {group: [System]} of the current versions that list the system
+    in each RELATED_SYSTEM_FIELDS relation, fetched in a single query.
+    Each System has its current version attached as `current_version`.
+    """
+    flags = {
+        group: Exists(getattr(SystemVersion, field).through.objects.filter(
+            systemversion_id=OuterRef('pk'), system_id=system.id))
+        for group, field in RELATED_SYSTEM_FIELDS.items()
+    }
+    query = Q()
+    for group in flags:
+        query |= Q(**{group: True})
+    versions = SystemVersion.objects \
+        .filter(is_current=True) \
+        .annotate(**flags) \
+        .filter(query) \
+        .select_related('system') \
+        .order_by('-logo')
+
+    related = {group: [] for group in RELATED_SYSTEM_FIELDS}
+    for ver in versions:
+        ver.system.current_version = ver
+        for group in RELATED_SYSTEM_FIELDS:
+            if getattr(ver, group):
+                related[group].append(ver.system)
+    return related
+
+
+def attach_current_versions(systems):
+    """
+    Attach each System's current version as `current_version` with one
+    query, so templates using `system.current_version.logo` do not query
+    per system.
+    """
+    pending = [s for s in systems if not isinstance(getattr(s, 'current_version', None), SystemVersion)]
+    if pending:
+        versions = SystemVersion.objects \
+            .filter(is_current=True, system_id__in={s.id for s in pending}) \
+            .select_related('system')
+        current = {ver.system_id: ver for ver in versions}
+        for s in pending:
+            if s.id in current:
+                s.current_version = current[s.id]
+    return systems
+
+
+def related_system_ids(system_id) -> set:
+    """
+    Return the ids of the systems whose page shows something of the given
+    system: the targets of its compatible/derived/embeds/hosted_by links
+    (their sidebars list it), systems hosting it or inheriting its features,
+    and systems recommending it.
+    """
+    ids = set()
+    for field in RELATED_SYSTEM_FIELDS.values():
+        through = getattr(SystemVersion, field).through
+        ids.update(through.objects
+                   .filter(systemversion__system_id=system_id)
+                   .values_list('system_id', flat=True))
+    ids.update(SystemVersion.hosted_services.through.objects
+               .filter(system_id=system_id, systemversion__is_current=True)
+               .values_list('systemversion__system_id', flat=True))
+    ids.update(SystemFeature.objects
+               .filter(system_id=system_id, version__is_current=True)
+               .values_list('version__system_id', flat=True))
+    ids.update(SystemRecommendation.objects
+               .filter(recommendation_id=system_id)
+               .values_list('system_id', flat=True))
+    ids.discard(system_id)
+    return ids
@@ -8,7 +8,11 @@ from django.db import transaction
 from django.db.models import Max
 
 from dbdb.core.models import SystemVersion, SystemVersionCodingAgent
-from dbdb.core.utils.searchtext import generate_searchtext
+from dbdb.core.utils.facets import bump_facet_index
+from dbdb.core.utils.features import refresh_effective_options
+from dbdb.core.utils.pagecache import bump_page_cache, bump_related_systems, bump_system_pages
+from dbdb.core.utils.searchtext import update_searchtext
+from dbdb.core.utils.systempage import related_system_ids
 from dbdb.core.utils.twitter_card import create_twitter_card
 
 # ── Citation M2M fields that live directly on SystemVersion ──────────────────
@@ -235,6 +239,11 @@ def delete_latest_version(system, *, dry_run: bool = False, out=None) -> None:
             system.ver = nv.ver
             system.save(update_fields=['ver', 'modified'])
 
+        refresh_effective_options([system.id])
+    bump_facet_index()
+    bump_page_cache()
+    bump_related_systems(related_system_ids(system.id))
+
 
 _VERSION_M2M = (
     'description_citations',
@@ -320,17 +329,17 @@ def finalize_new_version(new_version, *, old_logo=None) -> None:
     is saved — regardless of whether it was created from a form or by cloning.
 
     - Regenerates the twitter card if the logo changed.
-    - Updates the SystemSearchText index for the system.
+    - Updates the SystemSearchText text and weighted tsvector for the system.
     - Recomputes System.spotlight_enabled based on version completeness.
+    - Refreshes the EffectiveFeatureOption rows for the system and the
+      systems that inherit features from it.
+    - Marks the browse facet index and the anonymous page cache as stale,
+      along with the cached pages of the systems that show this one.
     """
-    from dbdb.core.models import SystemSearchText
-
     if new_version.logo is not None and old_logo != new_version.logo:
         create_twitter_card(new_version)
 
-    ver_search, _ = SystemSearchText.objects.update_or_create(system=new_version.system)
-    ver_search.search_text = generate_searchtext(new_version)
-    ver_search.save()
+    update_searchtext(new_version)
 
     eligible = is_spotlight_eligible(new_version)
     system = new_version.system
@@ -338,6 +347,11 @@ def finalize_new_version(new_version, *, old_logo=None) -> None:
         system.spotlight_eligible = eligible
         system.save(update_fields=['spotlight_eligible'])
 
+    refresh_effective_options([system.id])
+    bump_facet_index()
+    bump_page_cache()
+    bump_related_systems(related_system_ids(system.id))
+
 
 def clone_system_version(
     current_version: SystemVersion, *, creator=None, username=None, comment,
@@ -604,3 +618,6 @@ def swap_versions(system, pending_ver_num: int, live_ver_num: int,
         f"Swapped : ver {pending_ver_num} (pending) ↔ ver {live_ver_num} (live)\n"
         f"          pending is now ver {live_ver_num}, live is now ver {pending_ver_num}"
     )
+    bump_page_cache()
+    # Renumbering rewrites history, so cached revision pages are stale too
+    bump_system_pages()
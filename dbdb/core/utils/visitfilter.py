@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import atexit
+import collections
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+LOG = logging.getLogger(__name__)
+
+# User agents that are not people reading a page, by drop reason
+USER_AGENT_PATTERNS = collections.OrderedDict([
+    ('crawler', r'bot\b|bot/|crawl|spider|slurp|archiver|scraper|feedfetcher|mediapartners'),
+    ('tool', r'^curl/|^wget/|python-requests|python-urllib|aiohttp|httpx|go-http-client|java/|'
+             r'okhttp|libwww|apache-httpclient|node-fetch|axios|^ruby|^php|scrapy'),
+    ('headless', r'headless|phantomjs|selenium|puppeteer|playwright|lighthouse|pagespeed'),
+    ('preview', r'facebookexternalhit|embedly|whatsapp|skypeuripreview|bingpreview|linkpreview'),
+    ('monitor', r'uptime|pingdom|statuscake|monitor|check_http'),
+])
+_USER_AGENT_RE = re.compile(
+    '|'.join(f'(?P<{reason}>{pattern})' for reason, pattern in USER_AGENT_PATTERNS.items()),
+    re.IGNORECASE,
+)
+
+# Dropped/accepted totals of all workers are kept in the default cache
+_COUNT_CACHE_KEY = 'dbdb:visit-filter:{}'
+COUNT_REASONS = ('accepted', 'duplicate', 'invalid_ip') + tuple(USER_AGENT_PATTERNS)
+
+_FILTER = None
+_FILTER_LOCK = threading.Lock()
+
+
+def classify_user_agent(user_agent) -> str | None:
+    """Return the USER_AGENT_PATTERNS reason matching the user agent, or None for a browser."""
+    m = _USER_AGENT_RE.search(user_agent or '')
+    return m.lastgroup if m else None
+
+
+class TimeBucketedBloomFilter:
+    """
+    Approximate set of the keys added in the last `window` seconds, made of
+    `buckets` Bloom filters that each cover window / buckets seconds and are
+    cleared when their slot comes round again. Each bucket is sized for
+    `capacity` keys at the given false-positive rate, i.e. a new key is
+    wrongly reported as seen about buckets * error_rate of the time.
+    """
+
+    def __init__(self, window, capacity, error_rate=0.001, buckets=4):
+        self.span = window / buckets
+        self.num_bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = [bytearray((self.num_bits + 7) // 8) for _ in range(buckets)]
+        self._epochs = [None] * buckets
+        return
+
+    def _positions(self, key: bytes) -> list:
+        # Double hashing: position_i = h1 + i * h2
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: bytes, now=None) -> bool:
+        """
+        Add the key unless it was (probably) added within the window.
+        Returns True if it was already there.
+        """
+        epoch = int((time.monotonic() if now is None else now) // self.span)
+        positions = self._positions(key)
+        for bits, bits_epoch in zip(self._bits, self._epochs, strict=True):
+            if bits_epoch is not None and epoch - bits_epoch < len(self._bits) \
+                    and all(bits[p >> 3] & (1 << (p & 7)) for p in positions):
+                return True
+
+        slot = epoch % len(self._bits)
+        if self._epochs[slot] != epoch:
+            self._bits[slot] = bytearray(len(self._bits[slot]))
+            self._epochs[slot] = epoch
+        bits = self._bits[slot]
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+        return False
+
+    pass
+
+
+class VisitFilter:
+    """
+    Per-worker ingest filter for counter hits: drops hits without a valid IP
+    address, non-browser user agents and repeat (system, ip, user_agent) hits within the dedup window, and
+    counts what it accepted and dropped by reason.
+    """
+
+    def __init__(self, window, capacity):
+        self.pid = os.getpid()
+        self.seen = TimeBucketedBloomFilter(window, capacity) if window > 0 else None
+        self.counts = collections.Counter()
+        self._published = collections.Counter()
+        self._lock = threading.Lock()
+        return
+
+    def check(self, system_id, ip_address, user_agent, now=None) -> str | None:
+        """
+        Return why the hit should be dropped, or None to record it. An
+        ip_address of None (not a valid address) is dropped as 'invalid_ip'.
+        """
+        reason = 'invalid_ip' if ip_address is None else classify_user_agent(user_agent)
+        with self._lock:
+            if reason is None and self.seen is not None:
+                key = f'{system_id}|{ip_address}|{user_agent}'.encode('utf-8', 'replace')
+                if self.seen.add(key, now):
+                    reason = 'duplicate'
+            self.counts[reason or 'accepted'] += 1
+        return reason
+
+    def publish(self) -> None:
+        """Add the counts since the last publish to the shared totals."""
+        with self._lock:
+            delta = self.counts - self._published
+            self._published = collections.Counter(self.counts)
+        cache = caches['default']
+        for reason, n in delta.items():
+            key = _COUNT_CACHE_KEY.format(reason)
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key, n)
+            except ValueError:
+                cache.set(key, n, timeout=None)
+        return
+
+    pass
+
+
+def get_visit_filter() -> VisitFilter:
+    """Return this process's VisitFilter, creating it after a fork."""
+    global _FILTER
+    with _FILTER_LOCK:
+        if _FILTER is None or _FILTER.pid != os.getpid():
+            _FILTER = VisitFilter(settings.DBDB_VISIT_DEDUP_WINDOW, settings.DBDB_VISIT_DEDUP_CAPACITY)
+            atexit.register(_FILTER.publish)
+        return _FILTER
+
+
+def visit_filter_counts(reset=False) -> dict:
+    """Return the {reason: hits} totals published by all workers."""
+    cache = caches['default']
+    keys = {_COUNT_CACHE_KEY.format(reason): reason for reason in COUNT_REASONS}
+    found = cache.get_many(list(keys))
+    if reset:
+        cache.delete_many(list(keys))
+    return {reason: found.get(key, 0) for key, reason in keys.items()}
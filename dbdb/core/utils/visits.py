@@ -0,0 +1,532 @@
+from __future__ import annotations
+
+import atexit
+import collections
+import csv
+import datetime
+import glob
+import io
+import ipaddress
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import DataError, IntegrityError, connection, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from dbdb.core.models import System, SystemVisit, SystemVisitDaily
+from dbdb.core.utils import hll
+from dbdb.core.utils.visitfilter import get_visit_filter
+
+LOG = logging.getLogger(__name__)
+
+# Each worker appends to visits-<pid>.spool; a flush renames it to
+# visits-<pid>-<ns>.flush and deletes that file once the rows are committed.
+_SPOOL_NAME = 'visits-{pid}.spool'
+_FLUSH_NAME = 'visits-{pid}-{ns}.flush'
+_SPOOL_FILE_RE = re.compile(r'^visits-(?P<pid>\d+)(?:-\d+)?\.(?:spool|flush)$')
+# Spool files whose rows the database rejected are set aside under this suffix
+_BAD_SUFFIX = '.bad'
+
+_COPY_COLUMNS = ('system_id', 'ip_address', 'user_agent', 'created')
+
+# A visitor is an (ip_address, user_agent) pair, hashed to a bigint in SQL
+VISITOR_KEY_SQL = "hashtextextended(host(ip_address) || '|' || user_agent, 0)"
+
+# Re-aggregates whole UTC days of raw visits into SystemVisitDaily
+_ROLLUP_SQL = f"""
+    INSERT INTO {SystemVisitDaily._meta.db_table} (system_id, day, visits, unique_visitors)
+    SELECT system_id, (created AT TIME ZONE 'UTC')::date,
+           COUNT(*), COUNT(DISTINCT (ip_address, user_agent))
+      FROM {SystemVisit._meta.db_table}
+     WHERE created >= %s AND created < %s
+     GROUP BY 1, 2
+    ON CONFLICT (system_id, day) DO UPDATE
+       SET visits = EXCLUDED.visits, unique_visitors = EXCLUDED.unique_visitors
+"""
+
+# Adds a written batch to the SystemVisitDaily totals. The day's visitor count
+# and sketch are then stale, so the sketch is cleared for rollup_visits().
+_INCREMENT_SQL = f"""
+    INSERT INTO {SystemVisitDaily._meta.db_table} AS d (system_id, day, visits, unique_visitors)
+    SELECT system_id, day, visits, 0
+      FROM unnest(%s::integer[], %s::date[], %s::integer[]) AS t (system_id, day, visits)
+    ON CONFLICT (system_id, day) DO UPDATE
+       SET visits = d.visits + EXCLUDED.visits, visitor_sketch = NULL
+"""
+
+# Distinct visitor hashes per system for one UTC day, for the HyperLogLog sketches
+_SKETCH_SQL = f"""
+    SELECT DISTINCT system_id, {VISITOR_KEY_SQL}
+      FROM {SystemVisit._meta.db_table}
+     WHERE created >= %s AND created < %s
+"""
+
+_BUFFER = None
+_BUFFER_LOCK = threading.Lock()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_spool(path) -> list:
+    rows = []
+    with open(path, encoding='utf-8') as fd:
+        for line in fd:
+            try:
+                rows.append(tuple(json.loads(line)))
+            except ValueError:
+                # A torn final line from a crash mid-write
+                LOG.warning(f"Skipping malformed visit record in {path}: {line!r}")
+    return rows
+
+
+def normalize_ip(value) -> str | None:
+    """Return the IP address in canonical form, or None if it is not one."""
+    try:
+        # Postgres' inet has no IPv6 zone index
+        return str(ipaddress.ip_address((value or '').strip().partition('%')[0]))
+    except ValueError:
+        return None
+
+
+def write_visits(rows) -> int:
+    """
+    Insert (system_id, ip_address, user_agent, created) tuples into
+    SystemVisit with a single COPY and add them to the SystemVisitDaily
+    totals. Rows for systems deleted since the visit are dropped. Returns
+    the number of rows written.
+    """
+    if not rows:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        # The system FK is only checked at commit, so keep the systems from
+        # being deleted until then (as that check would) and skip the gone ones
+        cursor.execute(f"SELECT id FROM {System._meta.db_table} WHERE id = ANY(%s) FOR KEY SHARE",
+                       [sorted({r[0] for r in rows})])
+        existing = {row[0] for row in cursor.fetchall()}
+        rows = [r for r in rows if r[0] in existing]
+        if not rows:
+            return 0
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        buf.seek(0)
+        cursor.copy_expert(
+            f"COPY {SystemVisit._meta.db_table} ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buf,
+        )
+        # created is an ISO timestamp in UTC. Sorted so that concurrent
+        # flushes lock the daily rows in the same order.
+        daily = sorted(collections.Counter((r[0], r[3][:10]) for r in rows).items())
+        cursor.execute(_INCREMENT_SQL, [
+            [system_id for (system_id, _), _ in daily],
+            [day for (_, day), _ in daily],
+            [count for _, count in daily],
+        ])
+    return len(rows)
+
+
+def _write_spool_file(path, rows) -> int:
+    """
+    write_visits() the rows read from a spool file and delete it. If the
+    database rejects the rows the file is set aside as <path>.bad instead,
+    so one bad record cannot block every later flush. Other errors (e.g. a
+    lost connection) leave the file in place to be retried.
+    """
+    try:
+        written = write_visits(rows)
+    except (DataError, IntegrityError):
+        LOG.exception(f"The database rejected the visits in {path}; moved to {path}{_BAD_SUFFIX}")
+        os.rename(path, path + _BAD_SUFFIX)
+        return 0
+    os.unlink(path)
+    return written
+
+
+def _utc_midnight(day) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.UTC)
+
+
+def add_months(month, n) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def rollup_visits(since=None, until=None) -> int:
+    """
+    Recompute the SystemVisitDaily rows of every UTC day in [since, until)
+    out of the raw SystemVisit rows. By default this starts at the last
+    rolled-up day, which may have been partial, or at the first day whose
+    totals write_visits() has added to since, and runs through today.
+    Days before the oldest visit partition have been compacted and are
+    never recomputed. Returns the number of daily rows written.
+    """
+    partitions = list_visit_partitions()
+    horizon = partitions[0][0] if partitions else datetime.date(1970, 1, 1)
+    if since is None:
+        days = SystemVisitDaily.objects.filter(day__gte=horizon).aggregate(
+            last=Max('day', filter=Q(visitor_sketch__isnull=False)),
+            stale=Min('day', filter=Q(visitor_sketch__isnull=True)),
+        )
+        since = min((d for d in days.values() if d is not None), default=horizon)
+    since = max(since, horizon)
+    if until is None:
+        until = datetime.date.max
+    if since >= until:
+        return 0
+
+    daily = SystemVisitDaily.objects.filter(day__gte=since)
+    if until != datetime.date.max:
+        daily = daily.filter(day__lt=until)
+    with transaction.atomic():
+        # Days whose raw visits were all deleted must not keep stale totals
+        daily.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(_ROLLUP_SQL, [_utc_midnight(since), _utc_midnight(until)])
+            written = cursor.rowcount
+        if written:
+            days = SystemVisitDaily.objects.filter(day__gte=since, day__lt=until) \
+                                           .aggregate(first=Min('day'), last=Max('day'))
+            _rollup_sketches(days['first'], days['last'] + datetime.timedelta(days=1))
+    LOG.debug(f"Rolled up {written} daily visit rows in [{since}, {until})")
+    return written
+
+
+def _rollup_sketches(since, until) -> None:
+    # Fill SystemVisitDaily.visitor_sketch for each day in [since, until)
+    day = since
+    while day < until:
+        with connection.cursor() as cursor:
+            cursor.execute(_SKETCH_SQL, [_utc_midnight(day), _utc_midnight(day + datetime.timedelta(days=1))])
+            rows = cursor.fetchall()
+        if rows:
+            system_ids, hashes = zip(*rows, strict=True)
+            sketches = hll.build_sketches(system_ids, hashes)
+            daily = list(SystemVisitDaily.objects.filter(day=day, system_id__in=sketches).only('id', 'system_id'))
+            for d in daily:
+                d.visitor_sketch = sketches[d.system_id]
+            SystemVisitDaily.objects.bulk_update(daily, ['visitor_sketch'], batch_size=500)
+        day += datetime.timedelta(days=1)
+    return
+
+
+def unique_visitor_counts(since, until=None, system_ids=None) -> dict:
+    """
+    Return {system_id: estimated distinct visitors} over the UTC days in
+    [since, until), merged from the SystemVisitDaily sketches (one row per
+    system and day; the raw visits are not read).
+    """
+    daily = SystemVisitDaily.objects.filter(day__gte=since, visitor_sketch__isnull=False)
+    if until is not None:
+        daily = daily.filter(day__lt=until)
+    if system_ids is not None:
+        daily = daily.filter(system_id__in=system_ids)
+    registers = {}
+    for system_id, sketch in daily.values_list('system_id', 'visitor_sketch').iterator():
+        merged = registers.setdefault(system_id, hll.merge(()))
+        np.maximum(merged, hll.decode(sketch), out=merged)
+    return {system_id: hll.estimate(r) for system_id, r in registers.items()}
+
+
+def unique_visitor_total(since, until=None) -> int:
+    """Estimated distinct visitors to any system over the UTC days in [since, until)."""
+    daily = SystemVisitDaily.objects.filter(day__gte=since, visitor_sketch__isnull=False)
+    if until is not None:
+        daily = daily.filter(day__lt=until)
+    return hll.estimate(hll.merge(daily.values_list('visitor_sketch', flat=True).iterator()))
+
+
+# ==============================================
+# Partitions
+# ==============================================
+# core_systemvisit is range-partitioned by `created` into one table per UTC
+# month named core_systemvisit_pYYYYMM (see migration 0102), plus a default
+# partition for visits outside all of them (see migration 0107).
+VISIT_DEFAULT_PARTITION = f'{SystemVisit._meta.db_table}_default'
+
+
+def visit_partition_name(month) -> str:
+    return f'{SystemVisit._meta.db_table}_p{month:%Y%m}'
+
+
+def list_visit_partitions() -> list:
+    """Return [(first day of month, table name)] of the monthly visit partitions, oldest first."""
+    pattern = re.compile(rf'^{SystemVisit._meta.db_table}_p(\d{{4}})(\d{{2}})$')
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname
+              FROM pg_inherits i
+              JOIN pg_class c ON c.oid = i.inhrelid
+             WHERE i.inhparent = to_regclass(%s)
+        """, [SystemVisit._meta.db_table])
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        m = pattern.match(name)
+        if m:
+            partitions.append((datetime.date(int(m.group(1)), int(m.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def stray_visit_months() -> list:
+    """Return the first days of the months that have visits in the default partition."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT DISTINCT date_trunc('month', created AT TIME ZONE 'UTC')::date
+              FROM {VISIT_DEFAULT_PARTITION}
+             ORDER BY 1
+        """)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_visit_partitions(first_month, last_month) -> list:
+    """
+    Create the missing monthly partitions from first_month through
+    last_month (inclusive), moving their visits out of the default
+    partition. Returns the names of the partitions created.
+    """
+    existing = {name for _, name in list_visit_partitions()}
+    created = []
+    month = first_month.replace(day=1)
+    while month <= last_month:
+        name = visit_partition_name(month)
+        if name not in existing:
+            _create_visit_partition(name, month)
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def _create_visit_partition(name, month) -> None:
+    table = SystemVisit._meta.db_table
+    bounds = [_utc_midnight(month), _utc_midnight(add_months(month, 1))]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {VISIT_DEFAULT_PARTITION} "
+                       f"WHERE created >= %s AND created < %s)", bounds)
+        stray = cursor.fetchone()[0]
+        # Postgres refuses a new partition while the default one holds rows
+        # in its range, so those are moved over with the default detached
+        if stray:
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {VISIT_DEFAULT_PARTITION}")
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                       bounds)
+        if stray:
+            cursor.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {VISIT_DEFAULT_PARTITION}
+                     WHERE created >= %s AND created < %s
+                 RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """, bounds)
+            LOG.info(f"Moved {cursor.rowcount} visits from {VISIT_DEFAULT_PARTITION} to {name}")
+            cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {VISIT_DEFAULT_PARTITION} DEFAULT")
+    return
+
+
+def compact_visit_partitions(before_month, dry_run=False) -> list:
+    """
+    Roll up and then drop every visit partition for a month before
+    before_month, so only SystemVisitDaily keeps those visits.
+    Returns the names of the partitions dropped.
+    """
+    dropped = []
+    for month, name in list_visit_partitions():
+        if month >= before_month:
+            break
+        if not dry_run:
+            with transaction.atomic():
+                rollup_visits(month, add_months(month, 1))
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ALTER TABLE {SystemVisit._meta.db_table} DETACH PARTITION {name}")
+                    cursor.execute(f"DROP TABLE {name}")
+            LOG.info(f"Compacted and dropped visit partition {name}")
+        dropped.append(name)
+    return dropped
+
+
+def refresh_view_counts(system_ids=None) -> int:
+    """
+    Set System.view_count to the system's total from SystemVisitDaily with
+    a single UPDATE. Returns the number of systems whose count changed.
+    """
+    params = []
+    only = ""
+    if system_ids is not None:
+        only = "AND s.id = ANY(%s)"
+        params.append(list(system_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {System._meta.db_table} s
+               SET view_count = COALESCE(t.total, 0)
+              FROM {System._meta.db_table} s2
+              LEFT JOIN (SELECT system_id, SUM(visits) AS total
+                           FROM {SystemVisitDaily._meta.db_table}
+                          GROUP BY system_id) t ON t.system_id = s2.id
+             WHERE s.id = s2.id
+               AND s.view_count IS DISTINCT FROM COALESCE(t.total, 0)
+               {only}
+        """, params)
+        return cursor.rowcount
+
+
+def recover_visits(spool_dir=None) -> int:
+    """
+    Replay the spool files left behind by dead worker processes. A live
+    worker retries its own failed flushes (see VisitBuffer.flush()).
+    Returns the number of rows written.
+    """
+    spool_dir = spool_dir or settings.DBDB_VISIT_SPOOL_DIRECTORY
+    written = 0
+    for path in sorted(glob.glob(os.path.join(spool_dir, 'visits-*'))):
+        m = _SPOOL_FILE_RE.match(os.path.basename(path))
+        if m is None or _pid_alive(int(m.group('pid'))):
+            continue
+        # Claim the file so concurrent recoveries do not replay it twice
+        claimed = f'{path}.{os.getpid()}.claimed'
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            continue
+        written += _write_spool_file(claimed, _read_spool(claimed))
+        LOG.info(f"Recovered visits from {path}")
+    return written
+
+
+# ==============================================
+# VisitBuffer
+# ==============================================
+class VisitBuffer:
+    """
+    Per-process buffer of SystemVisit rows.
+
+    add() appends the visit to an in-memory list and to an append-only spool
+    file, so a crashed worker's visits can be replayed by recover_visits(). A
+    background thread writes the buffer with one COPY every `interval`
+    seconds, or as soon as it holds `size` rows.
+    """
+
+    def __init__(self, spool_dir, size: int, interval: float):
+        self.spool_dir = spool_dir
+        self.size = size
+        self.interval = interval
+        self.pid = os.getpid()
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        os.makedirs(spool_dir, exist_ok=True)
+        self._spool_path = os.path.join(spool_dir, _SPOOL_NAME.format(pid=self.pid))
+        self._spool = open(self._spool_path, 'a', encoding='utf-8')
+
+    def add(self, system_id, ip_address, user_agent) -> None:
+        row = (system_id, ip_address, user_agent, timezone.now().isoformat())
+        with self._lock:
+            self._spool.write(json.dumps(row) + '\n')
+            self._spool.flush()
+            self._rows.append(row)
+            full = len(self._rows) >= self.size
+        if full:
+            self._wakeup.set()
+        self._ensure_thread()
+        return
+
+    def flush(self) -> int:
+        """Write the buffered visits to the database. Returns the number of rows written."""
+        with self._flush_lock:
+            # Batches of earlier flushes that failed come first
+            written = self._retry_flush_files()
+            with self._lock:
+                if not self._rows:
+                    return written
+                rows, self._rows = self._rows, []
+                self._spool.close()
+                flush_path = os.path.join(self.spool_dir, _FLUSH_NAME.format(pid=self.pid, ns=time.time_ns()))
+                os.rename(self._spool_path, flush_path)
+                self._spool = open(self._spool_path, 'a', encoding='utf-8')
+
+            # On failure the .flush file stays behind for the next flush
+            written += _write_spool_file(flush_path, rows)
+        LOG.debug(f"Flushed {written} buffered visits")
+        return written
+
+    def _retry_flush_files(self) -> int:
+        written = 0
+        pattern = _FLUSH_NAME.format(pid=self.pid, ns='*')
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, pattern))):
+            written += _write_spool_file(path, _read_spool(path))
+            LOG.info(f"Wrote the visits of an earlier failed flush from {path}")
+        return written
+
+    def _ensure_thread(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='visit-buffer', daemon=True)
+                self._thread.start()
+        return
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                get_visit_filter().publish()
+            except Exception:
+                LOG.exception("Failed to flush buffered visits")
+            finally:
+                connection.close()
+
+    pass
+
+
+def get_visit_buffer() -> VisitBuffer:
+    """Return this process's VisitBuffer, creating it after a fork."""
+    global _BUFFER
+    with _BUFFER_LOCK:
+        if _BUFFER is None or _BUFFER.pid != os.getpid():
+            _BUFFER = VisitBuffer(
+                settings.DBDB_VISIT_SPOOL_DIRECTORY,
+                settings.DBDB_VISIT_BUFFER_SIZE,
+                settings.DBDB_VISIT_FLUSH_INTERVAL,
+            )
+            atexit.register(_BUFFER.flush)
+        return _BUFFER
+
+
+def record_visit(system_id, ip_address, user_agent) -> str | None:
+    """
+    Record a system page view unless the ingest filter drops it (see
+    dbdb.core.utils.visitfilter). With DBDB_VISIT_BUFFER_SIZE set to 0 the
+    SystemVisit row is inserted immediately; otherwise it is buffered.
+    Returns why the view was dropped, or None if it was recorded.
+    """
+    ip_address = normalize_ip(ip_address)
+    # COPY cannot load NUL characters
+    user_agent = (user_agent or '').replace('\x00', '')
+    visit_filter = get_visit_filter()
+    reason = visit_filter.check(system_id, ip_address, user_agent)
+    if not settings.DBDB_VISIT_BUFFER_SIZE:
+        visit_filter.publish()
+        if reason is None:
+            SystemVisit.objects.create(system_id=system_id, ip_address=ip_address, user_agent=user_agent)
+        return reason
+    if reason is None:
+        get_visit_buffer().add(system_id, ip_address, user_agent)
+    return reason
@@ -15,7 +15,8 @@ from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
 # project imports
-from dbdb.core.models import CitationUrl, Organization, System, SystemVersion, SystemVisit
+from dbdb.core.models import CitationUrl, Organization, System, SystemVersion
+from dbdb.core.utils.visits import record_visit
 
 
 # ==============================================
@@ -55,24 +56,20 @@ class CounterView(View):
             if iss == 'counter:system':
                 pk = payload['pk']
 
-                # Skip bots
                 user_agent = request.headers.get('user-agent', '')
-                if user_agent.lower().find("bot") != -1:
-                    return JsonResponse({ 'status':'bot' })
-
-                # And add a SystemVisit entry
                 x_forwarded_for = request.headers.get('x-forwarded-for')
                 if x_forwarded_for:
                     ip = x_forwarded_for.split(',')[-1].strip()
                 else:
                     ip = request.META.get('REMOTE_ADDR')
 
-                # save visit
-                system_visit = SystemVisit.objects.create(
-                    system_id=pk,
-                    ip_address=ip,
-                    user_agent=user_agent[:127]
-                )
+                # save visit (buffered; see dbdb.core.utils.visits), unless
+                # it is a bot or a repeat hit (see dbdb.core.utils.visitfilter)
+                reason = record_visit(pk, ip, user_agent[:127])
+                if reason == 'duplicate':
+                    return JsonResponse({ 'status':'duplicate' })
+                elif reason is not None:
+                    return JsonResponse({ 'status':'bot' })
                 pass
             else:
                 return JsonResponse({ 'status':('unrecognized counter: %r' % iss) }, status=400)
@@ -6,11 +6,12 @@ from functools import reduce
 from operator import and_, or_
 
 from django.conf import settings
-from django.contrib.postgres.aggregates import JSONBAgg
-from django.contrib.postgres.search import SearchQuery
-from django.db.models import Count, F, Max, Min, Q
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import F, FloatField, Max, Min, Prefetch, Q
 from django.db.models.expressions import RawSQL
-from django.db.models.functions import JSONObject
+from django.db.models.functions import Cast
 from django.shortcuts import redirect, render
 from django.utils.decorators import method_decorator
 from django.utils.html import mark_safe
@@ -21,21 +22,22 @@ from meta.views import MetadataMixin
 from django_countries import countries
 from django_countries.fields import Country as CountryObj
 
-from dbdb.core.common.searchvector import SearchVector
 from dbdb.core.templatetags.savedsearch_tags import ss_decode
 from dbdb.core.models import (
     Attribute,
     AttributeOption,
+    EffectiveFeatureOption,
     Feature,
     FeatureOption,
     Organization,
     SavedSearch,
     System,
-    SystemFeature,
     SystemSearchText,
     SystemVersion,
 )
+from dbdb.core.utils.facets import FACET_CATALOG_CACHE_KEY, get_facet_index
 from dbdb.core.utils.filters import FilterChoice, FilterGroup
+from dbdb.core.utils.pagecache import cache_anonymous_page
 
 
 # Descriptor for a single displayable column in the browse results table.
@@ -44,10 +46,16 @@ from dbdb.core.utils.filters import FilterChoice, FilterGroup
 #   'builtin'      → hardcoded field on SystemVersion (year, URL, tags, etc.)
 #   'relationship' → System-to-System M2M (derived_from, embedded, etc.)
 #   'supported-lang' → AttributeOption M2M with an icon field (supported_languages)
-#   'feature'      → FeatureOption value fetched via SystemFeature
+#   'feature'      → FeatureOption value fetched via EffectiveFeatureOption
 #   'attribute'    → AttributeOption M2M driven by Attribute.sv_field
 ColumnDef = collections.namedtuple('ColumnDef', ['col_id', 'label', 'col_type'])
 
+# Descriptor for a multi-valued column fetched by load_column().
+# key: row dict key the values are merged into (e.g. 'col_developer_orgs').
+# path: SystemVersion M2M lookup path (e.g. 'acquisitions__organization').
+# fields: related fields copied into each value dict.
+ColumnLoader = collections.namedtuple('ColumnLoader', ['key', 'path', 'fields'])
+
 # Columns shown when the user hasn't customised the ?cols= param.
 DEFAULT_COLS = ['data-model', 'start-year', 'tags']
 
@@ -73,7 +81,7 @@ _STATIC_COLUMNS = [
     ColumnDef('embedded',            'Embeds / Uses',      'relationship'),
     ColumnDef('hosted-services',     'Hosted Services',    'relationship'),
     ColumnDef('inspired-by',         'Inspired By',        'relationship'),
-    # 'supported-lang' col_type keeps this out of the dynamic attr_cols annotation loop
+    # 'supported-lang' col_type keeps this out of the Attribute column loaders
     ColumnDef('supported-languages', 'Supported Languages','supported-lang'),
 ]
 
@@ -88,7 +96,7 @@ _URL_COL_FIELDS = {
 }
 
 # Maps relationship col_id → SystemVersion M2M field name, used to build the
-# JSONBAgg annotation for each relationship column at query time.
+# ColumnLoader for each relationship column at query time.
 _RELATIONSHIP_FIELD_MAP = {
     'compatible-with': 'compatible_with',
     'derived-from':    'derived_from',
@@ -155,6 +163,20 @@ _EXISTS_FILTER_MAP = {
     'inspired':       ('inspired_by__isnull',           False),
 }
 
+# Maps a sidebar FilterGroup id → FacetIndex field for the groups that are not
+# driven by a Feature or an Attribute. Used to count matches per FilterChoice.
+_FACET_GROUP_FIELDS = {
+    'country':     'countries',
+    'compatible':  'compatible_with',
+    'embeds':      'embedded',
+    'derived':     'derived_from',
+    'inspired':    'inspired_by',
+    'hosted_by':   'hosted_services',
+    'developer':   'developer_orgs',
+    'acquired-by': 'acquisitions',
+    'supported':   'supported_languages',
+}
+
 # Matches DOI strings in search queries so they can be sanitised before being
 # passed to PostgreSQL's tsquery (colons in DOIs are tsquery operators).
 _DOI_RE = re.compile(
@@ -212,11 +234,61 @@ _ORDER_BY_MAP = {
     'created':    'created',
 }
 
+# Maps an _ORDER_BY_MAP field → SystemVersion lookup used for keyset pagination
+# ('name' is only an annotation on the page query).
+_ORDER_BY_PATHS = {
+    'name':       'system__name',
+    'start_year': 'start_year',
+    'end_year':   'end_year',
+    'created':    'created',
+}
+
+_CURSOR_SALT = 'dbdb.core.views.browse.cursor'
+
+
+def load_column(version_ids, loader):
+    """
+    Fetch one multi-valued column for `version_ids` with a single narrow
+    values_list query. Returns {version_id: [{field: value, ...}, ...]}
+    with each list ordered by the first field.
+    """
+    lookups = [f'{loader.path}__{f}' for f in loader.fields]
+    qs = SystemVersion.objects \
+        .filter(id__in=version_ids, **{f'{loader.path}__isnull': False}) \
+        .order_by('id', *lookups) \
+        .values_list('id', *lookups) \
+        .distinct()
+    data = collections.defaultdict(list)
+    for vid, *values in qs:
+        data[vid].append(dict(zip(loader.fields, values, strict=True)))
+    return data
+
+
+def _encode_cursor(value, pk):
+    """Return an opaque ?after= token for the (sort value, id) of a row."""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return signing.dumps([value, pk], salt=_CURSOR_SALT)
+
+
+def _decode_cursor(token):
+    """Decode an ?after= token into (sort value, id). Returns None on failure."""
+    if not token:
+        return None
+    try:
+        value, pk = signing.loads(token, salt=_CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if value is None or not isinstance(pk, int):
+        return None
+    return (value, pk)
+
 
 # ==============================================
 # BrowseView
 # ==============================================
 @method_decorator(cache_control(public=True, max_age=14400), name='dispatch')
+@method_decorator(cache_anonymous_page, name='dispatch')
 class BrowseView(MetadataMixin, View):
 
     template_name = 'core/browse.html'
@@ -403,22 +475,32 @@ class BrowseView(MetadataMixin, View):
             for slug, name in acquiredby_orgs_map.items()
         ], key=lambda x: x.label)))
 
+        # Attribute options, loaded once in name order
+        attributes = list(
+            Attribute.objects
+            .filter(Q(sv_field__gt='') | Q(slug='programming-language'))
+            .prefetch_related(Prefetch('options', queryset=AttributeOption.objects.order_by('name')))
+            .order_by('name')
+        )
+
         # Supported Languages — options share the programming-language attribute pool
-        pl_attr = Attribute.objects.filter(slug='programming-language').first()
+        pl_attr = next((a for a in attributes if a.slug == 'programming-language'), None)
         if pl_attr:
             other_filtersgroups.append(FilterGroup(
                 'supported',
                 'Supported Language',
-                [FilterChoice(opt.slug, opt.name) for opt in pl_attr.options.order_by('name')],
+                [FilterChoice(opt.slug, opt.name) for opt in pl_attr.options.all()],
             ))
 
         # Add one FilterGroup per Attribute that has a sv_field configured.
         # Adding a new Attribute in the admin automatically shows up here.
-        for attr in Attribute.objects.filter(sv_field__gt='').prefetch_related('options').order_by('name'):
+        for attr in attributes:
+            if not attr.sv_field:
+                continue
             other_filtersgroups.append(FilterGroup(
                 attr.slug,
                 attr.name,
-                [FilterChoice(opt.slug, opt.name) for opt in attr.options.order_by('name')],
+                [FilterChoice(opt.slug, opt.name) for opt in attr.options.all()],
             ))
 
         # build from list of features (alphabetical order)
@@ -441,6 +523,69 @@ class BrowseView(MetadataMixin, View):
 
         return filtergroups
 
+    def build_facet_keys(self, filter_groups):
+        """
+        Map each FilterChoice to the FacetIndex key that selects it, as
+        {group_id: {choice_id: key}}.
+        """
+        sv_fields = dict(Attribute.objects.filter(sv_field__gt='').values_list('slug', 'sv_field'))
+        option_ids = {
+            (f_slug, o_slug): oid
+            for f_slug, o_slug, oid in FeatureOption.objects.values_list('feature__slug', 'slug', 'id')
+        }
+        facet_keys = {}
+        for fg in filter_groups:
+            field = _FACET_GROUP_FIELDS.get(fg.id) or sv_fields.get(fg.id)
+            if field:
+                facet_keys[fg.id] = {c.id: (field, c.id) for c in fg.choices}
+            else:
+                facet_keys[fg.id] = {
+                    c.id: ('feature+inherited', option_ids[(fg.id, c.id)])
+                    for c in fg.choices if (fg.id, c.id) in option_ids
+                }
+        return facet_keys
+
+    def count_filter_choices(self, filter_groups_json, facet_keys, result_ids):
+        """
+        Return a copy of `filter_groups_json` where every choice carries the
+        number of `result_ids` that would still match if it were added as a
+        filter. The result set is converted into a bitset once and each choice
+        is a single AND + popcount against the facet index, so this costs no
+        queries per choice.
+        """
+        index = get_facet_index(_EXISTS_FILTER_MAP.values())
+        result_bits = index.bits(result_ids)
+        counted = []
+        for fg in filter_groups_json:
+            keys = facet_keys.get(fg['id'], {})
+            counted.append({**fg, 'choices': [
+                {**c, 'count': index.count(keys[c['id']], result_bits) if c['id'] in keys else None}
+                for c in fg['choices']
+            ]})
+        return counted
+
+    def get_filter_groups(self, querydict, result_ids=None):
+        """
+        Return (filter_groups, filter_groups_json) for the sidebar. The
+        catalog is the same for every request, so it is cached until a
+        version is finalized or a Feature/Attribute is edited
+        (see bump_facet_index). If `result_ids` is given, the JSON choices
+        carry per-choice match counts for that result set.
+        """
+        catalog = cache.get(FACET_CATALOG_CACHE_KEY)
+        if catalog is None:
+            filter_groups = self.build_filter_groups(querydict)
+            catalog = (
+                filter_groups,
+                [asdict(fg) for fg in filter_groups],
+                self.build_facet_keys(filter_groups),
+            )
+            cache.set(FACET_CATALOG_CACHE_KEY, catalog, settings.DBDB_FACET_CATALOG_TIMEOUT)
+        filter_groups, filter_groups_json, facet_keys = catalog
+        if result_ids is not None:
+            filter_groups_json = self.count_filter_choices(filter_groups_json, facet_keys, result_ids)
+        return filter_groups, filter_groups_json
+
     def slug_to_system(self, slugs):
         slugs = { s.strip() for s in slugs }
         systems = System.objects.filter(slug__in=slugs)
@@ -586,7 +731,6 @@ class BrowseView(MetadataMixin, View):
 
         # apply keyword search to name (require all terms)
         if search_q:
-            search_vector = SearchVector('search_text', config='simple')
             # Sanitize: split each whitespace token on non-word characters so
             # URLs/DOIs like "https://doi.org/10.1145/3786704" don't produce
             # invalid tsquery syntax (the colon in particular is a tsquery
@@ -603,13 +747,20 @@ class BrowseView(MetadataMixin, View):
                 # match lexemes like "Citrusleaf". The GIN index supports :*.
                 raw_tsquery = ' & '.join(f'{t}:*' for t in fts_terms)
                 search_query = SearchQuery(raw_tsquery, config='simple', search_type='raw')
-                fts_filter |= Q(search=search_query)
+                fts_filter |= Q(search_vector=search_query)
 
             matches = SystemSearchText.objects \
-                .annotate(search=search_vector) \
                 .filter(fts_filter) \
                 .values('system_id')
             sqs = sqs.filter(system_id__in=[x['system_id'] for x in matches])
+            if fts_terms:
+                # ts_rank_cd over the stored weighted vector; BrowseView.get()
+                # orders by it when no explicit order-by is given. It returns
+                # a real, cast to double precision so that the ?after= cursor
+                # value (a Python float) compares equal to tied ranks.
+                sqs = sqs.annotate(search_rank=Cast(SearchRank(
+                    F('system__systemsearchtext__search_vector'), search_query, cover_density=True,
+                ), FloatField()))
 
         sqs_filters = []
 
@@ -659,10 +810,13 @@ class BrowseView(MetadataMixin, View):
 
         title = f"Databases {" ".join(title_parts)} "
 
+        index = get_facet_index(_EXISTS_FILTER_MAP.values())
+        facet_filters = []  # bitsets from the facet index, combined with search_op
+
         search_parts = []
         # search - country
         if search_country:
-            sqs_filters.append(Q(countries__in=search_country))
+            facet_filters.append(index.any_of(('countries', c) for c in search_country))
             country_names = [(countries_map.get(c) if countries_map.get(c) else '') for c in search_country]
             search_countries = ' or '.join(country_names) if len(country_names) < 3 else f"{', '.join(country_names[:-1])}, or {country_names[-1]}"
             if search_countries:
@@ -672,7 +826,7 @@ class BrowseView(MetadataMixin, View):
 
         # search - compatible
         if search_compatible:
-            sqs_filters.append(Q(compatible_with__slug__in=search_compatible))
+            facet_filters.append(index.any_of(('compatible_with', s) for s in search_compatible))
 
             systems = self.slug_to_system(search_compatible)
             search_mapping['compatible'] = systems.values()
@@ -686,7 +840,7 @@ class BrowseView(MetadataMixin, View):
 
         # search - derived from
         if search_derived:
-            sqs_filters.append(Q(derived_from__slug__in=search_derived))
+            facet_filters.append(index.any_of(('derived_from', s) for s in search_derived))
             systems = self.slug_to_system(search_derived)
             search_mapping['derived'] = systems.values()
 
@@ -699,7 +853,7 @@ class BrowseView(MetadataMixin, View):
 
         # search - embedded
         if search_embeds:
-            sqs_filters.append(Q(embedded__slug__in=search_embeds))
+            facet_filters.append(index.any_of(('embedded', s) for s in search_embeds))
             systems = self.slug_to_system(search_embeds)
             search_mapping['embeds'] = systems.values()
 
@@ -712,7 +866,7 @@ class BrowseView(MetadataMixin, View):
 
         # search - hosted by
         if search_hosted_by:
-            sqs_filters.append(Q(hosted_services__slug__in=search_hosted_by))
+            facet_filters.append(index.any_of(('hosted_services', s) for s in search_hosted_by))
             systems = self.slug_to_system(search_hosted_by)
             search_mapping['hosted_by'] = systems.values()
 
@@ -725,7 +879,7 @@ class BrowseView(MetadataMixin, View):
 
         # search - inspired by
         if search_inspired:
-            sqs_filters.append(Q(inspired_by__slug__in=search_inspired))
+            facet_filters.append(index.any_of(('inspired_by', s) for s in search_inspired))
             systems = self.slug_to_system(search_inspired)
             search_mapping['inspired'] = systems.values()
 
@@ -738,7 +892,7 @@ class BrowseView(MetadataMixin, View):
 
         # search - developer orgs
         if search_developer:
-            sqs_filters.append(Q(developer_orgs__slug__in=search_developer))
+            facet_filters.append(index.any_of(('developer_orgs', s) for s in search_developer))
             orgs = Organization.objects.filter(slug__in=search_developer).only('name')
             org_names = [o.name for o in orgs]
             joined = ' or '.join(org_names) if len(org_names) < 3 else f"{', '.join(org_names[:-1])}, or {org_names[-1]}"
@@ -749,7 +903,7 @@ class BrowseView(MetadataMixin, View):
 
         # search - acquired by
         if search_acquiredby:
-            sqs_filters.append(Q(acquisitions__organization__slug__in=search_acquiredby))
+            facet_filters.append(index.any_of(('acquisitions', s) for s in search_acquiredby))
             orgs = Organization.objects.filter(slug__in=search_acquiredby).only('name')
             org_names = [o.name for o in orgs]
             joined = ' or '.join(org_names) if len(org_names) < 3 else f"{', '.join(org_names[:-1])}, or {org_names[-1]}"
@@ -761,7 +915,7 @@ class BrowseView(MetadataMixin, View):
         # search - supported languages (existence handled by _EXISTS_FILTER_MAP; skip '*' here)
         value_supported = [v for v in search_supported if v != '*']
         if value_supported:
-            sqs_filters.append(Q(supported_languages__slug__in=value_supported))
+            facet_filters.append(index.any_of(('supported_languages', s) for s in value_supported))
             opts = AttributeOption.objects.filter(
                 attribute__slug='programming-language', slug__in=value_supported
             ).only('name')
@@ -772,21 +926,12 @@ class BrowseView(MetadataMixin, View):
 
         # search - attribute options (dynamic: one block per Attribute)
         for slug, (attr, param_slugs) in attr_searches.items():
+            keys = [(attr.sv_field, s) for s in param_slugs]
             if search_op == and_ and len(param_slugs) > 1:
-                # AND: must have ALL selected options — intersect one queryset per slug
-                version_ids = None
-                for param_slug in param_slugs:
-                    qs = (
-                        SystemVersion.objects
-                        .filter(is_current=True)
-                        .filter(**{f'{attr.sv_field}__slug': param_slug})
-                        .values_list('id', flat=True)
-                        .distinct()
-                    )
-                    version_ids = qs if version_ids is None else version_ids.intersection(qs)
-                sqs_filters.append(Q(id__in=version_ids))
+                # AND: must have ALL selected options
+                facet_filters.append(index.all_of(keys))
             else:
-                sqs_filters.append(Q(**{f'{attr.sv_field}__slug__in': param_slugs}))
+                facet_filters.append(index.any_of(keys))
             matched = AttributeOption.objects.filter(attribute=attr, slug__in=param_slugs)
             names = [o.name for o in matched]
             joined = f' {op_str} '.join(names) if len(names) < 3 else f"{', '.join(names[:-1])}, {op_str} {names[-1]}"
@@ -795,26 +940,15 @@ class BrowseView(MetadataMixin, View):
 
         # search - attribute counts (+N): SystemVersions with >= N options for that attribute
         for slug, (attr, min_count) in attr_count_searches.items():
-            version_ids = (
-                SystemVersion.objects
-                .filter(is_current=True)
-                .annotate(_cnt=Count(attr.sv_field))
-                .filter(_cnt__gte=min_count)
-                .values_list('id', flat=True)
-            )
-            sqs_filters.append(Q(id__in=list(version_ids)))
+            if min_count <= 0:
+                facet_filters.append(index.universe)
+            else:
+                facet_filters.append(index.at_least(attr.sv_field, min_count))
             search_parts.append(f'at least {min_count} {attr.name}')
 
         # search - feature counts (+N): SystemVersions with >= N options for that feature
         for fid, min_count in feature_counts.items():
-            version_ids = (
-                SystemFeature.objects
-                .filter(feature_id=fid, version__is_current=True)
-                .annotate(_cnt=Count('options'))
-                .filter(_cnt__gte=min_count)
-                .values_list('version_id', flat=True)
-            )
-            sqs_filters.append(Q(id__in=list(version_ids)))
+            facet_filters.append(index.at_least(('feature', fid), min_count))
             reverse_features_map_local = {v: k for k, v in features_map.items()}
             feat_label = reverse_features_map_local.get(fid, str(fid)).replace('-', ' ').title()
             search_parts.append(f'at least {min_count} {feat_label}')
@@ -847,104 +981,42 @@ class BrowseView(MetadataMixin, View):
             feature_option_ids.update(option_ids)
             pass
 
-        # if there are filter options to search for, apply filter
+        # if there are filter options to search for, apply filter.
+        # Matches the option directly or via SystemFeature.system inheritance.
         if feature_option_ids:
-            # Build option_id → feature_id map so inherited queries know which feature to follow.
-            option_id_to_feature_id = {}
-            for fid, option_slugs in search_fg.items():
-                for slug in option_slugs:
-                    option_id_to_feature_id[featuresoptions_map[(fid, slug)]] = fid
-
-            def _effective_version_ids(option_id):
-                """Version IDs that match option_id directly or via SystemFeature.system inheritance."""
-                fid = option_id_to_feature_id[option_id]
-                direct = set(
-                    SystemFeature.objects
-                    .filter(options__id=option_id, version__is_current=True)
-                    .values_list('version_id', flat=True)
-                )
-                # Two-step to avoid an unsupported double reverse-FK traversal:
-                # Step 1 — which Systems have the option on their current version?
-                parent_system_ids = (
-                    SystemFeature.objects
-                    .filter(feature_id=fid, options__id=option_id, version__is_current=True)
-                    .values('version__system_id')
-                )
-                # Step 2 — child versions whose SystemFeature.system points to those parents
-                inherited = set(
-                    SystemFeature.objects
-                    .filter(
-                        feature_id=fid,
-                        version__is_current=True,
-                        system__isnull=False,
-                        system_id__in=parent_system_ids,
-                    )
-                    .values_list('version_id', flat=True)
-                )
-                return direct | inherited
-
+            keys = [('feature+inherited', oid) for oid in feature_option_ids]
             # OR Queries (Match Any)
             if search_op == or_:
-                combined: set = set()
-                for oid in feature_option_ids:
-                    combined |= _effective_version_ids(oid)
-                feature_systems_versions = combined
-
+                facet_filters.append(index.any_of(keys))
             # AND Queries (Match All)
             else:
-                feature_systems_versions = None
-                for oid in feature_option_ids:
-                    ids = _effective_version_ids(oid)
-                    if feature_systems_versions is None:
-                        feature_systems_versions = ids
-                    else:
-                        feature_systems_versions &= ids
-                if feature_systems_versions is None:
-                    feature_systems_versions = set()
-
-            sqs_filters.append(Q(id__in=feature_systems_versions))
-
-        if sqs_filters:
-            query = reduce(search_op, sqs_filters)
-            sqs = sqs.filter(query)
+                facet_filters.append(index.all_of(keys))
 
-        # Apply existence filters (=*) — always AND'd, never part of search_op reduce
-        for param, (lookup, val) in _EXISTS_FILTER_MAP.items():
+        # Existence filters (=*) and negations — always AND'd, never part of search_op reduce
+        required = index.universe
+        for param, (lookup, _val) in _EXISTS_FILTER_MAP.items():
             if get_params.get(param) == '*':
-                sqs = sqs.filter(id__in=
-                    SystemVersion.objects.filter(is_current=True)
-                    .filter(**{lookup: val}).values('id').distinct()
-                )
+                required &= index.get(('exists', lookup))
         for fid in feature_exists:
-            sqs = sqs.filter(id__in=
-                SystemFeature.objects.filter(feature_id=fid, version__is_current=True)
-                .values('version_id').distinct()
-            )
+            required &= index.get(('feature-exists', fid))
         for slug, attr in attr_exists.items():
-            sqs = sqs.filter(id__in=
-                SystemVersion.objects.filter(is_current=True)
-                .filter(**{f'{attr.sv_field}__isnull': False})
-                .values('id').distinct()
-            )
-
-        # Negation filters — always AND'd, independent of search_op
+            required &= index.get(('exists', f'{attr.sv_field}__isnull'))
         for fid, neg_slugs in feature_negations.items():
             neg_ids = [featuresoptions_map[(fid, s)] for s in neg_slugs]
-            excluded = (
-                SystemFeature.objects
-                .filter(feature_id=fid, options__id__in=neg_ids, version__is_current=True)
-                .values_list('version_id', flat=True).distinct()
-            )
-            sqs = sqs.exclude(id__in=excluded)
-
+            required &= ~index.any_of(('feature', oid) for oid in neg_ids)
         for slug, (attr, neg_slugs) in attr_negations.items():
-            excluded = (
-                SystemVersion.objects
-                .filter(is_current=True)
-                .filter(**{f'{attr.sv_field}__slug__in': neg_slugs})
-                .values_list('id', flat=True).distinct()
-            )
-            sqs = sqs.exclude(id__in=excluded)
+            required &= ~index.any_of((attr.sv_field, s) for s in neg_slugs)
+
+        # Hand the combined bitset to the ORM as a single id__in filter
+        facet_bits = reduce(search_op, facet_filters) if facet_filters else None
+        if sqs_filters:
+            if facet_bits is not None:
+                sqs_filters.append(Q(id__in=index.ids(facet_bits)))
+            sqs = sqs.filter(reduce(search_op, sqs_filters))
+            facet_bits = None
+        if facet_bits is not None or required != index.universe:
+            bits = required if facet_bits is None else facet_bits & required
+            sqs = sqs.filter(id__in=index.ids(bits))
 
         # Existence title parts
         for param, (lookup, val) in _EXISTS_FILTER_MAP.items():
@@ -983,6 +1055,30 @@ class BrowseView(MetadataMixin, View):
 
         return (sqs, search_mapping, title, None)
 
+    def get_column_loaders(self, active_columns):
+        """Return a ColumnLoader for tags and every active multi-valued column."""
+        active_col_ids = {c.col_id for c in active_columns}
+        loaders = [ColumnLoader('system_tags', 'tags', ('name', 'slug', 'icon'))]
+
+        attr_by_slug = {a.slug: a for a in Attribute.objects.filter(sv_field__gt='').exclude(slug='tag')}
+        for col in active_columns:
+            if col.col_type == 'attribute':
+                loaders.append(ColumnLoader(
+                    'col_' + col.col_id.replace('-', '_'),
+                    attr_by_slug[col.col_id].sv_field,
+                    ('name', 'slug', 'icon'),
+                ))
+        if 'developer-orgs' in active_col_ids:
+            loaders.append(ColumnLoader('col_developer_orgs', 'developer_orgs', ('name', 'slug', 'org_type')))
+        if 'acquired-by' in active_col_ids:
+            loaders.append(ColumnLoader('col_acquired_by', 'acquisitions__organization', ('name', 'slug', 'org_type')))
+        if 'supported-languages' in active_col_ids:
+            loaders.append(ColumnLoader('col_supported_languages', 'supported_languages', ('name', 'slug', 'icon')))
+        for col_id, sv_field in _RELATIONSHIP_FIELD_MAP.items():
+            if col_id in active_col_ids:
+                loaders.append(ColumnLoader('col_' + col_id.replace('-', '_'), sv_field, ('name', 'slug')))
+        return loaders
+
     def get_available_columns(self):
         cols = list(_STATIC_COLUMNS)  # copy — features/attributes are appended below
         for feature in Feature.objects.all().order_by('label'):
@@ -1053,124 +1149,92 @@ class BrowseView(MetadataMixin, View):
         results = SystemVersion.objects.filter(is_current=True)
         results, search_keys, title, search_error = self.do_search(get_params, results, search_op)
 
-        # Base annotations (always)
-        results = results.annotate(
-            name=F('system__name'),
-            slug=F('system__slug'),
-            system_tags=JSONBAgg(JSONObject(name=F('tags__name'), slug=F('tags__slug'), icon=F('tags__icon')), filter=Q(tags__isnull=False), distinct=True)
-        )
-
-        # Attribute column annotations (inline)
-        attr_by_slug = {a.slug: a for a in Attribute.objects.filter(sv_field__gt='').exclude(slug='tag')}
-        attr_cols = [c for c in active_columns if c.col_type == 'attribute']
-        for col in attr_cols:
-            attr = attr_by_slug[col.col_id]
-            sv_f = attr.sv_field
-            key = 'col_' + col.col_id.replace('-', '_')
-            results = results.annotate(**{key: JSONBAgg(
-                JSONObject(name=F(f'{sv_f}__name'), slug=F(f'{sv_f}__slug'), icon=F(f'{sv_f}__icon')),
-                filter=Q(**{f'{sv_f}__isnull': False}),
-                distinct=True,
-            )})
-
-        # Developer orgs column annotation (inline)
-        if 'developer-orgs' in active_col_ids:
-            results = results.annotate(col_developer_orgs=JSONBAgg(
-                JSONObject(name=F('developer_orgs__name'), slug=F('developer_orgs__slug'), org_type=F('developer_orgs__org_type')),
-                filter=Q(developer_orgs__isnull=False),
-                distinct=True,
-            ))
-
-        # Acquired-by column annotation (inline)
-        if 'acquired-by' in active_col_ids:
-            results = results.annotate(col_acquired_by=JSONBAgg(
-                JSONObject(name=F('acquisitions__organization__name'), slug=F('acquisitions__organization__slug'), org_type=F('acquisitions__organization__org_type')),
-                filter=Q(acquisitions__isnull=False),
-                distinct=True,
-            ))
-
-        # Supported Languages column annotation (inline)
-        if 'supported-languages' in active_col_ids:
-            results = results.annotate(col_supported_languages=JSONBAgg(
-                JSONObject(name=F('supported_languages__name'), slug=F('supported_languages__slug'), icon=F('supported_languages__icon')),
-                filter=Q(supported_languages__isnull=False),
-                distinct=True,
-            ))
+        # Ordering — the id breaks ties so (sort value, id) is a unique keyset.
+        # Keyword searches are ordered by relevance unless order-by is given.
+        if search_q and not order_by_raw and 'search_rank' in results.query.annotations:
+            desc = True
+            sort_path = 'search_rank'
+        else:
+            desc = order_by_raw[:1] == '-'
+            db_field = _ORDER_BY_MAP.get(order_col_key, 'name') if order_by_raw else 'name'
+            if order_col_key in _ORDER_BY_MAP and db_field != 'name':
+                results = results.filter(**{f'{db_field}__isnull': False})
+            sort_path = _ORDER_BY_PATHS[db_field]
 
-        # Relationship column annotations (derived_from, embedded, etc.)
-        for col_id, sv_field in _RELATIONSHIP_FIELD_MAP.items():
-            if col_id in active_col_ids:
-                key = 'col_' + col_id.replace('-', '_')
-                results = results.annotate(**{key: JSONBAgg(
-                    JSONObject(name=F(f'{sv_field}__name'), slug=F(f'{sv_field}__slug')),
-                    filter=Q(**{f'{sv_field}__isnull': False}),
-                    distinct=True,
-                )})
+        limit_param = get_params.get('limit', '').strip()
+        limit = int(limit_param) if limit_param.isdigit() and int(limit_param) > 0 else None
+        page_size = limit or settings.DBDB_BROWSE_PAGE_SIZE
+
+        # Every matching id in one narrow query: this is the result count and
+        # the result set for the sidebar facet counts
+        result_ids = list(results.order_by().values_list('id', flat=True).distinct())
+        num_results = min(len(result_ids), limit) if limit else len(result_ids)
+
+        # Keyset (seek) pagination: fetch one row past the page to detect a
+        # next page. A ?limit= request is a single, unpaginated page.
+        cursor = None if limit else _decode_cursor(get_params.get('after', ''))
+        page = results
+        if cursor is not None:
+            value, pk = cursor
+            op = 'lt' if desc else 'gt'
+            page = page.filter(
+                Q(**{f'{sort_path}__{op}': value}) | Q(**{sort_path: value, f'id__{op}': pk})
+            )
+        order = (f'-{sort_path}', '-id') if desc else (sort_path, 'id')
+        page_keys = list(page.order_by(*order).values_list('id', sort_path).distinct()[:page_size + 1])
+        has_next = limit is None and len(page_keys) > page_size
+        page_keys = page_keys[:page_size]
+        next_cursor = _encode_cursor(page_keys[-1][1], page_keys[-1][0]) if has_next else None
+        page_ids = [vid for vid, _ in page_keys]
+
+        # Column annotations and fetches below only cover the visible page
+        results = SystemVersion.objects.filter(id__in=page_ids)
+
+        # Base row data; single-valued FKs are joined in, multi-valued
+        # columns are fetched separately by get_column_loaders()
+        results = results.annotate(name=F('system__name'), slug=F('system__slug'))
+        value_fields = ['id', 'name', 'slug', 'logo', 'logo_color', 'start_year', 'end_year', 'created']
+        if 'country' in active_col_ids:
+            value_fields.append('countries')
+        if 'former-names' in active_col_ids:
+            value_fields.append('former_names')
 
         # URL column annotations (system_url, docs_url, sourcerepo_url, wikipedia_url)
         for col_id, fk_path in _URL_COL_FIELDS.items():
             if col_id in active_col_ids:
                 key = 'col_' + col_id.replace('-', '_')
                 results = results.annotate(**{key: F(fk_path)})
-
-        value_fields = ['id', 'name', 'slug', 'logo', 'logo_color', 'start_year', 'end_year', 'system_tags', 'created']
-        for col in attr_cols:
-            value_fields.append('col_' + col.col_id.replace('-', '_'))
-        if 'developer-orgs' in active_col_ids:
-            value_fields.append('col_developer_orgs')
-        if 'acquired-by' in active_col_ids:
-            value_fields.append('col_acquired_by')
-        if 'supported-languages' in active_col_ids:
-            value_fields.append('col_supported_languages')
-        if 'country' in active_col_ids:
-            value_fields.append('countries')
-        for col_id in _RELATIONSHIP_FIELD_MAP:
-            if col_id in active_col_ids:
-                value_fields.append('col_' + col_id.replace('-', '_'))
-        for col_id in _URL_COL_FIELDS:
-            if col_id in active_col_ids:
-                value_fields.append('col_' + col_id.replace('-', '_'))
-        if 'former-names' in active_col_ids:
-            value_fields.append('former_names')
-
-        limit_param = get_params.get('limit', '').strip()
-        limit = int(limit_param) if limit_param.isdigit() and int(limit_param) > 0 else None
-
-        if order_by_raw:
-            desc = order_by_raw[0] == '-'
-            db_field = _ORDER_BY_MAP.get(order_col_key, 'name')
-            order_by_expr = f'-{db_field}' if desc else db_field
-            if order_col_key in _ORDER_BY_MAP and db_field != 'name':
-                results = results.filter(**{f'{db_field}__isnull': False})
-        else:
-            order_by_expr = 'name'
+                value_fields.append(key)
 
         results.query.comment = "BROWSE-SEARCH"
-        results = list(results.values(*value_fields).order_by(order_by_expr))
-        if limit:
-            results = results[:limit]
-        num_results = len(results)
+        rows = {r['id']: r for r in results.values(*value_fields)}
+        results = [rows[vid] for vid in page_ids if vid in rows]
+
+        # Multi-valued columns — one values_list per column, merged by version id
+        for loader in self.get_column_loaders(active_columns):
+            column = load_column(page_ids, loader)
+            for r in results:
+                r[loader.key] = column.get(r['id'], [])
 
         # Feature column data — bulk fetch and merge (post-query)
         feature_cols = [c for c in active_columns if c.col_type == 'feature']
         if feature_cols:
             sv_ids = [r['id'] for r in results]
             feat_data = collections.defaultdict(lambda: collections.defaultdict(list))
-            sf_qs = (
-                SystemFeature.objects
+            eff_qs = (
+                EffectiveFeatureOption.objects
                 .filter(
                     version_id__in=sv_ids,
                     feature__slug__in=[c.col_id for c in feature_cols],
                 )
-                .select_related('feature', 'system')
-                .prefetch_related('options')
+                .order_by('id')
+                .values_list('version_id', 'feature__slug', 'option__value', 'option__slug')
             )
-            for sf in sf_qs:
-                for opt in sf.get_my_or_parent_options():
-                    feat_data[sf.version_id][sf.feature.slug].append({
-                        'value': opt.value,
-                        'slug':  opt.slug,
-                    })
+            for version_id, feature_slug, value, slug in eff_qs:
+                feat_data[version_id][feature_slug].append({
+                    'value': value,
+                    'slug':  slug,
+                })
             for r in results:
                 for col in feature_cols:
                     key = 'col_' + col.col_id.replace('-', '_')
@@ -1262,7 +1326,16 @@ class BrowseView(MetadataMixin, View):
             )
             show_all_url = ('?' + qs) if qs else '?'
 
-        filter_groups = self.build_filter_groups(get_params)
+        first_page_url = next_page_url = None
+        if cursor is not None or next_cursor:
+            params = [(k, v) for k in get_params.keys() if k != 'after'
+                      for v in get_params.getlist(k)]
+            if cursor is not None:
+                first_page_url = '?' + urllib.parse.urlencode(params)
+            if next_cursor:
+                next_page_url = '?' + urllib.parse.urlencode(params + [('after', next_cursor)])
+
+        filter_groups, filter_groups_json = self.get_filter_groups(get_params, result_ids)
         dropdown_fields = sorted(
             ['Start Year', 'End Year'] + [fg.label for fg in filter_groups],
             key=str.casefold,
@@ -1276,7 +1349,7 @@ class BrowseView(MetadataMixin, View):
             'activate': 'browse',
             'page_error': search_error or (_doi_warning_html(search_q) if _is_doi_query(search_q) else None),
             'filtergroups': filter_groups,
-            'filtergroupsjson': [asdict(fg) for fg in filter_groups],
+            'filtergroupsjson': filter_groups_json,
             'has_results': has_results,
             'query': search_q,
             'results': results,
@@ -1297,6 +1370,8 @@ class BrowseView(MetadataMixin, View):
             'dropdown_fields': dropdown_fields,
             'limit': limit,
             'show_all_url': show_all_url,
+            'first_page_url': first_page_url,
+            'next_page_url': next_page_url,
         })
 
     def handle_old_urls(self, request):
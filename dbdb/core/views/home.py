@@ -1,10 +1,11 @@
+import collections
 import datetime
 import random
 
 import pytz
 
 from django.conf import settings
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
 from django.db.models.aggregates import Max
 from django.shortcuts import render
 from django.utils import timezone
@@ -13,7 +14,17 @@ from django.views import View
 from django.views.decorators.cache import cache_control
 from meta.views import MetadataMixin
 
-from dbdb.core.models import Feature, SavedSearch, System, SystemFeature, SystemVersion
+from dbdb.core.models import (
+    EffectiveFeatureOption,
+    FeatureOption,
+    SavedSearch,
+    System,
+    SystemVersion,
+    SystemVisitDaily,
+)
+from dbdb.core.utils.pagecache import cache_anonymous_page
+from dbdb.core.utils.systempage import attach_current_versions
+from dbdb.core.utils.visits import unique_visitor_counts
 
 
 def _attach_data_models(systems):
@@ -23,13 +34,11 @@ def _attach_data_models(systems):
         return getattr(s, 'system_id', s.id)
 
     ids = [_sys_id(s) for s in systems]
-    sf_map = {}
-    for sf in (SystemFeature.objects
-               .filter(version__is_current=True, version__system_id__in=ids, feature__slug='data-model')
-               .prefetch_related('options', 'system')):
-        opts = set(sf.get_my_or_parent_options())
-        if opts:
-            sf_map[sf.version.system_id] = opts
+    sf_map = collections.defaultdict(set)
+    for eff in (EffectiveFeatureOption.objects
+                .filter(version__is_current=True, version__system_id__in=ids, feature__slug='data-model')
+                .select_related('option', 'version')):
+        sf_map[eff.version.system_id].add(eff.option)
     for s in systems:
         sid = _sys_id(s)
         if sid in sf_map:
@@ -51,6 +60,7 @@ def _attach_data_models(systems):
 # HomeView
 # ==============================================
 @method_decorator(cache_control(public=True, max_age=3600), name='dispatch')
+@method_decorator(cache_anonymous_page, name='dispatch')
 class HomeView(MetadataMixin, View):
 
     template_name = 'core/home.html'
@@ -85,7 +95,7 @@ class HomeView(MetadataMixin, View):
             .annotate(sv_created=Max('versions__created', filter=Q(versions__is_current=True)))
             .order_by('-sv_created')[:settings.DBDB_HOME_LISTINGS_NUM_ENTRIES]
         )
-        _attach_data_models(most_recent)
+        attach_current_versions(_attach_data_models(most_recent))
         for s in most_recent:
             delta = (now - s.sv_created).days
             if delta == 0:
@@ -103,32 +113,42 @@ class HomeView(MetadataMixin, View):
             .order_by('-num_versions', 'name')
             .filter(num_versions__gt=0)[:settings.DBDB_HOME_LISTINGS_NUM_ENTRIES]
         )
-        _attach_data_models(most_versions)
+        attach_current_versions(_attach_data_models(most_versions))
         for s in most_versions:
             s.metric = f"{s.num_versions}"
             s.is_versions = True
 
-        # get top systems by number of (windowed) visits
+        # get top systems by number of (windowed) visits, from the daily rollup
         prev_start_date = start_date - datetime.timedelta(days=30)
-        most_visits = list(
-            System.objects
-            .annotate(num_visits=Count('visits__id', filter=Q(visits__created__gte=start_date)))
-            .order_by('-num_visits', 'name')
-            .filter(num_visits__gt=0)[:settings.DBDB_HOME_LISTINGS_NUM_ENTRIES]
+        window_visits = dict(
+            SystemVisitDaily.objects
+            .filter(day__gte=start_date.date())
+            .values('system_id')
+            .annotate(num_visits=Sum('visits'))
+            .order_by('-num_visits', 'system__name')
+            .values_list('system_id', 'num_visits')[:settings.DBDB_HOME_LISTINGS_NUM_ENTRIES]
         )
-        _attach_data_models(most_visits)
+        systems_by_id = System.objects.in_bulk(window_visits)
+        most_visits = []
+        for system_id, num_visits in window_visits.items():
+            s = systems_by_id[system_id]
+            s.num_visits = num_visits
+            most_visits.append(s)
+        attach_current_versions(_attach_data_models(most_visits))
 
         # Fetch previous-period visit counts for the trend arrow
         prev_visits_map = dict(
-            System.objects
-            .filter(id__in=[s.id for s in most_visits])
-            .annotate(prev_visits=Count(
-                'visits__id',
-                filter=Q(visits__created__gte=prev_start_date, visits__created__lt=start_date)
-            ))
-            .values_list('id', 'prev_visits')
+            SystemVisitDaily.objects
+            .filter(system_id__in=window_visits,
+                    day__gte=prev_start_date.date(), day__lt=start_date.date())
+            .values('system_id')
+            .annotate(prev_visits=Sum('visits'))
+            .values_list('system_id', 'prev_visits')
         )
+        # Distinct visitors over the window, merged from the daily sketches
+        unique_visitors = unique_visitor_counts(start_date.date(), system_ids=window_visits)
         for s in most_visits:
+            s.unique_visitors = unique_visitors.get(s.id)
             prev = prev_visits_map.get(s.id, 0)
             s.visits_delta = s.num_visits - prev
             if prev == 0:
@@ -154,41 +174,18 @@ class HomeView(MetadataMixin, View):
         else:
             featured_searches = all_saved_searches
 
-        # data models with system counts for Browse by Data Model section
-        # Use the same two-pass inheritance logic as StatsView.get_feature_stat() so
-        # systems that inherit a data model via SystemFeature.system are counted correctly.
-        dm_feature = Feature.objects.filter(slug='data-model').first()
-        if dm_feature:
-            sf_list = list(
-                SystemFeature.objects
-                .filter(feature=dm_feature, version__is_current=True)
-                .prefetch_related('options')
-                .select_related('version')
-            )
-            direct_opts_by_system = {}
-            for sf in sf_list:
-                opts = list(sf.options.all())
-                if opts:
-                    direct_opts_by_system[sf.version.system_id] = opts
-
-            counts = {}
-            for sf in sf_list:
-                opts = list(sf.options.all())
-                if opts:
-                    effective = opts
-                elif sf.system_id is not None:
-                    effective = direct_opts_by_system.get(sf.system_id, [])
-                else:
-                    effective = []
-                for opt in effective:
-                    counts[opt] = counts.get(opt, 0) + 1
-
-            data_models = []
-            for opt, count in sorted(counts.items(), key=lambda x: -x[1]):
-                opt.system_count = count
-                data_models.append(opt)
-        else:
-            data_models = []
+        # data models with system counts for Browse by Data Model section.
+        # EffectiveFeatureOption already resolves SystemFeature.system inheritance.
+        data_models = list(
+            FeatureOption.objects
+            .filter(feature__slug='data-model')
+            .annotate(system_count=Count(
+                'effective_options',
+                filter=Q(effective_options__version__is_current=True),
+            ))
+            .filter(system_count__gt=0)
+            .order_by('-system_count', 'value')
+        )
 
         # editor's pick: first spotlight_enabled system
         spotlight_version = None
@@ -203,9 +200,9 @@ class HomeView(MetadataMixin, View):
             )
         if spotlight_version and data_models:
             sp_dm_slugs = set(
-                SystemFeature.objects
+                EffectiveFeatureOption.objects
                 .filter(version=spotlight_version, feature__slug='data-model')
-                .values_list('options__slug', flat=True)
+                .values_list('option__slug', flat=True)
             )
             for dm in data_models:  # already ordered by -system_count
                 if dm.slug in sp_dm_slugs:
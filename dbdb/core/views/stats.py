@@ -15,9 +15,9 @@ from dbdb.core.models import (
     FeatureOption,
     Organization,
     System,
-    SystemFeature,
     SystemVersion,
 )
+from dbdb.core.utils.pagecache import cache_anonymous_page
 
 Stat = collections.namedtuple('Stat', ['label', 'items', 'search_field', 'systems', 'count', 'organizations'], defaults=[False])
 StatItem = collections.namedtuple('StatItem', ['label', 'value', 'slug', 'url'])
@@ -27,6 +27,7 @@ StatItem = collections.namedtuple('StatItem', ['label', 'value', 'slug', 'url'])
 # StatsView
 # ==============================================
 @method_decorator(cache_control(public=True, max_age=14400), name='dispatch')
+@method_decorator(cache_anonymous_page, name='dispatch')
 class StatsView(MetadataMixin, View):
 
     template_name = 'core/stats.html'
@@ -126,35 +127,16 @@ class StatsView(MetadataMixin, View):
     def get_feature_stat(self, title, feature_slug, limit):
         """Count current SystemVersions using each FeatureOption of a given Feature.
 
-        When SystemFeature.system is set and the row has no own options, the
-        options are inherited from that system's current SystemFeature for the
-        same feature (one level of inheritance, matching get_my_or_parent_options).
+        Options inherited through SystemFeature.system are counted via the
+        materialized EffectiveFeatureOption table.
         """
-        sf_list = list(
-            SystemFeature.objects
-            .filter(feature__slug=feature_slug, version__is_current=True)
-            .prefetch_related('options')
-            .select_related('version')
-        )
-
-        # Map system_id → direct FeatureOptions so parent lookups are O(1)
-        direct_opts_by_system = {}
-        for sf in sf_list:
-            opts = list(sf.options.all())
-            if opts:
-                direct_opts_by_system[sf.version.system_id] = opts
-
-        counter = collections.Counter()
-        for sf in sf_list:
-            opts = list(sf.options.all())
-            if opts:
-                effective = opts
-            elif sf.system_id is not None:
-                effective = direct_opts_by_system.get(sf.system_id, [])
-            else:
-                effective = []
-            for opt in effective:
-                counter[opt] += 1
+        options = FeatureOption.objects \
+            .filter(feature__slug=feature_slug) \
+            .annotate(num_versions=Count(
+                'effective_options',
+                filter=Q(effective_options__version__is_current=True),
+            ))
+        counter = collections.Counter({opt: opt.num_versions for opt in options})
 
         stat_items = [
             StatItem(opt.value, count, opt.slug, None)
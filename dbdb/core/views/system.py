@@ -6,7 +6,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
-from django.db.models import OuterRef, Prefetch, Subquery
+from django.db.models import OuterRef, Subquery
 from django.forms import HiddenInput
 from django.http import HttpResponseBadRequest, HttpResponseForbidden
 from django.http.response import Http404
@@ -47,6 +47,16 @@ from dbdb.core.models import (
     SystemVersionCodingAgent,
     user_can_edit_system,
 )
+from dbdb.core.utils.facets import bump_facet_index
+from dbdb.core.utils.features import refresh_effective_options
+from dbdb.core.utils.pagecache import bump_page_cache, bump_related_systems, cache_system_page
+from dbdb.core.utils.systempage import (
+    attach_current_versions,
+    load_related_systems,
+    load_system_features,
+    related_system_ids,
+    system_page_queryset,
+)
 from dbdb.core.utils.versions import delete_latest_version, finalize_new_version
 
 from .api import CounterView
@@ -56,6 +66,7 @@ from .api import CounterView
 # SystemView
 # ==============================================
 @method_decorator(cache_control(public=True, max_age=14400), name='dispatch')
+@method_decorator(cache_system_page, name='dispatch')
 class SystemView(MetadataMixin, View):
 
     template_name = 'core/system_view.html'
@@ -74,7 +85,7 @@ class SystemView(MetadataMixin, View):
 
         # Data Model
         # We will prefer 'Relational' over the others
-        data_models = sv.all_data_models()
+        data_models = set(getattr(self, '_data_models', None) or sv.all_data_models())
         if data_models:
             main_dm = data_models.pop()
             is_relational = False
@@ -128,7 +139,7 @@ class SystemView(MetadataMixin, View):
             'twitter:label1': 'Last Updated',
             'twitter:data1': f'{sv.created:{settings.DBDB_META_DATETIME_FORMAT}}',
             'twitter:label2': 'License',
-            'twitter:data2': sv.licenses.first().name if sv.licenses.exists() else None,
+            'twitter:data2': next((lic.name for lic in sv.licenses.all()), None),
         }
 
     def process_citations(self, citations) -> list(int):
@@ -162,11 +173,7 @@ class SystemView(MetadataMixin, View):
         else:
             user_can_edit = SystemACL.objects.filter(system=system, user=request.user).exists()
 
-        qs = SystemVersion.objects.prefetch_related(
-            'tags', 'oses', 'licenses',
-            'project_types', 'supported_languages', 'written_in',
-            'coding_agent_entries__agent', 'coding_agent_entries__citation',
-        )
+        qs = system_page_queryset()
         approved_ver = None  # ver of the approved (is_current) version, passed to template when showing a pending default
         version_error = None
         if ver is not None:
@@ -186,7 +193,6 @@ class SystemView(MetadataMixin, View):
             else:
                 system_version = qs.get(system=system, is_current=True)
                 has_revision = False
-        system_features = SystemFeature.objects.filter(version=system_version).select_related('feature').order_by('feature__label')
 
         # Sections
 
@@ -217,27 +223,21 @@ class SystemView(MetadataMixin, View):
                 "citations": self.process_citations(system_version.history_citations.all())
             })
 
-        for sf in SystemFeature.objects.filter(version=system_version).select_related('feature').order_by('feature__label'):
-            if not sf.system and not sf.description and sf.options.count() == 0: continue
+        data_models = set()
+        for sf, options in load_system_features(system_version):
+            own_options = sf.options.all()
+            citations = sf.citations.all()
+            if sf.feature.slug == 'data-model':
+                data_models.update(options or own_options)
 
-            # If it is linked to another system, then we will get the options
-            # from that system instead using this ones
-            options = None
-            if sf.system:
-                try:
-                    other_sf = SystemFeature.objects.get(version=sf.system.current(), feature=sf.feature)
-                    options = other_sf.options.all()
-                except SystemFeature.DoesNotExist:
-                    pass
-            if options is None:
-                options = sf.options.all()
+            if not sf.system_id and not sf.description and not own_options: continue
 
             # Skip if the linked system has no options for this feature and
             # the current SystemFeature contributes nothing of its own.
-            if (sf.system
+            if (sf.system_id
                     and not options
-                    and sf.options.count() == 0
-                    and not sf.citations.exists()
+                    and not own_options
+                    and not citations
                     and not sf.description):
                 continue
 
@@ -246,24 +246,20 @@ class SystemView(MetadataMixin, View):
                 "title": sf.feature.label,
                 "body": sf.description,
                 "system": sf.system,
-                "citations": self.process_citations(sf.citations.all()),
+                "citations": self.process_citations(citations),
                 "options": options,
             })
 
         start_year_citations = self.process_citations(system_version.start_year_citations.all())
         end_year_citations = self.process_citations(system_version.end_year_citations.all())
 
-        _org_only = Organization.objects.only('id', 'name', 'slug')
         acquisitions = [
             {
                 'organization': acq.organization,
                 'year': acq.year,
                 'citations': self.process_citations([acq.citation] if acq.citation else []),
             }
-            for acq in system_version.acquisitions
-                .select_related('citation')
-                .prefetch_related(Prefetch('organization', queryset=_org_only))
-                .order_by('year', 'organization__name')
+            for acq in system_version.acquisitions.all()
         ]
 
         coding_agents = [
@@ -271,48 +267,13 @@ class SystemView(MetadataMixin, View):
                 'agent': entry.agent,
                 'citation': self.process_citations([entry.citation])[0] if entry.citation_id else None,
             }
-            for entry in system_version.coding_agent_entries
-                .select_related('agent', 'citation')
-                .order_by('agent__name')
+            for entry in system_version.coding_agent_entries.all()
         ]
 
-        developer_orgs = list(system_version.developer_orgs.only('id', 'name', 'slug'))
+        developer_orgs = list(system_version.developer_orgs.all())
 
-        # Compatible Systems
-        compatible = [
-            ver.system for ver in SystemVersion.objects
-                                .filter(is_current=True)
-                                .filter(compatible_with=system)
-                                .order_by("-logo")
-                                .select_related()
-        ]
-
-        # Derived Systems
-        derived = [
-            ver.system for ver in SystemVersion.objects
-                                .filter(is_current=True)
-                                .filter(derived_from=system)
-                                .order_by("-logo")
-                                .select_related()
-        ]
-
-        # Embedding Systems
-        embeds = [
-            ver.system for ver in SystemVersion.objects
-                                .filter(is_current=True)
-                                .filter(embedded=system)
-                                .order_by("-logo")
-                                .select_related()
-        ]
-
-        # Systems that host this system as a DBaaS
-        hosted_by = [
-            ver.system for ver in SystemVersion.objects
-                                .filter(is_current=True)
-                                .filter(hosted_services=system)
-                                .order_by("-logo")
-                                .select_related()
-        ]
+        # Compatible / Derived / Embedding / Hosting Systems
+        related = load_related_systems(system)
 
         # Recommendations
         recommendations = [
@@ -321,6 +282,7 @@ class SystemView(MetadataMixin, View):
                                 .order_by("-score")
                                 .select_related()
         ]
+        attach_current_versions(recommendations)
 
         repo_snapshot = None
         if system_version.sourcerepo_url_id:
@@ -333,9 +295,13 @@ class SystemView(MetadataMixin, View):
             if repo_info:
                 repo_snapshot = repo_info.current
 
-        hosted_services = _attach_data_models(list(system_version.hosted_services.all()))
+        hosted_services = attach_current_versions(_attach_data_models(list(system_version.hosted_services.all())))
+        if not data_models:
+            for hosted_sys in hosted_services:
+                data_models.update(hosted_sys.all_data_models)
 
         self._system_version = system_version
+        self._data_models = data_models
         return render(request, self.template_name, {
             'meta': self.get_meta(),
             'activate': 'system',  # NAV-LINKS
@@ -347,10 +313,10 @@ class SystemView(MetadataMixin, View):
             'coding_agents': coding_agents,
             'developer_orgs': developer_orgs,
             'user_can_edit': user_can_edit,
-            'compatible': compatible,
-            'derived': derived,
-            'embeds': embeds,
-            'hosted_by': hosted_by,
+            'compatible': related['compatible'],
+            'derived': related['derived'],
+            'embeds': related['embeds'],
+            'hosted_by': related['hosted_by'],
             'recommendations': recommendations,
             'counter_token': CounterView.build_token('system', pk=system.id),
             'Status': CitationUrl.Status,
@@ -1010,6 +976,10 @@ class RecentChangesView(MetadataMixin, View):
         system.modified = timezone.now()
         version.save()
         system.save()
+        refresh_effective_options([system.id])
+        bump_facet_index()
+        bump_page_cache()
+        bump_related_systems(related_system_ids(system.id))
 
         return redirect('system', slug=slug)
 
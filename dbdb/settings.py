@@ -49,16 +49,9 @@ MIDDLEWARE = [
     'dbdb.core.middleware.CloudflareAuthCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.middleware.cache.UpdateCacheMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.cache.FetchFromCacheMiddleware',
     'django.contrib.flatpages.middleware.FlatpageFallbackMiddleware',
 ]
 
-if DEBUG:
-    MIDDLEWARE.remove('django.middleware.cache.UpdateCacheMiddleware')
-    MIDDLEWARE.remove('django.middleware.cache.FetchFromCacheMiddleware')
-
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -146,12 +139,14 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 # CACHE
+# 'default' is the L2 cache shared by every worker (a file cache unless
+# DBDB_CACHE_URL points at e.g. redis://); 'local' is each process's L1.
 CACHES = {
-    'default': {
-        #'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-        #'LOCATION': 'dbdb_io_cache',
-    }
+    'default': env.cache_url('DBDB_CACHE_URL', default='filecache:///tmp/dbdb_io_cache'),
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dbdb_io_cache',
+    },
 }
 
 # Internationalization
@@ -259,6 +254,36 @@ DBDB_AUTOCOMPLETE_CITATION_NUM_ENTRIES      = 12
 DBDB_AUTOCOMPLETE_ORGANIZATION_NUM_ENTRIES  = 12
 DBDB_AUTOCOMPLETE_SYSTEM_NUM_ENTRIES        = 10
 
+# Lifetime (seconds) of cached anonymous pages (see dbdb.core.utils.pagecache);
+# 0 disables the page cache
+DBDB_PAGE_CACHE_TIMEOUT = env.int('DBDB_PAGE_CACHE_TIMEOUT', default=0 if DEBUG else 3600)
+
+# Rows per browse results page (keyset paginated via ?after=)
+DBDB_BROWSE_PAGE_SIZE = env.int('DBDB_BROWSE_PAGE_SIZE', default=100)
+
+# Max age (seconds) of each worker's in-memory browse facet index
+DBDB_FACET_INDEX_TTL = env.int('DBDB_FACET_INDEX_TTL', default=300)
+# Max age (seconds) of the cached browse sidebar; it is also cleared on edits
+DBDB_FACET_CATALOG_TIMEOUT = env.int('DBDB_FACET_CATALOG_TIMEOUT', default=3600)
+
+# Page views are buffered per worker and written with one COPY per flush
+# (see dbdb.core.utils.visits); a buffer size of 0 writes every visit directly
+DBDB_VISIT_BUFFER_SIZE = env.int('DBDB_VISIT_BUFFER_SIZE', default=500)
+DBDB_VISIT_FLUSH_INTERVAL = env.int('DBDB_VISIT_FLUSH_INTERVAL', default=30)
+DBDB_VISIT_SPOOL_DIRECTORY = env('DBDB_VISIT_SPOOL_DIRECTORY', default='/tmp/dbdb_visits/')
+# Each worker drops repeat (system, ip, user agent) counter hits within this
+# many seconds (0 disables), tracking up to DBDB_VISIT_DEDUP_CAPACITY hits
+# per quarter window (see dbdb.core.utils.visitfilter)
+DBDB_VISIT_DEDUP_WINDOW = env.int('DBDB_VISIT_DEDUP_WINDOW', default=1800)
+DBDB_VISIT_DEDUP_CAPACITY = env.int('DBDB_VISIT_DEDUP_CAPACITY', default=100000)
+# Raw visits are kept in monthly partitions for this many months, then only
+# in the daily rollup (see the partition_visits command)
+DBDB_VISIT_RETENTION_MONTHS = env.int('DBDB_VISIT_RETENTION_MONTHS', default=24)
+# Half-life (days) of visits in the incremental co-occurrence store used by
+# `process_visits --incremental`; 0 weighs all visits equally. Changing it
+# requires `process_visits --rebuild`.
+DBDB_RECOMMENDER_HALF_LIFE_DAYS = env.int('DBDB_RECOMMENDER_HALF_LIFE_DAYS', default=0)
+
 # LLM prompt truncation limits for the enrichment commands
 DBDB_ENRICHMENT_CRAWLED_CHARS  = 3000   # per crawled page excerpt passed to LLM prompts
 DBDB_ENRICHMENT_HOMEPAGE_CHARS = 8000   # full homepage HTML passed for URL extraction
@@ -271,6 +296,12 @@ CODEBERG_API_TOKEN = env('CODEBERG_API_TOKEN', default='')
 REPOSITORY_INACTIVITY_DAYS = 365 # 1 year seems to be enough
 
 CRAWLER_USER_AGENT = env('CRAWLER_USER_AGENT', default='dbdb.io/1.0')
+# Most bytes of a citation's body the crawler reads; larger PDF/PPTX files
+# only have their metadata read from the start of the file
+DBDB_CITATION_MAX_BYTES = env.int('DBDB_CITATION_MAX_BYTES', default=20 * 1024 * 1024)
+# Browser contexts each crawler process keeps open for rendering JavaScript
+# pages (see dbdb.core.utils.browser)
+DBDB_CRAWLER_BROWSER_CONTEXTS = env.int('DBDB_CRAWLER_BROWSER_CONTEXTS', default=4)
 
 ANTHROPIC_API_KEY             = env('ANTHROPIC_API_KEY',             default='')
 OPENAI_API_KEY                = env('OPENAI_API_KEY',                default='')
@@ -283,6 +314,10 @@ CRAWLER_SPAM_CHECKER_MODEL            = env('CRAWLER_SPAM_CHECKER_MODEL', defaul
 CRAWLER_SPAM_CHECKER_FALLBACK_MODEL_A = env('CRAWLER_SPAM_CHECKER_FALLBACK_MODEL_A', default='qwen3.6:35b')
 CRAWLER_SPAM_CHECKER_FALLBACK_MODEL_B = env('CRAWLER_SPAM_CHECKER_FALLBACK_MODEL_B', default='qwen3.6:35b')
 CRAWLER_SPAM_VALIDATION_MODEL         = env('CRAWLER_SPAM_VALIDATION_MODEL', default='qwen3.6:35b')
+# Spam verdicts are cached per page text (see dbdb.core.models.SpamVerdict);
+# texts whose SimHashes are at least this similar (0-1) share a verdict,
+# and 1 only reuses verdicts of identical text
+CRAWLER_SPAM_VERDICT_SIMILARITY = env.float('CRAWLER_SPAM_VERDICT_SIMILARITY', default=0.95)
 
 # django-meta
 META_SITE_PROTOCOL      = env('META_SITE_PROTOCOL', default='https')
@@ -28,3 +28,20 @@ class FreshTestRunner(DiscoverRunner):
 TEST_RUNNER = 'dbdb.test_settings.FreshTestRunner'
 
 TURNSTILE_ENABLE = False
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'local':   {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+# Rebuild the browse facet index on every request so each test sees its own data
+DBDB_FACET_INDEX_TTL = 0
+
+# Anonymous page caching is exercised explicitly in PageCacheTestCase
+DBDB_PAGE_CACHE_TIMEOUT = 0
+
+# Counter visits are written synchronously; VisitBufferTestCase builds its own buffer
+DBDB_VISIT_BUFFER_SIZE = 0
+
+# Repeat counter hits are recorded; VisitFilterTestCase builds its own filter
+DBDB_VISIT_DEDUP_WINDOW = 0
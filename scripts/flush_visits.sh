@@ -0,0 +1,12 @@
+#!/bin/sh
+# Replay the visits spooled by web workers that exited before flushing, then
+# recompute the daily visitor counts and sketches and refresh view_count.
+# Suggested cron entry (every 10 minutes):
+#   */10 * * * *  cd /path/to/web && ./scripts/flush_visits.sh >> /var/log/dbdb/flush_visits.log 2>&1
+
+LOCKFILE="/run/lock/flush_visits.lock"
+exec 9>"$LOCKFILE"
+flock --nonblock 9 || { echo "flush_visits.sh: already running, exiting." >&2; exit 1; }
+
+uv run ./manage.py flush_visits
+uv run ./manage.py rollup_visits
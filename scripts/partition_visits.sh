@@ -0,0 +1,12 @@
+#!/bin/sh
+# Create the coming months' SystemVisit partitions, move any visits caught by
+# the default partition into their monthly partitions, and compact partitions
+# older than DBDB_VISIT_RETENTION_MONTHS into the daily totals.
+# Suggested cron entry (daily at 03:00):
+#   0 3 * * *  cd /path/to/web && ./scripts/partition_visits.sh >> /var/log/dbdb/partition_visits.log 2>&1
+
+LOCKFILE="/run/lock/partition_visits.lock"
+exec 9>"$LOCKFILE"
+flock --nonblock 9 || { echo "partition_visits.sh: already running, exiting." >&2; exit 1; }
+
+uv run ./manage.py partition_visits
@@ -1,11 +1,13 @@
 #!/bin/sh
 # This should be run weekly to recompute the "People Who Viewed..."
+# Only visits since the last run are read (see process_visits --incremental);
+# use --rebuild to recompute the co-occurrence store from all raw visits.
 
 LOCKFILE="/run/lock/process_visits.lock"
 exec 9>"$LOCKFILE"
 flock --nonblock 9 || { echo "process_visits.sh: already running, exiting." >&2; exit 1; }
 
-uv run ./manage.py  process_visits --debug --clear --store \
+uv run ./manage.py  process_visits --debug --incremental --content --store \
   --min-visit=75 \
   --max-threshold=45 \
   --min-threshold=4
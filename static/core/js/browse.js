@@ -18,6 +18,9 @@ function buildFilterChoices(fg, select, selected_options) {
         option.classList.add('filter-option');
         option.setAttribute('value', filterchoices[i].id);
         option.textContent = filterchoices[i].label;
+        if (filterchoices[i].count !== null && filterchoices[i].count !== undefined) {
+            option.textContent += ' (' + filterchoices[i].count + ')';
+        }
         select.appendChild(option);
     }
 }
@@ -346,7 +349,20 @@ function sortTableBy(btn, order) {
     rows.forEach(row => tbody.appendChild(row));
 }
 
+// Columns the server can order by; a paginated table must be re-fetched
+// instead of sorted in place, since only one page is in the DOM
+const SERVER_SORT_COLS = ['name', 'start-year', 'end-year'];
+
 function handleSortClick(btn) {
+    const table = document.getElementById('results-table');
+    if (table && table.hasAttribute('data-paginated') && SERVER_SORT_COLS.includes(btn.dataset.colId)) {
+        const params = new URLSearchParams(window.location.search);
+        const current = params.get('order-by') || 'name';
+        params.set('order-by', current === btn.dataset.colId ? '-' + btn.dataset.colId : btn.dataset.colId);
+        params.delete('after');
+        window.location.search = params.toString();
+        return;
+    }
     const newOrder = (sortState.btn === btn && sortState.order === 'asc') ? 'desc' : 'asc';
     sortState.btn = btn;
     sortState.order = newOrder;
@@ -358,9 +374,12 @@ document.querySelectorAll('.sort-btn').forEach(btn => {
     btn.addEventListener('click', () => handleSortClick(btn));
 });
 
-// Initialise sort from ?order-by= param, falling back to name column ascending
+// Initialise sort from ?order-by= param, falling back to name column ascending.
+// Keyword searches without an order-by keep the server's relevance order.
 (function () {
-    const param = new URLSearchParams(window.location.search).get('order-by') || '';
+    const params = new URLSearchParams(window.location.search);
+    const param = params.get('order-by') || '';
+    if (!param && (params.get('q') || '').trim()) return;
     const desc = param.startsWith('-');
     const colId = param.replace(/^[+-]/, '') || 'name';
     const order = desc ? 'desc' : 'asc';